@@ -0,0 +1,295 @@
+"""
+Offline latency and throughput benchmark for the compiled agent graph.
+
+Runs the graph against a local PokeAPI stand-in and a scripted chat model with
+configurable latency, so results only depend on the code under test. Reports, as
+JSON, per-scenario p50/p95/p99 latency, per-node latency, LLM and HTTP calls per
+query, peak traced memory and throughput at several concurrency levels:
+
+    poetry run python -m benchmarks.agent_graph --output benchmark.json
+
+Answer and extraction caches are disabled unless --warm-caches is passed, so every
+query exercises check_input, lookup_pokemon and format_output.
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import statistics
+import subprocess
+import time
+import tracemalloc
+from collections import defaultdict
+from typing import Any
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from benchmarks.stand_ins import PokeApiStandIn, ScriptedChatModel
+
+SCENARIOS = {
+    "valid_single_type": ["What types are strong against pikachu?", "What beats squirtle?", "jolteon weaknesses"],
+    "valid_dual_type": ["What beats charizard?", "Tell me gyarados weaknesses", "what counters bulbasaur"],
+    "misspelled": ["What beats charmandr?", "wat is strong against pikchu", "gyarodos weaknesses"],
+    "llm_extraction": ["What beats the yellow electric mouse?", "Which types beat the first grass starter?"],
+    "invalid": ["What is the capital of France?", "Tell me a joke", "What beats fakemon?"],
+}
+# What the scripted model extracts for inputs the local resolver cannot settle, anything else extracts nothing
+SCRIPTED_EXTRACTIONS = {
+    # Six letter typos are left to the model, see max_edit_distance
+    "wat is strong against pikchu": "pikachu",
+    "What beats the yellow electric mouse?": "pikachu",
+    "Which types beat the first grass starter?": "bulbasaur",
+    "What beats fakemon?": "fakemon",
+}
+
+
+class NodeTimer(BaseCallbackHandler):
+    """Collects the wall time of every graph node run."""
+
+    run_inline = True
+
+    def __init__(self):
+        self.durations: dict[str, list[float]] = defaultdict(list)
+        self._started: dict[UUID, tuple[str, float]] = {}
+
+    def on_chain_start(
+        self,
+        serialized: Any,
+        inputs: Any,
+        *,
+        run_id: UUID,
+        parent_run_id: UUID | None = None,
+        metadata: dict | None = None,
+        **kwargs
+    ):
+        # A node wraps its runnable in a run of the same name, only time the outer one
+        node_name = (metadata or {}).get("langgraph_node")
+        if node_name is not None and kwargs.get("name") == node_name and parent_run_id not in self._started:
+            self._started[run_id] = (node_name, time.perf_counter())
+
+    def on_chain_end(self, outputs: Any, *, run_id: UUID, **kwargs):
+        started = self._started.pop(run_id, None)
+        if started is not None:
+            self.durations[started[0]].append(time.perf_counter() - started[1])
+
+    def on_chain_error(self, error: BaseException, *, run_id: UUID, **kwargs):
+        self._started.pop(run_id, None)
+
+
+def latency_summary(latencies: list[float]) -> dict[str, float]:
+    """Summarize latencies in milliseconds.
+
+    Args:
+        latencies: Latencies in seconds.
+
+    Returns:
+        The p50, p95, p99 and mean latency in milliseconds.
+    """
+    milliseconds = sorted(latency * 1000 for latency in latencies)
+    if len(milliseconds) == 1:
+        percentiles = milliseconds * 99
+    else:
+        percentiles = statistics.quantiles(milliseconds, n=100, method="inclusive")
+    return {
+        "p50_ms": round(percentiles[49], 3),
+        "p95_ms": round(percentiles[94], 3),
+        "p99_ms": round(percentiles[98], 3),
+        "mean_ms": round(statistics.fmean(milliseconds), 3),
+    }
+
+
+async def run_queries(graph, user_inputs: list[str], concurrency: int, callbacks: list | None = None) -> tuple[list[float], float]:
+    """Run the graph over the inputs with at most `concurrency` runs in flight.
+
+    Args:
+        graph: The compiled graph.
+        user_inputs: The queries to run.
+        concurrency: Maximum number of concurrent graph runs.
+        callbacks: Callback handlers passed to every run.
+
+    Returns:
+        The latency of every query and the total wall time, in seconds.
+    """
+    from langchain_core.messages import HumanMessage
+    from src.pokemon_data_sources import get_data_source
+
+    semaphore = asyncio.Semaphore(concurrency)
+    run_config = {"callbacks": callbacks or []}
+
+    async def run_query(user_input: str) -> float:
+        async with semaphore:
+            started = time.perf_counter()
+            await graph.ainvoke({"messages": [HumanMessage(content=user_input)]}, run_config)
+            return time.perf_counter() - started
+
+    try:
+        started = time.perf_counter()
+        latencies = await asyncio.gather(*(run_query(user_input) for user_input in user_inputs))
+        return list(latencies), time.perf_counter() - started
+    finally:
+        await get_data_source().aclose()
+
+
+def cycle_inputs(user_inputs: list[str], queries: int) -> list[str]:
+    return list(itertools.islice(itertools.cycle(user_inputs), queries))
+
+
+def benchmark_scenario(graph, llm: ScriptedChatModel, pokeapi: PokeApiStandIn, user_inputs: list[str], queries: int) -> dict[str, Any]:
+    """Benchmark one scenario sequentially, then once more under tracemalloc for peak memory."""
+    node_timer = NodeTimer()
+    llm.reset_calls()
+    pokeapi.reset_requests()
+    latencies, _ = asyncio.run(run_queries(graph, cycle_inputs(user_inputs, queries), 1, [node_timer]))
+
+    result = {
+        "queries": queries,
+        **latency_summary(latencies),
+        "llm_calls_per_query": llm.calls / queries,
+        "http_calls_per_query": pokeapi.requests / queries,
+        "nodes": {
+            node_name: {"runs_per_query": len(durations) / queries, **latency_summary(durations)}
+            for node_name, durations in sorted(node_timer.durations.items())
+        },
+    }
+
+    tracemalloc.start()
+    try:
+        asyncio.run(run_queries(graph, cycle_inputs(user_inputs, min(queries, 20)), 1))
+        result["peak_memory_bytes"] = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return result
+
+
+def benchmark_concurrency(graph, concurrency: int, queries: int) -> dict[str, Any]:
+    """Benchmark a mixed workload of every scenario at one concurrency level."""
+    mixed_inputs = [
+        user_input
+        for user_inputs in itertools.zip_longest(*SCENARIOS.values())
+        for user_input in user_inputs
+        if user_input is not None
+    ]
+    latencies, wall_seconds = asyncio.run(run_queries(graph, cycle_inputs(mixed_inputs, queries), concurrency))
+    return {
+        "queries": queries,
+        "throughput_qps": round(queries / wall_seconds, 2),
+        **latency_summary(latencies),
+    }
+
+
+def _git_commit() -> str | None:
+    try:
+        completed = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True)
+        return completed.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark(
+    queries: int,
+    concurrency_levels: list[int],
+    llm_latency_seconds: float,
+    http_latency_seconds: float,
+    deterministic: bool = True,
+    warm_caches: bool = False
+) -> dict[str, Any]:
+    """Run every scenario and concurrency level against the local stand-ins.
+
+    Args:
+        queries: Queries per scenario and per concurrency level.
+        concurrency_levels: Concurrency levels for the throughput runs.
+        llm_latency_seconds: Delay of every scripted chat model call.
+        http_latency_seconds: Delay of every PokeAPI stand-in response.
+        deterministic: Build the graph in deterministic mode, otherwise valid inputs go through pokemon_agent.
+        warm_caches: Keep the answer and extraction caches enabled.
+
+    Returns:
+        The machine-readable benchmark report.
+    """
+    # Keep cached answers in memory so runs never read or write the on-disk cache
+    os.environ["POKEMON_ANSWER_CACHE_PATH"] = ""
+
+    with PokeApiStandIn(latency_seconds=http_latency_seconds) as pokeapi:
+        from src.main import GraphConfig, get_compiled_graph
+        from src.pokemon_agent_tools import set_llm
+        from src.pokemon_cache import get_answer_cache, get_extraction_cache
+        from src.pokemon_data_sources import LocalHttpDataSource, SnapshotDataSource, set_data_source
+        from src.pokemon_species_index import get_species_index
+
+        llm = ScriptedChatModel(extractions=SCRIPTED_EXTRACTIONS, latency_seconds=llm_latency_seconds)
+        set_llm(llm)
+        set_data_source(SnapshotDataSource(get_species_index(), fallback=LocalHttpDataSource(pokeapi.base_url)))
+        get_answer_cache.cache_clear()
+        get_extraction_cache.cache_clear()
+        if not warm_caches:
+            get_answer_cache().memory_cache.max_size = 0
+            get_extraction_cache().memory_cache.max_size = 0
+
+        try:
+            graph = get_compiled_graph(GraphConfig(deterministic=deterministic))
+            scenarios = {
+                scenario_name: benchmark_scenario(graph, llm, pokeapi, user_inputs, queries)
+                for scenario_name, user_inputs in SCENARIOS.items()
+            }
+            concurrency = {
+                str(concurrency_level): benchmark_concurrency(graph, concurrency_level, queries)
+                for concurrency_level in concurrency_levels
+            }
+        finally:
+            set_llm(None)
+            set_data_source(None)
+            get_answer_cache.cache_clear()
+            get_extraction_cache.cache_clear()
+
+    return {
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "config": {
+            "queries": queries,
+            "llm_latency_ms": llm_latency_seconds * 1000,
+            "http_latency_ms": http_latency_seconds * 1000,
+            "deterministic": deterministic,
+            "warm_caches": warm_caches,
+        },
+        "scenarios": scenarios,
+        "concurrency": concurrency,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the agent graph against local stand-ins")
+    parser.add_argument("--queries", type=int, default=100, help="Queries per scenario and per concurrency level")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16], help="Concurrency levels to measure")
+    parser.add_argument("--llm-latency-ms", type=float, default=25.0, help="Delay of every chat model call")
+    parser.add_argument("--http-latency-ms", type=float, default=5.0, help="Delay of every PokeAPI response")
+    parser.add_argument("--agent", action="store_true", help="Route valid inputs through the tool-calling agent")
+    parser.add_argument("--warm-caches", action="store_true", help="Keep the answer and extraction caches enabled")
+    parser.add_argument("--output", help="Write the JSON report to this file instead of stdout")
+    args = parser.parse_args()
+
+    from src.logging_config import setup_logging
+
+    setup_logging(log_level="CRITICAL")
+    report = run_benchmark(
+        queries=args.queries,
+        concurrency_levels=args.concurrency,
+        llm_latency_seconds=args.llm_latency_ms / 1000,
+        http_latency_seconds=args.http_latency_ms / 1000,
+        deterministic=not args.agent,
+        warm_caches=args.warm_caches,
+    )
+
+    report_json = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as report_file:
+            report_file.write(report_json + "\n")
+    else:
+        print(report_json)
+
+
+if __name__ == "__main__":
+    main()
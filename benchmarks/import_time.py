@@ -0,0 +1,59 @@
+"""
+Import-time benchmark for the Pokemon agent.
+
+Measures, in fresh interpreters, how long `import src.main` takes and how long the
+first get_compiled_graph() call takes afterwards. Run it from the project root:
+
+    poetry run python -m benchmarks.import_time --runs 10
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+_MEASURE_SCRIPT = """
+import json, time
+start = time.perf_counter()
+import src.main
+imported = time.perf_counter()
+src.main.get_compiled_graph()
+built = time.perf_counter()
+print(json.dumps({"import_seconds": imported - start, "first_build_seconds": built - imported}))
+"""
+
+
+def measure_import_time(runs: int) -> dict[str, float]:
+    """Measure the median import and first build time over several fresh interpreters.
+
+    Args:
+        runs: Number of interpreters to start.
+
+    Returns:
+        The median seconds spent importing src.main and building the graph.
+    """
+    samples = []
+    for _ in range(runs):
+        completed = subprocess.run(
+            [sys.executable, "-W", "ignore", "-c", _MEASURE_SCRIPT],
+            capture_output=True, text=True, check=True
+        )
+        samples.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+
+    return {
+        key: statistics.median(sample[key] for sample in samples)
+        for key in ("import_seconds", "first_build_seconds")
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the import time of src.main")
+    parser.add_argument("--runs", type=int, default=5, help="Number of fresh interpreters to sample")
+    args = parser.parse_args()
+
+    print(json.dumps({"runs": args.runs, **measure_import_time(args.runs)}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+"""
+Run the HTTP server offline, against the benchmark's scripted chat model and local
+PokeAPI stand-in, e.g. to load test the server without calling the real services.
+Takes the same options as the serve command:
+
+    poetry run python -m benchmarks.serve_offline --port 8000 --max-concurrency 32
+"""
+
+import sys
+
+import run
+from benchmarks.agent_graph import SCRIPTED_EXTRACTIONS
+from benchmarks.stand_ins import PokeApiStandIn, ScriptedChatModel
+from src.pokemon_agent_tools import set_llm
+from src.pokemon_data_sources import LocalHttpDataSource, SnapshotDataSource, set_data_source
+from src.pokemon_species_index import get_species_index
+
+
+def main(argv: list[str] | None = None) -> None:
+    with PokeApiStandIn() as pokeapi:
+        set_llm(ScriptedChatModel(extractions=SCRIPTED_EXTRACTIONS))
+        set_data_source(SnapshotDataSource(get_species_index(), fallback=LocalHttpDataSource(pokeapi.base_url)))
+        run.main(["serve", *(sys.argv[1:] if argv is None else argv)])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,365 @@
+"""
+Local stand-ins for the external services the agent calls, used by the benchmarks.
+
+- ScriptedChatModel: chat model answering from a script after a configurable delay
+- PokeApiStandIn: HTTP server serving the /api/v2/pokemon and /api/v2/type resources from the species snapshot and the type chart
+- OpenAiStandIn: HTTP server answering OpenAI /v1/chat/completions requests, with 429s past a concurrency cap
+"""
+
+import asyncio
+import hashlib
+import json
+import threading
+import time
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any
+from urllib.parse import urlsplit
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+from langchain_core.messages.utils import count_tokens_approximately
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.runnables import Runnable, RunnableLambda
+from pydantic import PrivateAttr
+
+from src.pokemon_species_index import DEFAULT_SNAPSHOT_PATH, normalize_pokemon_name
+from src.pokemon_type_matrix import TYPE_INDEX, TYPE_NAMES, effectiveness
+
+
+class ScriptedChatModel(BaseChatModel):
+    """Chat model that sleeps for latency_seconds and answers from a script.
+
+    Name extractions are looked up by the user's message in `extractions`, as one
+    name or a ranked list of candidate names, unknown messages extract no pokemon. Every other call answers with `reply` and no tool calls.
+    """
+
+    extractions: dict[str, str | list[str]] = {}
+    reply: str = "I can only help with Pokémon type strengths and weaknesses."
+    latency_seconds: float = 0.0
+    model_name: str = "scripted-chat-model"
+
+    _calls: int = PrivateAttr(default=0)
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    @property
+    def calls(self) -> int:
+        return self._calls
+
+    def reset_calls(self) -> None:
+        with self._lock:
+            self._calls = 0
+
+    def _count_call(self) -> None:
+        with self._lock:
+            self._calls += 1
+
+    def _generate(self, messages: list[BaseMessage], stop: list[str] | None = None, run_manager=None, **kwargs) -> ChatResult:
+        self._count_call()
+        time.sleep(self.latency_seconds)
+        return self._reply(messages)
+
+    async def _agenerate(self, messages: list[BaseMessage], stop: list[str] | None = None, run_manager=None, **kwargs) -> ChatResult:
+        self._count_call()
+        await asyncio.sleep(self.latency_seconds)
+        return self._reply(messages)
+
+    def _reply(self, messages: list[BaseMessage]) -> ChatResult:
+        input_tokens = count_tokens_approximately(messages)
+        output_tokens = count_tokens_approximately([AIMessage(content=self.reply)])
+        usage_metadata = {"input_tokens": input_tokens, "output_tokens": output_tokens, "total_tokens": input_tokens + output_tokens}
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.reply, usage_metadata=usage_metadata))])
+
+    def bind_tools(self, tools: Any, **kwargs) -> Runnable:
+        return self
+
+    def with_structured_output(self, schema: Any, **kwargs) -> Runnable:
+        return RunnableLambda(self._extract, afunc=self._aextract)
+
+    def _extraction(self, messages: list[BaseMessage]) -> dict[str, list]:
+        user_message = next(message.content for message in messages if isinstance(message, HumanMessage))
+        candidate_names = self.extractions.get(user_message) or []
+        if isinstance(candidate_names, str):
+            candidate_names = [candidate_names]
+        if not candidate_names:
+            return {"pokemon_mentions": []}
+
+        candidates = [
+            {"pokemon_name": candidate_name, "confidence": 1 / (rank + 1)}
+            for rank, candidate_name in enumerate(candidate_names)
+        ]
+        return {"pokemon_mentions": [{"candidates": candidates}]}
+
+    def _extract(self, messages: list[BaseMessage]) -> dict[str, list]:
+        self._count_call()
+        time.sleep(self.latency_seconds)
+        return self._extraction(messages)
+
+    async def _aextract(self, messages: list[BaseMessage]) -> dict[str, list]:
+        self._count_call()
+        await asyncio.sleep(self.latency_seconds)
+        return self._extraction(messages)
+
+
+def _pokemon_payload(pokemon: dict[str, Any], species_name: str, is_default: bool) -> bytes:
+    return json.dumps({
+        "id": pokemon["id"],
+        "name": pokemon["name"],
+        "is_default": is_default,
+        "species": {"name": species_name},
+        "types": [
+            {"slot": slot, "type": {"name": pokemon_type}}
+            for slot, pokemon_type in enumerate(pokemon["types"], start=1)
+        ],
+    }).encode()
+
+
+def load_pokeapi_payloads(snapshot_path: str | Path = DEFAULT_SNAPSHOT_PATH) -> dict[str, bytes]:
+    """Render PokeAPI /pokemon responses for every species and form in the snapshot."""
+    snapshot = json.loads(Path(snapshot_path).read_text(encoding="utf-8"))
+    payloads = {}
+    for species in snapshot["species"]:
+        payloads[normalize_pokemon_name(species["name"])] = _pokemon_payload(species, species["name"], True)
+        for form in species.get("forms", []):
+            payloads[normalize_pokemon_name(form["name"])] = _pokemon_payload(form, species["name"], False)
+    return payloads
+
+
+def render_type_payloads() -> dict[str, bytes]:
+    """Render PokeAPI /type responses from the built-in type chart."""
+    payloads = {}
+    for attacking_type in TYPE_NAMES:
+        damage_relations = {"double_damage_to": [], "half_damage_to": [], "no_damage_to": []}
+        for defending_type in TYPE_NAMES:
+            multiplier = effectiveness(TYPE_INDEX[attacking_type], TYPE_INDEX[defending_type])
+            relation = {2: "double_damage_to", 0.5: "half_damage_to", 0: "no_damage_to"}.get(multiplier)
+            if relation is not None:
+                damage_relations[relation].append({"name": defending_type})
+        payloads[attacking_type] = json.dumps({
+            "id": TYPE_INDEX[attacking_type] + 1,
+            "name": attacking_type,
+            "damage_relations": damage_relations,
+        }).encode()
+    return payloads
+
+
+class PokeApiStandIn:
+    """Threaded HTTP server mimicking the PokeAPI /pokemon and /type endpoints on localhost.
+
+    Use it as a context manager and point the agent at `base_url` with a
+    LocalHttpDataSource. Resources carry ETags and answer matching If-None-Match
+    requests with 304, put_pokemon adds or changes a pokemon and names in
+    `failing` get a 500, e.g. to interrupt a snapshot build.
+    """
+
+    def __init__(self, latency_seconds: float = 0.0, snapshot_path: str | Path = DEFAULT_SNAPSHOT_PATH):
+        self.latency_seconds = latency_seconds
+        self.requests = 0
+        self.not_modified_responses = 0
+        self.failing: set[str] = set()
+        self._resources = {"pokemon": load_pokeapi_payloads(snapshot_path), "type": render_type_payloads()}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/api/v2"
+
+    def reset_requests(self) -> None:
+        with self._lock:
+            self.requests = 0
+            self.not_modified_responses = 0
+
+    def put_pokemon(self, pokemon: dict[str, Any], species_name: str | None = None) -> None:
+        """Add or replace a pokemon, given as a snapshot entry, as a form of species_name if given."""
+        payload = _pokemon_payload(pokemon, species_name or pokemon["name"], species_name is None)
+        with self._lock:
+            self._resources["pokemon"][normalize_pokemon_name(pokemon["name"])] = payload
+
+    def _response(self, path: str, if_none_match: str | None) -> tuple[HTTPStatus, bytes, dict[str, str]]:
+        url = urlsplit(path)
+        segments = url.path.removeprefix("/api/v2/").strip("/").split("/")
+        resources = self._resources.get(segments[0])
+        if resources is None or len(segments) > 2:
+            return HTTPStatus.NOT_FOUND, b'"Not Found"', {}
+
+        if len(segments) == 1:
+            results = [{"name": name, "url": f"{self.base_url}/{segments[0]}/{name}/"} for name in resources]
+            body = json.dumps({"count": len(results), "next": None, "previous": None, "results": results}).encode()
+            return HTTPStatus.OK, body, {}
+
+        name = segments[1]
+        if name in self.failing:
+            return HTTPStatus.INTERNAL_SERVER_ERROR, b'"Internal Server Error"', {}
+        payload = resources.get(name)
+        if payload is None:
+            return HTTPStatus.NOT_FOUND, b'"Not Found"', {}
+
+        etag = f'"{hashlib.sha256(payload).hexdigest()[:16]}"'
+        if if_none_match == etag:
+            with self._lock:
+                self.not_modified_responses += 1
+            return HTTPStatus.NOT_MODIFIED, b"", {"ETag": etag}
+        return HTTPStatus.OK, payload, {"ETag": etag}
+
+    def _handler_class(self) -> type[BaseHTTPRequestHandler]:
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                with stand_in._lock:
+                    stand_in.requests += 1
+                time.sleep(stand_in.latency_seconds)
+
+                status, body, headers = stand_in._response(self.path, self.headers.get("If-None-Match"))
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                if status != HTTPStatus.NOT_MODIFIED:
+                    self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def __enter__(self) -> "PokeApiStandIn":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class OpenAiStandIn:
+    """Threaded HTTP server mimicking the OpenAI chat completions endpoint on localhost.
+
+    Every request is answered with `reply` after latency_seconds. Requests arriving
+    while max_concurrency others are in flight get a 429, like a provider over its
+    limits. Point ChatOpenAI at `base_url` with any API key.
+    """
+
+    def __init__(
+        self,
+        reply: str = "Stand-in reply",
+        latency_seconds: float = 0.0,
+        max_concurrency: int | None = None,
+        retry_after_seconds: float = 0.0
+    ):
+        self.reply = reply
+        self.latency_seconds = latency_seconds
+        self.max_concurrency = max_concurrency
+        self.retry_after_seconds = retry_after_seconds
+        self.requests = 0
+        self.rejected_requests = 0
+        self.peak_concurrency = 0
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def reset_requests(self) -> None:
+        with self._lock:
+            self.requests = 0
+            self.rejected_requests = 0
+            self.peak_concurrency = 0
+
+    def _enter_request(self) -> bool:
+        with self._lock:
+            self.requests += 1
+            if self.max_concurrency is not None and self._in_flight >= self.max_concurrency:
+                self.rejected_requests += 1
+                return False
+            self._in_flight += 1
+            self.peak_concurrency = max(self.peak_concurrency, self._in_flight)
+            return True
+
+    def _exit_request(self) -> None:
+        with self._lock:
+            self._in_flight -= 1
+
+    def _completion(self, request_body: dict[str, Any]) -> bytes:
+        prompt_tokens = sum(len(str(message.get("content", ""))) for message in request_body.get("messages", [])) // 4
+        completion_tokens = len(self.reply) // 4
+        return json.dumps({
+            "id": "chatcmpl-stand-in",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request_body.get("model", "stand-in"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": self.reply},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }).encode()
+
+    def _handler_class(self) -> type[BaseHTTPRequestHandler]:
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                request_body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                if not self.path.endswith("/chat/completions"):
+                    self._send(HTTPStatus.NOT_FOUND, b'{"error": {"message": "Not Found"}}')
+                    return
+                if not stand_in._enter_request():
+                    self._send(
+                        HTTPStatus.TOO_MANY_REQUESTS,
+                        b'{"error": {"message": "Rate limit reached", "type": "requests"}}',
+                        {"Retry-After": f"{stand_in.retry_after_seconds:g}"}
+                    )
+                    return
+                try:
+                    time.sleep(stand_in.latency_seconds)
+                    self._send(HTTPStatus.OK, stand_in._completion(request_body))
+                finally:
+                    stand_in._exit_request()
+
+            def _send(self, status: HTTPStatus, body: bytes, headers: dict[str, str] | None = None):
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def __enter__(self) -> "OpenAiStandIn":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,70 @@
+"""
+Latency benchmark for the team analysis and its batched candidate ranking.
+
+Ranks a pool of at least --candidates distinct candidates for a few teams and
+reports per-call latency percentiles as JSON. The pool holds every pokemon in the
+species index; when the snapshot has fewer, it is filled with synthetic
+candidates named synthetic-<n> that cycle through the single and dual type
+combinations:
+
+    poetry run python -m benchmarks.team_analysis --candidates 1200 --runs 200
+"""
+
+import argparse
+import json
+import statistics
+import time
+
+from src.pokemon_record import PokemonRecord
+from src.pokemon_species_index import get_species_index
+from src.pokemon_team_analysis import analyze_team
+from src.pokemon_type_matrix import DEFENSIVE_TABLE, TYPE_NAMES
+
+TEAMS = {
+    "one_member": ["pikachu"],
+    "three_members": ["charizard", "gyarados", "pikachu"],
+    "five_members": ["charizard", "gyarados", "pikachu", "bulbasaur", "geodude"],
+}
+# IDs of the synthetic candidates, above every PokeAPI ID
+SYNTHETIC_ID_START = 1_000_000
+
+
+def candidate_pool(records: list[PokemonRecord], size: int) -> list[PokemonRecord]:
+    """Get at least size candidates with distinct names, the species index's pokemon first."""
+    type_combinations = list(DEFENSIVE_TABLE)
+    synthetic = [
+        PokemonRecord(
+            id=SYNTHETIC_ID_START + position,
+            name=f"synthetic-{position}",
+            types=[TYPE_NAMES[index] for index in type_combinations[position % len(type_combinations)]]
+        )
+        for position in range(max(size - len(records), 0))
+    ]
+    return records + synthetic
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--candidates", type=int, default=1200, help="Minimum number of candidates ranked per call")
+    parser.add_argument("--runs", type=int, default=200, help="Calls measured per team")
+    args = parser.parse_args()
+
+    records = {record.name: record for record in get_species_index().records()}
+    candidates = candidate_pool(list(records.values()), args.candidates)
+
+    results = {"candidates": len(candidates), "species_candidates": len(records)}
+    for team_name, member_names in TEAMS.items():
+        team = [records[member_name] for member_name in member_names]
+        analyze_team(team, candidates)
+        latencies = []
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            analyze_team(team, candidates)
+            latencies.append((time.perf_counter() - start) * 1000)
+        percentiles = statistics.quantiles(latencies, n=100)
+        results[team_name] = {"p50_ms": round(percentiles[49], 3), "p95_ms": round(percentiles[94], 3)}
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -2,35 +2,155 @@
 """
 Runner script for the Pokemon Agent.
 This script properly imports and runs the main application.
+
+Commands:
+    chat        Start the interactive chat loop (default), --stream prints the answer as it is generated,
+                --session keeps the conversation's history
+    serve       Run the HTTP server
+    draw-graph  Render the agent graph to a PNG through the Mermaid service
+    build-snapshot  Download every species, form and type into the species snapshot and rebuild its index,
+                    resuming an interrupted build and only fetching new or changed resources
 """
 
-from langchain_core.messages import HumanMessage
+import argparse
+import sys
+
+
+def print_streamed_response(user_input: str, session_id: str | None = None):
+    """Print node progress to stderr and the answer as it is generated"""
+    from src.run_agent import NODE_EVENT, TOKEN_EVENT, stream_pokemon_agent
+
+    answer_started = False
+    for event in stream_pokemon_agent(user_input, session_id):
+        if event.kind == NODE_EVENT:
+            print(f"  [{event.node}]", file=sys.stderr, flush=True)
+        elif event.kind == TOKEN_EVENT:
+            if not answer_started:
+                print("Agent: ", end="", flush=True)
+                answer_started = True
+            print(event.content, end="", flush=True)
+    print()
+
+
+def chat(metrics_output: str | None = None, stream: bool = False, session: bool = False):
+    """Run the interactive chat loop"""
+    from uuid import uuid4
 
-def main():
-    """Main entry point for the Pokemon Agent"""
-    from src.main import compiled_graph
     from src.logging_config import setup_logging, get_logger
-    
+    from src.pokemon_metrics import write_metrics
+    from src.run_agent import get_agent_graph, new_agent_input
+
     # Setup logging for the project
     setup_logging(log_level="CRITICAL")
     logger = get_logger(__name__)
-    
+    # In a session every question is a turn of the same conversation
+    session_id = uuid4().hex if session else None
+    compiled_graph = get_agent_graph(session_id)
+
     # Start interactive chat loop
     logger.info("Starting interactive chat loop")
     print("Pokemon Agent is ready! Type '*' to exit.")
-    
+
     while True:
         user_input = input("You: ")
-        
+
         if user_input == "*":
             logger.info("Received exit signal, ending chat")
             break
-        
-        messages = [HumanMessage(content=user_input)]
-        response = compiled_graph.invoke({"messages": messages})
+
+        if stream:
+            print_streamed_response(user_input, session_id)
+            continue
+
+        response = compiled_graph.invoke(*new_agent_input(user_input, session_id))
         print(f"Agent: {response.get('output_message', 'No response generated')}")
 
     logger.info("Chat session ended")
+    if metrics_output:
+        print(f"Metrics saved to {write_metrics(metrics_output)}")
+
+
+def serve(args: argparse.Namespace):
+    """Run the HTTP server until SIGTERM or SIGINT"""
+    from src.logging_config import setup_logging
+    from src.pokemon_server import ServerConfig, serve as serve_agent
+
+    setup_logging(log_level=args.log_level)
+    config = ServerConfig(
+        host=args.host,
+        port=args.port,
+        max_concurrency=args.max_concurrency,
+        max_queue=args.max_queue,
+        request_timeout_seconds=args.request_timeout
+    )
+    serve_agent(config)
+
+
+def draw_graph(output_path: str):
+    """Render the agent graph to a PNG"""
+    from src.main import draw_graph as draw_agent_graph
+    from src.logging_config import setup_logging
+
+    setup_logging(log_level="INFO")
+    print(f"Graph visualization saved to {draw_agent_graph(output_path)}")
+
+
+def build_snapshot(args: argparse.Namespace):
+    """Download the species snapshot and rebuild the species index"""
+    from pathlib import Path
+
+    from src.logging_config import setup_logging
+    from src.pokemon_snapshot_builder import SnapshotBuilder
+    from src.pokemon_species_index import build_species_index
+
+    setup_logging(log_level="INFO")
+    builder = SnapshotBuilder(base_url=args.base_url, snapshot_path=args.output, max_concurrency=args.max_concurrency)
+    print(f"Snapshot saved to {args.output}: {builder.build(full=args.full)}")
+    index_path = args.index_output or Path(args.output).with_suffix(".idx")
+    print(f"Species index saved to {build_species_index(args.output, index_path)}")
+
+
+def main(argv: list[str] | None = None):
+    """Main entry point for the Pokemon Agent"""
+    import os
+
+    from src.main import DEFAULT_GRAPH_IMAGE_PATH
+    from src.pokemon_data_sources import POKEAPI_BASE_URL
+    from src.pokemon_snapshot_builder import DEFAULT_DOWNLOAD_CONCURRENCY
+    from src.pokemon_species_index import DEFAULT_SNAPSHOT_PATH
+    from src.pokemon_server import DEFAULT_HOST, DEFAULT_MAX_CONCURRENCY, DEFAULT_MAX_QUEUE, DEFAULT_PORT
+
+    parser = argparse.ArgumentParser(prog="pokemon-agent", description="Pokemon type effectiveness agent")
+    subparsers = parser.add_subparsers(dest="command")
+    chat_parser = subparsers.add_parser("chat", help="Start the interactive chat loop (default)")
+    chat_parser.add_argument("--metrics-output", help="Dump the session metrics here on exit (.prom for Prometheus, JSON otherwise)")
+    chat_parser.add_argument("--stream", action="store_true", help="Show node progress and print the answer as it is generated")
+    chat_parser.add_argument("--session", action="store_true", help="Remember earlier questions, stored in POKEMON_SESSION_STORE (memory or sqlite)")
+    serve_parser = subparsers.add_parser("serve", help="Run the HTTP server")
+    serve_parser.add_argument("--host", default=DEFAULT_HOST, help="Interface to listen on")
+    serve_parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="Port to listen on, 0 picks a free one")
+    serve_parser.add_argument("--max-concurrency", type=int, default=DEFAULT_MAX_CONCURRENCY, help="Graph runs executing at once")
+    serve_parser.add_argument("--max-queue", type=int, default=DEFAULT_MAX_QUEUE, help="Requests waiting for a slot before new ones are shed")
+    serve_parser.add_argument("--request-timeout", type=float, default=60.0, help="Seconds a request may wait and run")
+    serve_parser.add_argument("--log-level", default="INFO", help="Logging level")
+    draw_parser = subparsers.add_parser("draw-graph", help="Render the agent graph to a PNG")
+    draw_parser.add_argument("--output", default=DEFAULT_GRAPH_IMAGE_PATH, help="Where to write the PNG")
+    snapshot_parser = subparsers.add_parser("build-snapshot", help="Download the species snapshot and rebuild the species index")
+    snapshot_parser.add_argument("--base-url", default=os.environ.get("POKEAPI_BASE_URL", POKEAPI_BASE_URL), help="PokeAPI-compatible server to download from")
+    snapshot_parser.add_argument("--output", default=str(DEFAULT_SNAPSHOT_PATH), help="Where to write the JSON snapshot, its journal is kept next to it")
+    snapshot_parser.add_argument("--index-output", help="Where to write the species index, next to the snapshot by default")
+    snapshot_parser.add_argument("--max-concurrency", type=int, default=DEFAULT_DOWNLOAD_CONCURRENCY, help="Resources downloaded at once")
+    snapshot_parser.add_argument("--full", action="store_true", help="Ignore the journal and download every resource again")
+    args = parser.parse_args(argv)
+
+    if args.command == "draw-graph":
+        draw_graph(args.output)
+    elif args.command == "build-snapshot":
+        build_snapshot(args)
+    elif args.command == "serve":
+        serve(args)
+    else:
+        chat(getattr(args, "metrics_output", None), getattr(args, "stream", False), getattr(args, "session", False))
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
@@ -1,22 +1,162 @@
+import atexit
+import json
 import logging
 import logging.config
+import logging.handlers
+import queue
+import threading
+import time
+from datetime import datetime, timezone
 from pathlib import Path
 from typing import Optional
 
+# Records below WARNING allowed per call site and second, the rest are dropped and counted
+DEFAULT_MAX_RECORDS_PER_SECOND = 20
+
+_CONFIGURED_LOGGERS = ("pokemon_agent", "langgraph", "langchain", "")
+_LOG_RECORD_ATTRIBUTES = frozenset(logging.makeLogRecord({}).__dict__) | {"message", "asctime"}
+
+_setup_lock = threading.Lock()
+_active_settings: Optional[tuple] = None
+_queue_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that leaves formatting to the listener thread.
+    
+    The stock QueueHandler formats every record in the calling thread so it can be
+    pickled. The queue never leaves the process here, so the record is passed as is
+    and its message is only built if a handler actually writes it. Log arguments
+    should therefore not be mutated after the call.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Drop records from call sites logging more than max_records per interval.
+    
+    Records at WARNING and above always pass. The first record let through after
+    a dropped burst reports how many similar records were suppressed.
+    """
+
+    def __init__(self, max_records: int = DEFAULT_MAX_RECORDS_PER_SECOND, interval_seconds: float = 1.0):
+        super().__init__()
+        self.max_records = max_records
+        self.interval_seconds = interval_seconds
+        self._windows: dict[tuple[str, int], list] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+
+        call_site = (record.pathname, record.lineno)
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows.get(call_site)
+            if window is None or now - window[0] >= self.interval_seconds:
+                suppressed = window[2] if window is not None else 0
+                self._windows[call_site] = [now, 1, 0]
+            elif window[1] < self.max_records:
+                window[1] += 1
+                return True
+            else:
+                window[2] += 1
+                return False
+
+        if suppressed:
+            record.msg = f"{record.getMessage()} ({suppressed} similar messages suppressed)"
+            record.args = None
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """Format records as one JSON object per line, including any `extra` fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        log_entry = {
+            "timestamp": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "function": record.funcName,
+            "line": record.lineno,
+        }
+        for key, value in record.__dict__.items():
+            if key not in _LOG_RECORD_ATTRIBUTES:
+                log_entry[key] = value
+        if record.exc_info:
+            log_entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(log_entry, default=str)
+
+
+def _stop_queue_listener() -> None:
+    global _queue_listener
+    if _queue_listener is not None:
+        _queue_listener.stop()
+        _queue_listener = None
+
+
+def _route_through_queue(max_records_per_second: Optional[int]) -> None:
+    global _queue_listener
+    loggers = [logging.getLogger(name) for name in _CONFIGURED_LOGGERS]
+    handlers = list({id(handler): handler for logger in loggers for handler in logger.handlers}.values())
+
+    queue_handler = DeferredQueueHandler(queue.SimpleQueue())
+    if max_records_per_second:
+        queue_handler.addFilter(RateLimitFilter(max_records_per_second))
+    for logger in loggers:
+        for handler in list(logger.handlers):
+            logger.removeHandler(handler)
+        logger.addHandler(queue_handler)
+
+    _queue_listener = logging.handlers.QueueListener(queue_handler.queue, *handlers, respect_handler_level=True)
+    _queue_listener.start()
+
 
 def setup_logging(
     log_level: str = "INFO",
     log_file: Optional[str] = None,
-    log_format: Optional[str] = None
+    log_format: Optional[str] = None,
+    use_queue: bool = True,
+    json_format: bool = False,
+    max_records_per_second: Optional[int] = DEFAULT_MAX_RECORDS_PER_SECOND
 ) -> None:
     """
     Set up logging configuration for the Pokemon agent project.
     
+    Calling it again with the same arguments is a no-op, so runners can call it
+    on every request.
+    
     Args:
         log_level: Logging level (DEBUG, INFO, WARNING, ERROR, CRITICAL)
         log_file: Optional file path to write logs to
         log_format: Optional custom log format
+        use_queue: Write logs from a background thread instead of the logging thread
+        json_format: Write one JSON object per record instead of plain text
+        max_records_per_second: Rate limit per call site for records below WARNING, None to log everything
     """
+    global _active_settings
+    settings = (log_level, log_file, log_format, use_queue, json_format, max_records_per_second)
+    with _setup_lock:
+        if settings == _active_settings:
+            return
+        _stop_queue_listener()
+        _configure_logging(log_level, log_file, log_format, json_format)
+        if use_queue:
+            _route_through_queue(max_records_per_second)
+        elif max_records_per_second:
+            rate_limit_filter = RateLimitFilter(max_records_per_second)
+            for handler in logging.getLogger("pokemon_agent").handlers:
+                handler.addFilter(rate_limit_filter)
+        _active_settings = settings
+
+
+def _configure_logging(log_level: str, log_file: Optional[str], log_format: Optional[str], json_format: bool) -> None:
     if log_format is None:
         log_format = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
     
@@ -37,13 +177,16 @@ def setup_logging(
             "detailed": {
                 "format": "%(asctime)s - %(name)s - %(levelname)s - %(funcName)s:%(lineno)d - %(message)s",
                 "datefmt": "%Y-%m-%d %H:%M:%S"
+            },
+            "json": {
+                "()": JsonFormatter
             }
         },
         "handlers": {
             "console": {
                 "class": "logging.StreamHandler",
                 "level": log_level,
-                "formatter": "standard",
+                "formatter": "json" if json_format else "standard",
                 "stream": "ext://sys.stdout"
             }
         },
@@ -75,7 +218,7 @@ def setup_logging(
         config["handlers"]["file"] = {
             "class": "logging.handlers.RotatingFileHandler",
             "level": log_level,
-            "formatter": "detailed",
+            "formatter": "json" if json_format else "detailed",
             "filename": log_file,
             "maxBytes": 10485760,  # 10MB
             "backupCount": 5
@@ -87,6 +230,9 @@ def setup_logging(
     logging.config.dictConfig(config)
 
 
+atexit.register(_stop_queue_listener)
+
+
 def get_logger(name: str) -> logging.Logger:
     """
     Get a logger instance for a specific module.
@@ -1,72 +1,200 @@
-from langgraph.graph import StateGraph, START, END
-from langgraph.prebuilt import ToolNode, tools_condition
+from functools import lru_cache, partial
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from attrs import Factory, frozen
 
-from src.pokemon_agent_nodes import check_input, format_output, pokemon_agent
-from src.pokemon_state import PokemonState
-from src.pokemon_agent_tools import tools
 from src.logging_config import setup_logging, get_logger
 
-# Setup logging for the project
-if __name__ == "__main__":
-    setup_logging(log_level="INFO")
+# langgraph, the nodes and the model client are imported when the graph is first built,
+# so importing this module stays cheap and free of side effects
+if TYPE_CHECKING:
+    from langgraph.graph.state import CompiledStateGraph
 
 logger = get_logger(__name__)
 
+DEFAULT_GRAPH_IMAGE_PATH = "pokemon_agent_graph.png"
+
+
+def _default_history_max_turns() -> int:
+    from src.pokemon_sessions import DEFAULT_HISTORY_MAX_TURNS
+
+    return DEFAULT_HISTORY_MAX_TURNS
+
+
+@frozen
+class GraphConfig:
+    """Options used to build the Pokemon Agent StateGraph.
+
+    Graphs with a session_store ("memory" or "sqlite") keep each thread's state
+    between runs, pass the session ID as the thread_id in the run's configurable.
+    """
+    deterministic: bool = True
+    metrics: bool = True
+    session_store: str | None = None
+    # Defaults to the sessions module's DEFAULT_HISTORY_MAX_TURNS, read on first use to keep this import cheap
+    history_max_turns: int | None = Factory(_default_history_max_turns)
+    history_max_tokens: int | None = None
 
-def validate_input(state: PokemonState) -> str:
-    """Determine the next step based on spam classification"""
-    is_valid = state["is_input_valid"]
-    logger.debug(f"Input validation result: {is_valid}")
-    
-    if is_valid:
-        logger.info("Input is valid, proceeding to pokemon agent")
-        return "valid_input"
+
+def build_graph(config: GraphConfig) -> "CompiledStateGraph":
+    """Build and compile the Pokemon Agent StateGraph.
+
+    Args:
+        config: The options used to build the graph.
+
+    Returns:
+        The compiled graph.
+    """
+    from langchain_core.runnables import RunnableLambda
+    from langgraph.graph import StateGraph, START, END
+    from langgraph.prebuilt import ToolNode, tools_condition
+
+    from src.pokemon_agent_nodes import (
+        acheck_input,
+        aformat_output,
+        aload_cached_answer,
+        alookup_each_pokemon,
+        alookup_matchups,
+        alookup_pokemon,
+        alookup_team,
+        apokemon_agent,
+        check_input,
+        format_output,
+        load_cached_answer,
+        lookup_each_pokemon,
+        lookup_matchups,
+        lookup_pokemon,
+        lookup_team,
+        pokemon_agent,
+    )
+    from src.pokemon_agent_routes import route_uncached_input, validate_input
+    from src.pokemon_metrics import MetricsCallbackHandler, get_metrics, with_trace_id
+    from src.pokemon_sessions import HistoryPolicy, get_checkpointer, trim_history_node
+    from src.pokemon_state import PokemonState
+    from src.pokemon_agent_tools import tools
+
+    logger.info("Building Pokemon Agent StateGraph")
+    builder = StateGraph(PokemonState)
+
+    # Add nodes to the graph
+    # Each node runs its sync version under invoke/stream and its async version under ainvoke/astream
+    logger.debug("Adding nodes to the graph")
+    # check_input also stores the request's trace ID in the state
+    builder.add_node("check_input", RunnableLambda(with_trace_id(check_input), afunc=with_trace_id(acheck_input)))
+    if config.session_store is not None:
+        history_policy = HistoryPolicy(max_turns=config.history_max_turns, max_tokens=config.history_max_tokens)
+        builder.add_node("trim_history", trim_history_node(history_policy))
+    builder.add_node("load_cached_answer", RunnableLambda(load_cached_answer, afunc=aload_cached_answer))
+    builder.add_node("pokemon_agent", RunnableLambda(pokemon_agent, afunc=apokemon_agent))
+    builder.add_node("lookup_pokemon", RunnableLambda(lookup_pokemon, afunc=alookup_pokemon))
+    # Runs once per pokemon of a multi-pokemon input, see route_uncached_input
+    builder.add_node("lookup_each_pokemon", RunnableLambda(lookup_each_pokemon, afunc=alookup_each_pokemon))
+    builder.add_node("lookup_matchups", RunnableLambda(lookup_matchups, afunc=alookup_matchups))
+    builder.add_node("lookup_team", RunnableLambda(lookup_team, afunc=alookup_team))
+    builder.add_node("tools", ToolNode(tools))
+    builder.add_node("format_output", RunnableLambda(format_output, afunc=aformat_output))
+
+    # Add edges to the graph
+    logger.debug("Adding edges to the graph")
+    if config.session_store is not None:
+        builder.add_edge(START, "trim_history")
+        builder.add_edge("trim_history", "check_input")
     else:
-        logger.info("Input is invalid, skipping to output formatting")
-        return "invalid_input"
-
-
-logger.info("Building Pokemon Agent StateGraph")
-builder = StateGraph(PokemonState)
-
-# Add nodes to the graph
-logger.debug("Adding nodes to the graph")
-builder.add_node("check_input", check_input)
-builder.add_node("pokemon_agent", pokemon_agent)
-builder.add_node("tools", ToolNode(tools))
-builder.add_node("format_output", format_output)
-
-# Add edges to the graph
-logger.debug("Adding edges to the graph")
-builder.add_edge(START, "check_input")
-builder.add_conditional_edges(
-    "check_input",
-    validate_input,
-    {
-        "valid_input": "pokemon_agent",
-        "invalid_input": "format_output"
-    }
-)
-builder.add_conditional_edges(
-    "pokemon_agent",
-    tools_condition,
-    {
-        "tools": "tools",
-        "__end__": "format_output"
-    }
-)
-builder.add_edge("tools", "pokemon_agent")
-builder.add_edge("format_output", END)
-
-logger.info("Compiling the StateGraph")
-compiled_graph = builder.compile()
-
-logger.info("Generating graph visualization")
-compiled_graph.get_graph().draw_mermaid_png(
-    output_file_path="pokemon_agent_graph.png"   # ruta donde quieres el PNG
-)
-logger.info("Graph visualization saved to pokemon_agent_graph.png")
-logger.info("Pokemon Agent StateGraph setup completed successfully")
-
-# Export the compiled graph for use by runner scripts
-__all__ = ["compiled_graph"]
+        builder.add_edge(START, "check_input")
+    builder.add_conditional_edges(
+        "check_input",
+        validate_input,
+        {
+            "valid_input": "load_cached_answer",
+            "team_input": "lookup_team",
+            "matchup_input": "lookup_matchups",
+            "invalid_input": "format_output"
+        }
+    )
+    builder.add_conditional_edges(
+        "load_cached_answer",
+        partial(route_uncached_input, default_deterministic=config.deterministic),
+        {
+            "cached_answer": END,
+            "valid_input": "pokemon_agent",
+            "deterministic_input": "lookup_pokemon"
+        }
+    )
+    builder.add_edge("lookup_pokemon", "format_output")
+    builder.add_edge("lookup_each_pokemon", "format_output")
+    builder.add_edge("lookup_team", "format_output")
+    builder.add_edge("lookup_matchups", "format_output")
+    # The agent's last message, the one without tool calls, is the answer
+    builder.add_conditional_edges(
+        "pokemon_agent",
+        tools_condition,
+        {
+            "tools": "tools",
+            "__end__": END
+        }
+    )
+    builder.add_edge("tools", "pokemon_agent")
+    builder.add_edge("format_output", END)
+
+    logger.info("Compiling the StateGraph")
+    checkpointer = get_checkpointer(config.session_store) if config.session_store is not None else None
+    compiled_graph = builder.compile(checkpointer=checkpointer)
+    if config.metrics:
+        # Every run records node, LLM call and request latencies in the shared registry
+        compiled_graph = compiled_graph.with_config(callbacks=[MetricsCallbackHandler(get_metrics())])
+    logger.info("Pokemon Agent StateGraph setup completed successfully")
+    return compiled_graph
+
+
+@lru_cache(maxsize=None)
+def _get_compiled_graph(config: GraphConfig) -> "CompiledStateGraph":
+    return build_graph(config)
+
+
+def get_compiled_graph(config: GraphConfig | None = None) -> "CompiledStateGraph":
+    """Get the compiled graph, building it on first use.
+
+    Args:
+        config: The options used to build the graph, defaults to GraphConfig().
+
+    Returns:
+        The compiled graph, shared by every caller using the same config.
+    """
+    return _get_compiled_graph(config or GraphConfig())
+
+
+def draw_graph(output_path: str = DEFAULT_GRAPH_IMAGE_PATH, config: GraphConfig | None = None) -> Path:
+    """Render the graph to a PNG, this calls the remote Mermaid rendering service.
+
+    Args:
+        output_path: Where to write the PNG.
+        config: The options used to build the graph.
+
+    Returns:
+        The path of the written PNG.
+    """
+    logger.info("Generating graph visualization")
+    get_compiled_graph(config).get_graph().draw_mermaid_png(output_file_path=output_path)
+    logger.info("Graph visualization saved to %s", output_path)
+    return Path(output_path)
+
+
+def __getattr__(name: str):
+    # Keep `from src.main import compiled_graph` working without building the graph at import time
+    if name == "compiled_graph":
+        return get_compiled_graph()
+    if name == "DETERMINISTIC_MODE_KEY":
+        from src.pokemon_agent_routes import DETERMINISTIC_MODE_KEY
+
+        return DETERMINISTIC_MODE_KEY
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# Export the graph factory for use by runner scripts
+__all__ = ["compiled_graph", "get_compiled_graph", "build_graph", "draw_graph", "GraphConfig", "DETERMINISTIC_MODE_KEY"]
+
+
+if __name__ == "__main__":
+    setup_logging(log_level="INFO")
+    draw_graph()
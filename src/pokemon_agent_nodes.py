@@ -1,103 +1,570 @@
+import asyncio
+from collections.abc import Iterable, Iterator
 from typing import Any
 
-from langchain_core.messages import SystemMessage, HumanMessage, AIMessage
-import pokebase as pb
+from attrs import define, field
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
 
-from src.pokemon_agent_tools import get_pokemon_types, get_type_chart, llm, llm_with_tools
-from src.pokemon_agent_prompts import EXTRACT_POKEMON_NAME_PROMPT, FORMAT_INVALID_INPUT_RESPONSE_PROMPT, MAIN_POKEMON_ASSISTANT_PROMPT, PokemonNameOutput
-from src.pokemon_state import PokemonState
+from src.pokemon_agent_tools import (
+    afind_pokemon_by_matchup,
+    aget_pokemon_types,
+    aget_type_chart,
+    aresolve_pokemon,
+    find_pokemon_by_matchup,
+    get_llm,
+    get_llm_with_tools,
+    get_pokemon_types,
+    get_type_chart,
+    resolve_pokemon,
+)
+from src.pokemon_cache import NO_POKEMON_FOUND, get_answer_cache, get_extraction_cache
+from src.pokemon_matchup_index import MatchupQuery, parse_matchup_query
+from src.pokemon_name_resolver import RESOLVER_CONFIDENCE_THRESHOLD, resolve_pokemon_names
+from src.pokemon_agent_prompts import (
+    EXTRACT_POKEMON_NAME_PROMPT,
+    FORMAT_INVALID_INPUT_RESPONSE_PROMPT,
+    MAIN_POKEMON_ASSISTANT_PROMPT,
+    MAX_NAME_CANDIDATES,
+    PokemonNameOutput,
+    prompt_messages,
+)
+from src.pokemon_record import PokemonRecord
+from src.pokemon_sessions import is_follow_up
+from src.pokemon_species_index import get_species_index
+from src.pokemon_state import PokemonState, SessionLookup
+from src.pokemon_team_analysis import analyze_team, is_team_question
+from src.pokemon_type_chart import PokemonTypeChart
 from src.logging_config import get_logger
 
 logger = get_logger(__name__)
 
+# Pokemon looked up for a single input, the rest of a longer list is ignored
+MAX_POKEMON_PER_INPUT = 6
+# LLM extractions per input, a new one is only requested when every candidate of the last one failed
+MAX_EXTRACTION_ATTEMPTS = 3
+# Joins the names of a multi-pokemon extraction in the extraction cache and in answer cache keys
+POKEMON_NAME_SEPARATOR = ","
+
+
+def _unique_pokemon(pokemon_records: Iterable[PokemonRecord | None]) -> list[PokemonRecord]:
+    """Resolved pokemon in order, without unknown names and repeats"""
+    return list({pokemon.name: pokemon for pokemon in pokemon_records if pokemon is not None}.values())
+
+
+def _valid_input(
+    user_message: str,
+    pokemon_list: list[PokemonRecord],
+    session_lookups: dict[str, SessionLookup]
+) -> dict[str, Any]:
+    """Node update for the validated pokemon, remembering them as the session's latest pokemon"""
+    if len(pokemon_list) > MAX_POKEMON_PER_INPUT:
+        logger.warning("Input names %d pokemon, only the first %d are looked up", len(pokemon_list), MAX_POKEMON_PER_INPUT)
+        pokemon_list = pokemon_list[:MAX_POKEMON_PER_INPUT]
+
+    return {
+        "is_input_valid": True,
+        "extraction_notes": None,
+        "pokemon_name": pokemon_list[0].name,
+        "pokemon": pokemon_list[0],
+        "all_pokemon": tuple(pokemon_list),
+        "is_team_question": len(pokemon_list) > 1 and is_team_question(user_message),
+        "matchup_query": None,
+        "session_lookups": {
+            pokemon.name: session_lookups.get(pokemon.name) or SessionLookup(pokemon=pokemon)
+            for pokemon in pokemon_list
+        },
+    }
+
+
+def _invalid_input(extraction_notes: list[str] | None = None) -> dict[str, Any]:
+    # The notes are always set, a session must not carry those of an earlier turn
+    return {
+        "is_input_valid": False,
+        "extraction_notes": extraction_notes or None,
+        "pokemon_name": None,
+        "pokemon": None,
+        "all_pokemon": None,
+        "is_team_question": False,
+        "matchup_query": None,
+    }
+
+
+def _matchup_input(matchup_query: MatchupQuery) -> dict[str, Any]:
+    """Node update for a reverse question, which names types instead of a pokemon"""
+    return {
+        "is_input_valid": True,
+        "extraction_notes": None,
+        "pokemon_name": None,
+        "pokemon": None,
+        "all_pokemon": None,
+        "is_team_question": False,
+        "matchup_query": matchup_query,
+    }
+
+
+def _llm_model_name() -> str:
+    llm = get_llm()
+    return getattr(llm, "model_name", type(llm).__name__)
+
+
+def _cache_extraction(user_message: str, pokemon_list: list[PokemonRecord]) -> None:
+    # No pokemon joins to NO_POKEMON_FOUND, which is cached with the shorter TTL
+    pokemon_names = POKEMON_NAME_SEPARATOR.join(pokemon.name for pokemon in pokemon_list)
+    get_extraction_cache().set(user_message, _llm_model_name(), pokemon_names)
+
+
+def _ranked_candidates(extraction: PokemonNameOutput) -> list[list[str]]:
+    """Candidate names of every mentioned pokemon, most confident first"""
+    ranked_candidates = []
+    for mention in extraction["pokemon_mentions"]:
+        candidates = sorted(mention["candidates"], key=lambda candidate: candidate["confidence"], reverse=True)
+        candidate_names = [candidate["pokemon_name"].lower() for candidate in candidates[:MAX_NAME_CANDIDATES] if candidate["pokemon_name"]]
+        if candidate_names:
+            ranked_candidates.append(candidate_names)
+    return ranked_candidates
+
+
+def _local_pokemon(candidate_names: list[str]) -> PokemonRecord | None:
+    """The most confident candidate in the species index, without any I/O"""
+    species_index = get_species_index()
+    if species_index is None:
+        return None
+    return next(filter(None, map(species_index.lookup, candidate_names)), None)
+
+
+def _validate_candidates(ranked_candidates: list[list[str]]) -> list[PokemonRecord]:
+    """Validate every mention's candidates together, only mentions with no local match query the data source"""
+    pokemon_list = [_local_pokemon(candidate_names) for candidate_names in ranked_candidates]
+    for position, candidate_names in enumerate(ranked_candidates):
+        if pokemon_list[position] is None:
+            pokemon_list[position] = next(filter(None, map(resolve_pokemon, candidate_names)), None)
+    return _unique_pokemon(pokemon_list)
+
+
+async def _avalidate_candidates(ranked_candidates: list[list[str]]) -> list[PokemonRecord]:
+    """Async version of _validate_candidates, the data source is queried for all the remaining candidates in one concurrent batch"""
+    pokemon_list = [_local_pokemon(candidate_names) for candidate_names in ranked_candidates]
+    remaining_names = list(dict.fromkeys(
+        candidate_name
+        for candidate_names, pokemon in zip(ranked_candidates, pokemon_list) if pokemon is None
+        for candidate_name in candidate_names
+    ))
+    if remaining_names:
+        resolved = dict(zip(remaining_names, await asyncio.gather(*map(aresolve_pokemon, remaining_names))))
+        pokemon_list = [
+            pokemon or next(filter(None, map(resolved.get, candidate_names)), None)
+            for candidate_names, pokemon in zip(ranked_candidates, pokemon_list)
+        ]
+    return _unique_pokemon(pokemon_list)
+
+
+@define
+class _InputCheck:
+    """The steps of check_input and acheck_input, each node only runs the calls that differ between the two.
+
+    The local resolution and the extraction cache run first. On a miss every LLM
+    extraction attempt sends the extraction prompt with the notes of the earlier
+    attempts, so the model proposes different candidates when all the previous ones failed.
+    """
+    user_message: str
+    session_lookups: dict[str, SessionLookup]
+    # Settled without the LLM, by the local resolution or the extraction cache
+    pokemon_names: list[str] | None = None
+    messages: list = field(init=False)
+    ranked_candidates: list[list[str]] | None = None
+    extraction_failed: bool = False
+    extraction_notes: list[str] = field(factory=list)
+
+    def __attrs_post_init__(self):
+        self.messages = prompt_messages(EXTRACT_POKEMON_NAME_PROMPT, [HumanMessage(content=self.user_message)])
+
+    @classmethod
+    def from_state(cls, state: PokemonState) -> "_InputCheck":
+        logger.debug("Starting input validation process")
+        user_message = state["messages"][-1].content
+        logger.debug("User message: %s", user_message)
+        return cls(user_message, state.get("session_lookups") or {})
+
+    def local_result(self) -> dict[str, Any] | None:
+        """Node update when the input is settled without the LLM or the data source.
+
+        Names resolved locally or by an earlier extraction are left in pokemon_names
+        for the node to look up, the only step that may call the data source.
+        """
+        if not self.user_message:
+            logger.warning("Empty user message received")
+            return _invalid_input()
+
+        # Most inputs name the pokemon plainly, resolve those locally before paying for an LLM call
+        resolutions = resolve_pokemon_names(self.user_message)
+        confident_resolutions = [
+            resolution for resolution in resolutions if resolution.confidence >= RESOLVER_CONFIDENCE_THRESHOLD
+        ]
+        # Every mention has to be confident, e.g. "pikachu vs bulbasuar" needs the LLM to settle bulbasuar
+        if confident_resolutions and len(confident_resolutions) == len(resolutions):
+            self.pokemon_names = [resolution.pokemon_name for resolution in resolutions]
+            logger.debug(
+                "Resolved pokemon locally: %s (confidence: %.2f)",
+                self.pokemon_names, min(resolution.confidence for resolution in resolutions)
+            )
+            return None
+
+        # Follow-up questions in a session are about the pokemon of the previous turn
+        if not confident_resolutions and self.session_lookups and is_follow_up(self.user_message):
+            session_lookup = next(reversed(self.session_lookups.values()))
+            logger.debug("Follow-up question about the session's pokemon: %s", session_lookup.pokemon.name)
+            return _valid_input(self.user_message, [session_lookup.pokemon], self.session_lookups)
+
+        # Reverse questions such as "which pokemon are immune to ground?" are answered from the matchup index
+        matchup_query = parse_matchup_query(self.user_message) if not confident_resolutions else None
+        if matchup_query is not None:
+            logger.debug("Reverse question about pokemon %s", matchup_query)
+            return _matchup_input(matchup_query)
+
+        # Near-identical inputs were already extracted, reuse the result instead of calling the LLM again
+        cached_pokemon_names = get_extraction_cache().get(self.user_message, _llm_model_name())
+        if cached_pokemon_names == NO_POKEMON_FOUND:
+            logger.debug("Cached extraction found no pokemon in the input")
+            return _invalid_input()
+        if cached_pokemon_names:
+            self.pokemon_names = cached_pokemon_names.split(POKEMON_NAME_SEPARATOR)
+            logger.debug("Using cached extraction: %s", self.pokemon_names)
+            return None
+
+        logger.debug("Local resolution not confident enough, extracting with the LLM")
+        return None
+
+    def unresolved_names(self) -> list[str]:
+        """The pokemon_names whose records are not in the session yet"""
+        return [pokemon_name for pokemon_name in self.pokemon_names if pokemon_name not in self.session_lookups]
+
+    def resolved_result(self, pokemon_records: Iterable[PokemonRecord | None]) -> dict[str, Any] | None:
+        """Node update for pokemon_names given the records of unresolved_names, or None when the LLM is needed after all"""
+        resolved_records = dict(zip(self.unresolved_names(), pokemon_records))
+        pokemon_list = _unique_pokemon(
+            self.session_lookups[pokemon_name].pokemon if pokemon_name in self.session_lookups
+            else resolved_records[pokemon_name]
+            for pokemon_name in self.pokemon_names
+        )
+        if not pokemon_list:
+            logger.warning("None of the pokemon %s could be resolved", self.pokemon_names)
+            return None
+        return _valid_input(self.user_message, pokemon_list, self.session_lookups)
+
+    def attempts(self) -> Iterator[int]:
+        """Number the extraction attempts, an attempt the loop body completes without returning adds its retry note"""
+        for attempt_number in range(MAX_EXTRACTION_ATTEMPTS):
+            logger.debug("Attempt %d to extract the pokemon names", attempt_number + 1)
+            self.ranked_candidates = None
+            yield attempt_number
+            self._add_retry_note()
+        logger.error("Failed to extract valid pokemon names after %d attempts", MAX_EXTRACTION_ATTEMPTS)
+
+    def _add_retry_note(self) -> None:
+        if self.ranked_candidates is None:
+            extraction_note = "The Pokemon names could not be extracted, let's try again."
+        else:
+            extraction_note = f"None of the candidate names {self.ranked_candidates} are valid Pokemon names, let's try again."
+        # The note only joins the messages of the next extraction attempt, not the graph's messages
+        self.messages.append(AIMessage(content=extraction_note))
+        self.extraction_notes.append(extraction_note)
+
+    def candidates(self, extraction: PokemonNameOutput) -> list[list[str]]:
+        """Rank the candidates of an extraction, an empty list means the model found no pokemon"""
+        self.ranked_candidates = _ranked_candidates(extraction)
+        if not self.ranked_candidates:
+            logger.debug("The LLM found no pokemon in the input")
+        return self.ranked_candidates
+
+    def validated(self, pokemon_list: list[PokemonRecord]) -> dict[str, Any] | None:
+        """Node update for the validated candidates, or None when none of them exist"""
+        if not pokemon_list:
+            logger.warning("Failed to validate any of the candidates %s", self.ranked_candidates)
+            return None
+
+        logger.debug("Successfully validated pokemon: %s", [pokemon.name for pokemon in pokemon_list])
+        _cache_extraction(self.user_message, pokemon_list)
+        return _valid_input(self.user_message, pokemon_list, self.session_lookups)
+
+    def failed(self, error: Exception) -> None:
+        logger.warning("Failed to validate the candidates %s: %s", self.ranked_candidates, error)
+        self.extraction_failed = True
+
+    def invalid_input(self) -> dict[str, Any]:
+        # Only cache "no pokemon" answers from the model, not errors talking to it
+        if not self.extraction_failed:
+            _cache_extraction(self.user_message, [])
+        return _invalid_input(self.extraction_notes)
+
 
 def check_input(state: PokemonState) -> dict[str, Any]:
     """Check's if the user's input is valid"""
-    logger.info("Starting input validation process")
-    
-    user_message = state["messages"][-1].content
-    logger.debug(f"User message: {user_message}")
-
-    if not user_message:
-        logger.warning("Empty user message received")
-        return {"is_input_valid": False, "pokemon_name": None}
-
-    llm_with_structured_output = llm.with_structured_output(PokemonNameOutput)
-    system_message = SystemMessage(content=EXTRACT_POKEMON_NAME_PROMPT)
-    messages = [system_message, HumanMessage(content=user_message)]
-    
-    for attempt_number in range(3):
-        logger.info(f"Attempt {attempt_number + 1} to extract the pokemon name")
+    input_check = _InputCheck.from_state(state)
+    local_result = input_check.local_result()
+    if local_result is not None:
+        return local_result
+
+    if input_check.pokemon_names:
+        resolved_result = input_check.resolved_result(map(resolve_pokemon, input_check.unresolved_names()))
+        if resolved_result is not None:
+            return resolved_result
 
+    llm_with_structured_output = get_llm().with_structured_output(PokemonNameOutput)
+    for _ in input_check.attempts():
         try:
-            extracted_pokemon_name = llm_with_structured_output.invoke(messages)["pokemon_name"].lower()
-
-            # Validate pokemon exists in the PokeAPI
-            expected_pokemon = pb.pokemon(extracted_pokemon_name)
-            if expected_pokemon.id:
-                logger.info(f"Successfully validated pokemon: {extracted_pokemon_name} (ID: {expected_pokemon.id})")
-                return {"is_input_valid": True, "pokemon_name": extracted_pokemon_name.lower()}
-                
+            ranked_candidates = input_check.candidates(llm_with_structured_output.invoke(input_check.messages))
+            if not ranked_candidates:
+                # The model found no pokemon at all, asking again would not change that
+                break
+
+            # Validate every mention's candidates in one pass, unknown mentions are dropped
+            valid_result = input_check.validated(_validate_candidates(ranked_candidates))
+            if valid_result is not None:
+                return valid_result
         except Exception as e:
-            logger.warning(f"Failed to validate pokemon '{extracted_pokemon_name}': {str(e)}")
-            messages.append(AIMessage(content=f"The extracted pokemon name {extracted_pokemon_name} is not a valid Pokemon name, let's try again."))
+            input_check.failed(e)
+
+    return input_check.invalid_input()
+
+
+async def acheck_input(state: PokemonState) -> dict[str, Any]:
+    """Async version of check_input"""
+    input_check = _InputCheck.from_state(state)
+    local_result = input_check.local_result()
+    if local_result is not None:
+        return local_result
+
+    if input_check.pokemon_names:
+        # The data source may be the PokeAPI, the records are resolved without blocking the event loop
+        resolved_result = input_check.resolved_result(
+            await asyncio.gather(*map(aresolve_pokemon, input_check.unresolved_names()))
+        )
+        if resolved_result is not None:
+            return resolved_result
+
+    llm_with_structured_output = get_llm().with_structured_output(PokemonNameOutput)
+    for _ in input_check.attempts():
+        try:
+            ranked_candidates = input_check.candidates(await llm_with_structured_output.ainvoke(input_check.messages))
+            if not ranked_candidates:
+                # The model found no pokemon at all, asking again would not change that
+                break
+
+            # Validate every mention's candidates in one pass, unknown mentions are dropped
+            valid_result = input_check.validated(await _avalidate_candidates(ranked_candidates))
+            if valid_result is not None:
+                return valid_result
+        except Exception as e:
+            input_check.failed(e)
+
+    return input_check.invalid_input()
+
 
-    logger.error("Failed to extract valid pokemon name after 3 attempts")
-    return {"is_input_valid": False, "pokemon_name": None, "messages": messages}
+def _answer_cache_key(state: PokemonState) -> str:
+    """The validated pokemon names in order, a multi-pokemon answer is cached under all of them"""
+    all_pokemon = state.get("all_pokemon") or ()
+    if len(all_pokemon) > 1:
+        return POKEMON_NAME_SEPARATOR.join(pokemon.name for pokemon in all_pokemon)
+    return state["pokemon_name"]
+
+
+def load_cached_answer(state: PokemonState) -> dict[str, Any]:
+    """Short-circuit to the cached answer of the validated pokemon when there is one"""
+    answer_cache_key = _answer_cache_key(state)
+    cached_answer = get_answer_cache().get(answer_cache_key)
+    if cached_answer is None:
+        logger.debug("No cached answer for pokemon: %s", answer_cache_key)
+        return {"is_answer_cached": False}
+
+    logger.debug("Serving cached answer for pokemon: %s", answer_cache_key)
+    return {"is_answer_cached": True, "output_message": cached_answer, "messages": [AIMessage(content=cached_answer)]}
+
+
+async def aload_cached_answer(state: PokemonState) -> dict[str, Any]:
+    """Async version of load_cached_answer, both cache tiers are local so it never awaits I/O"""
+    return load_cached_answer(state)
+
+
+def _agent_result(response: AIMessage) -> dict[str, Any]:
+    """The agent's message, which is the answer once it stops calling tools"""
+    logger.debug("Pokemon agent response: %s", response)
+    if response.tool_calls:
+        return {"messages": [response]}
+    return _output(response)
 
 
 def pokemon_agent(state: PokemonState) -> dict[str, Any]:
-    """The agent that will be used to get the pokemon's type"""
-    logger.info("Starting pokemon agent processing")
-    textual_description_of_tool="""get_pokemon_types(pokemon_name: str) -> list[str]:
-                                    Get the type of a pokemon.
-                                    
-                                    Args:
-                                        pokemon_name: The name of the pokemon.
-
-                                    Returns:
-                                        A list of pokemon types.
-    
-                                get_type_chart(pokemon_types: list[str]) -> PokemonTypeChart:
-                                    Get the type chart for a pokemon.
-                                    
-                                    Args:
-                                        pokemon_types: A list of pokemon types.
-
-                                    Returns:
-                                        A PokemonTypeChart object.
-                                """
-    sys_msg = SystemMessage(content=MAIN_POKEMON_ASSISTANT_PROMPT.format(textual_description_of_tool))
-    
-    logger.info(llm_with_tools.invoke([sys_msg] + state["messages"]))
-
-    pokemon_types = get_pokemon_types(state["pokemon_name"])
-    pokemon_type_chart = get_type_chart(pokemon_types)
-    
+    """The agent answering with the tools it calls, tools_condition runs the tool calls of its message"""
+    logger.debug("Starting pokemon agent processing")
+    # The tool schemas are sent by bind_tools, the system prompt does not repeat them
+    return _agent_result(get_llm_with_tools().invoke(prompt_messages(MAIN_POKEMON_ASSISTANT_PROMPT, state["messages"])))
+
+
+async def apokemon_agent(state: PokemonState) -> dict[str, Any]:
+    """Async version of pokemon_agent"""
+    logger.debug("Starting pokemon agent processing")
+    return _agent_result(await get_llm_with_tools().ainvoke(prompt_messages(MAIN_POKEMON_ASSISTANT_PROMPT, state["messages"])))
+
+
+def _session_lookup_result(state: PokemonState) -> dict[str, Any] | None:
+    """Types and type chart already looked up for this pokemon earlier in the session"""
+    session_lookup = (state.get("session_lookups") or {}).get(state["pokemon_name"])
+    if session_lookup is None or session_lookup.pokemon_type_chart is None:
+        return None
+
+    logger.debug("Reusing the session's lookup of pokemon: %s", state["pokemon_name"])
     return {
+        "pokemon_types": session_lookup.pokemon_types,
+        "pokemon_type_chart": session_lookup.pokemon_type_chart
+    }
+
+
+def _lookup_result(state: PokemonState, pokemon_types: list[str], pokemon_type_chart: PokemonTypeChart) -> dict[str, Any]:
+    result = {
         "pokemon_types": pokemon_types,
         "pokemon_type_chart": pokemon_type_chart
     }
+    if state.get("pokemon") is not None:
+        result["session_lookups"] = {state["pokemon_name"]: SessionLookup(state["pokemon"], tuple(pokemon_types), pokemon_type_chart)}
+    return result
 
 
-def format_output(state: PokemonState) -> dict[str, Any]:
-    """Format the output of the agent and print it"""
-    logger.info("Formatting output")
-    
-    is_valid = state.get("is_input_valid", False)
-    
-    if is_valid:
-        pokemon_name = state.get("pokemon_name")
-        pokemon_types = state.get("pokemon_types")
-        pokemon_type_chart = state.get("pokemon_type_chart")
-
-        logger.info(f"Formatting valid response for pokemon: {pokemon_name}")
-
-        output_message = f"The pokemon {pokemon_name} has the following types: {pokemon_types}.\nThis is the type chart with the types that are super effective, effective, resistant, super resistant and immune to the pokemon:\n{str(pokemon_type_chart)}"
+def lookup_pokemon(state: PokemonState) -> dict[str, Any]:
+    """Get the validated pokemon's types and type chart by calling the tools directly, without the LLM"""
+    logger.debug("Looking up pokemon types and type chart")
+    session_result = _session_lookup_result(state)
+    if session_result is not None:
+        return session_result
+
+    pokemon_types = get_pokemon_types(state["pokemon_name"], state.get("pokemon"))
+    pokemon_type_chart = get_type_chart(pokemon_types)
+    return _lookup_result(state, pokemon_types, pokemon_type_chart)
+
+
+async def alookup_pokemon(state: PokemonState) -> dict[str, Any]:
+    """Async version of lookup_pokemon"""
+    logger.debug("Looking up pokemon types and type chart")
+    session_result = _session_lookup_result(state)
+    if session_result is not None:
+        return session_result
+
+    pokemon_types = await aget_pokemon_types(state["pokemon_name"], state.get("pokemon"))
+    pokemon_type_chart = await aget_type_chart(pokemon_types)
+    return _lookup_result(state, pokemon_types, pokemon_type_chart)
+
+
+def _fan_out_result(state: PokemonState, lookup_result: dict[str, Any]) -> dict[str, Any]:
+    """Only the session_lookups reducer takes the result, parallel branches cannot share the single-value fields"""
+    session_lookup = SessionLookup(state["pokemon"], tuple(lookup_result["pokemon_types"]), lookup_result["pokemon_type_chart"])
+    return {"session_lookups": {state["pokemon_name"]: session_lookup}}
+
+
+def lookup_each_pokemon(state: PokemonState) -> dict[str, Any]:
+    """Look up one pokemon of a multi-pokemon input, the graph sends each pokemon to its own parallel run of this node"""
+    return _fan_out_result(state, lookup_pokemon(state))
+
+
+async def alookup_each_pokemon(state: PokemonState) -> dict[str, Any]:
+    """Async version of lookup_each_pokemon"""
+    return _fan_out_result(state, await alookup_pokemon(state))
+
+
+def lookup_team(state: PokemonState) -> dict[str, Any]:
+    """Analyse the validated pokemon as one team, the members' types are already in their records"""
+    logger.debug("Analysing team: %s", [pokemon.name for pokemon in state["all_pokemon"]])
+    return {"team_analysis": analyze_team(state["all_pokemon"])}
+
+
+async def alookup_team(state: PokemonState) -> dict[str, Any]:
+    """Async version of lookup_team, the analysis is local so it never awaits I/O"""
+    return lookup_team(state)
+
+
+def _matchup_arguments(matchup_query: MatchupQuery) -> dict[str, list[str]]:
+    return {
+        "weak_to": list(matchup_query.weak_to),
+        "resists": list(matchup_query.resists),
+        "immune_to": list(matchup_query.immune_to)
+    }
+
+
+def lookup_matchups(state: PokemonState) -> dict[str, Any]:
+    """Find the pokemon matching a reverse question in the matchup index, without the LLM"""
+    logger.debug("Finding pokemon %s", state["matchup_query"])
+    return {"matchup_pokemon": find_pokemon_by_matchup(**_matchup_arguments(state["matchup_query"]))}
+
+
+async def alookup_matchups(state: PokemonState) -> dict[str, Any]:
+    """Async version of lookup_matchups"""
+    logger.debug("Finding pokemon %s", state["matchup_query"])
+    return {"matchup_pokemon": await afind_pokemon_by_matchup(**_matchup_arguments(state["matchup_query"]))}
+
+
+def _matchup_answer(matchup_query: MatchupQuery, matchup_pokemon: list[str]) -> str:
+    if not matchup_pokemon:
+        return f"There are no pokemon {matchup_query}."
+    return f"The pokemon {matchup_query} are: {', '.join(matchup_pokemon)}."
+
+
+def _pokemon_answer(pokemon_name: str, pokemon_types: list[str], pokemon_type_chart: PokemonTypeChart) -> str:
+    return f"The pokemon {pokemon_name} has the following types: {list(pokemon_types)}.\nThis is the type chart with the types that are super effective, effective, resistant, super resistant and immune to the pokemon:\n{str(pokemon_type_chart)}"
+
+
+def _format_valid_output(state: PokemonState) -> str:
+    if state.get("matchup_query") is not None:
+        # Not cached, the answer cache is keyed by pokemon names
+        logger.debug("Formatting matchup answer for pokemon %s", state["matchup_query"])
+        return _matchup_answer(state["matchup_query"], state["matchup_pokemon"])
+
+    if state.get("is_team_question"):
+        # Not cached either, the answer cache keys a list of names to their separate answers
+        logger.debug("Formatting team analysis for pokemon: %s", [pokemon.name for pokemon in state["all_pokemon"]])
+        return str(state["team_analysis"])
+
+    all_pokemon = state.get("all_pokemon") or ()
+    if len(all_pokemon) > 1:
+        # Merge the fan-out results in the order the pokemon were mentioned
+        session_lookups = state["session_lookups"]
+        logger.debug("Formatting valid response for pokemon: %s", [pokemon.name for pokemon in all_pokemon])
+        output_message = "\n\n".join(
+            _pokemon_answer(pokemon.name, session_lookups[pokemon.name].pokemon_types, session_lookups[pokemon.name].pokemon_type_chart)
+            for pokemon in all_pokemon
+        )
     else:
-        sys_msg = SystemMessage(content=FORMAT_INVALID_INPUT_RESPONSE_PROMPT)
-        output_message = llm.invoke([sys_msg] + state["messages"]).content
+        logger.debug("Formatting valid response for pokemon: %s", state.get("pokemon_name"))
+        output_message = _pokemon_answer(state.get("pokemon_name"), state.get("pokemon_types"), state.get("pokemon_type_chart"))
+
+    get_answer_cache().set(_answer_cache_key(state), output_message)
+    return output_message
 
+
+def _invalid_input_prompt(state: PokemonState) -> list[BaseMessage]:
+    """The conversation followed by the extraction's retry notes, which tell the model why the input was rejected"""
+    extraction_notes = [AIMessage(content=extraction_note) for extraction_note in state.get("extraction_notes") or ()]
+    return prompt_messages(FORMAT_INVALID_INPUT_RESPONSE_PROMPT, [*state["messages"], *extraction_notes])
+
+
+def _output(answer: AIMessage) -> dict[str, Any]:
+    # The answer joins the history so later turns of a session see the conversation
     return {
-        "output_message": output_message
+        "output_message": answer.content,
+        "messages": [answer]
     }
+
+
+def format_output(state: PokemonState) -> dict[str, Any]:
+    """Format the output of the agent and print it"""
+    logger.debug("Formatting output")
+
+    if state.get("is_input_valid", False):
+        return _output(AIMessage(content=_format_valid_output(state)))
+    return _output(get_llm().invoke(_invalid_input_prompt(state)))
+
+
+async def aformat_output(state: PokemonState) -> dict[str, Any]:
+    """Async version of format_output"""
+    logger.debug("Formatting output")
+
+    if state.get("is_input_valid", False):
+        return _output(AIMessage(content=_format_valid_output(state)))
+    return _output(await get_llm().ainvoke(_invalid_input_prompt(state)))
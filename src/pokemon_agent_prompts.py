@@ -1,35 +1,80 @@
-
+import re
+from collections.abc import Sequence
+from functools import lru_cache
 from typing import Annotated, TypedDict
 
+from langchain_core.messages import BaseMessage, SystemMessage
+
+# Candidate names asked for, and kept, per mentioned Pokemon
+MAX_NAME_CANDIDATES = 3
+
+
+class PokemonNameCandidate(TypedDict):
+    pokemon_name: Annotated[str, ..., "A correctly spelled Pokemon name"]
+    confidence: Annotated[float, ..., "How likely it is the Pokemon the user meant, from 0 to 1"]
+
+
+class PokemonMention(TypedDict):
+    candidates: Annotated[list[PokemonNameCandidate], ..., f"Up to {MAX_NAME_CANDIDATES} candidate names for one mentioned Pokemon, most likely first"]
+
 
 class PokemonNameOutput(TypedDict):
-    pokemon_name: Annotated[str, ..., "The Pokemon name"]
+    pokemon_mentions: Annotated[list[PokemonMention], ..., "One entry per Pokemon mentioned, in the order they are mentioned"]
+
+
+def compact_prompt(prompt: str) -> str:
+    """Drop the source indentation, trailing whitespace and repeated blank lines of a prompt.
+
+    The wording is kept as is, only whitespace the model does not need is removed.
+    Every prompt below is compacted once at import, so each request sends the same
+    bytes and provider-side prompt caching can reuse the static prefix.
+    """
+    lines = [line.strip() for line in prompt.strip().splitlines()]
+    return re.sub(r"\n{3,}", "\n\n", "\n".join(lines))
+
+
+@lru_cache(maxsize=None)
+def _system_message(system_prompt: str) -> SystemMessage:
+    return SystemMessage(content=system_prompt)
+
+
+def prompt_messages(system_prompt: str, messages: Sequence[BaseMessage]) -> list[BaseMessage]:
+    """Build the messages of an LLM call, the static system prompt always comes first.
+
+    Args:
+        system_prompt: One of the compacted prompts of this module.
+        messages: The conversation the call is about.
+
+    Returns:
+        The system message followed by the conversation.
+    """
+    return [_system_message(system_prompt), *messages]
+
 
-EXTRACT_POKEMON_NAME_PROMPT = """You are a Pokemon expert with complete and perfect knowledge of all existing Pokemon names across all generations.
-                                 Task: Extract a single valid Pokémon name from the input text.
+EXTRACT_POKEMON_NAME_PROMPT = compact_prompt(f"""You are a Pokemon expert with complete and perfect knowledge of all existing Pokemon names across all generations.
+                                 Task: Find every Pokémon mentioned in the input text, in the order they are mentioned.
 
-                                 - If a Pokémon name is present, return only the correctly spelled Pokémon name as a single word.
-                                 - If the name is misspelled, correct it before returning.
-                                 - If no Pokémon name is found in the text, return an empty string.
-                                 - Output strictly one word: either the corrected Pokémon name, or an empty string.
-                              """
+                                 - For each mentioned Pokémon, return up to {MAX_NAME_CANDIDATES} correctly spelled candidate names, most likely first, each with a confidence from 0 to 1.
+                                 - If a name is misspelled or ambiguous, list the closest real Pokémon names as candidates.
+                                 - Return each Pokémon only once, even if it is mentioned several times.
+                                 - If no Pokémon is mentioned in the text, return an empty list.
+                              """)
 
-MAIN_POKEMON_ASSISTANT_PROMPT = """You are a knowledgeable and strategic Pokémon Master with deep expertise in the Pokémon type system.
+MAIN_POKEMON_ASSISTANT_PROMPT = compact_prompt("""You are a knowledgeable and strategic Pokémon Master with deep expertise in the Pokémon type system.
                                     When given the name of a specific Pokémon, your task is to analyze its type(s) and describe:
 
                                     Which types are strong against it (i.e., deal super-effective damage).
                                     Which types it is strong against (i.e., deals super-effective damage to).
                                     Which types it is resistant or vulnerable to.
 
-                                    You have access to the following tools to assist with your analysis:
-                                    {0}
+                                    Use the tools you are given to look up the Pokémon's types and type chart before answering.
 
                                     Return your output in a clear and concise format using bullet points or short paragraphs.
                                     If the Pokémon has dual types, account for all type interactions accurately.
                                     Always include type effectiveness explanations using the official Pokémon type chart logic.
-                                """
+                                """)
 
-FORMAT_INVALID_INPUT_RESPONSE_PROMPT = """You are a helpful, conversational assistant and a Pokémon type expert. Your sole purpose is to provide information about type matchups—specifically which types are strong or weak against a given Pokémon. You have many years of experience clarifying user questions, and you respond clearly and accurately.
+FORMAT_INVALID_INPUT_RESPONSE_PROMPT = compact_prompt("""You are a helpful, conversational assistant and a Pokémon type expert. Your sole purpose is to provide information about type matchups—specifically which types are strong or weak against a given Pokémon. You have many years of experience clarifying user questions, and you respond clearly and accurately.
 
                             Behavioral Instructions:
 
@@ -55,4 +100,4 @@ FORMAT_INVALID_INPUT_RESPONSE_PROMPT = """You are a helpful, conversational assi
 
                             User: What is strong against Xygloroth? (Invalid name)
                             Assistant: I couldn’t find that Pokémon. Please check the name and try again.
-                        """	
+                        """)
@@ -0,0 +1,58 @@
+from langchain_core.runnables import RunnableConfig
+from langgraph.types import Send
+
+from src.pokemon_state import PokemonState
+from src.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+# Set in the graph's configurable to override GraphConfig.deterministic for a single run
+DETERMINISTIC_MODE_KEY = "deterministic"
+
+
+def validate_input(state: PokemonState) -> str:
+    """Determine the next step based on spam classification"""
+    is_valid = state["is_input_valid"]
+    logger.debug("Input validation result: %s", is_valid)
+
+    if not is_valid:
+        logger.debug("Input is invalid, skipping to output formatting")
+        return "invalid_input"
+
+    if state.get("matchup_query") is not None:
+        logger.debug("Input is a reverse question, looking up the matching pokemon")
+        return "matchup_input"
+
+    if state.get("is_team_question"):
+        logger.debug("Input asks about a team, analysing it")
+        return "team_input"
+
+    logger.debug("Input is valid, checking the answer cache")
+    return "valid_input"
+
+
+def route_uncached_input(state: PokemonState, config: RunnableConfig, default_deterministic: bool = True) -> str | list[Send]:
+    """Determine how to answer a valid input based on the answer cache and the execution mode.
+
+    Inputs about several pokemon fan out in either mode, every pokemon is sent to its
+    own lookup_each_pokemon run and the runs execute in parallel.
+    """
+    if state.get("is_answer_cached"):
+        logger.debug("Answer served from cache, ending the run")
+        return "cached_answer"
+
+    all_pokemon = state.get("all_pokemon") or ()
+    if len(all_pokemon) > 1:
+        logger.debug("Input is valid, looking up %d pokemon in parallel", len(all_pokemon))
+        session_lookups = state.get("session_lookups") or {}
+        return [
+            Send("lookup_each_pokemon", {"pokemon_name": pokemon.name, "pokemon": pokemon, "session_lookups": session_lookups})
+            for pokemon in all_pokemon
+        ]
+
+    if config.get("configurable", {}).get(DETERMINISTIC_MODE_KEY, default_deterministic):
+        logger.debug("Input is valid, looking up the pokemon without the LLM")
+        return "deterministic_input"
+
+    logger.debug("Input is valid, proceeding to pokemon agent")
+    return "valid_input"
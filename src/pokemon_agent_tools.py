@@ -1,40 +1,175 @@
-from langchain_openai import ChatOpenAI
-import pokebase as pb
+import asyncio
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import TYPE_CHECKING, Annotated, Any, Iterator
 
-from src.pokemon_type_chart import PokemonTypeChart
+from attrs import define
+from langchain_core.tools import StructuredTool
+from langgraph.prebuilt import InjectedState
+
+from src.pokemon_data_sources import PokemonDataError, PokemonDataSource, get_data_source
+from src.pokemon_matchup_index import get_matchup_index
+from src.pokemon_metrics import record_data_source_call
+from src.pokemon_record import PokemonRecord
+from src.pokemon_team_analysis import MAX_TEAM_SIZE, TeamAnalysis, analyze_team
+from src.pokemon_type_chart import COMPACT_TYPE_CHARTS, PokemonTypeChart
+from src.pokemon_type_matrix import TYPE_INDEX, type_indexes
 from src.logging_config import get_logger
 
+if TYPE_CHECKING:
+    from langchain_core.language_models import BaseChatModel
+    from langchain_core.runnables import Runnable
+
 logger = get_logger(__name__)
 
+MAX_MATCHUP_RESULTS = 50
 
-def get_pokemon_types(pokemon_name: str) -> list[str]:
-    """Get the type of a pokemon.
+# Pending async lookups shared by every graph run inside shared_pokemon_lookups()
+_shared_lookups: ContextVar[dict[str, asyncio.Future] | None] = ContextVar("shared_lookups", default=None)
+
+
+@contextmanager
+def shared_pokemon_lookups() -> Iterator[None]:
+    """Resolve each pokemon at most once across all the async graph runs started inside the block."""
+    token = _shared_lookups.set({})
+    try:
+        yield
+    finally:
+        _shared_lookups.reset(token)
+
+
+@define
+class _DataSourceCall:
+    """The pokemon a data source call resolved, set inside _recorded_data_source_call"""
+    pokemon_record: PokemonRecord | None = None
+
+
+@contextmanager
+def _recorded_data_source_call(data_source: PokemonDataSource, pokemon_name: str) -> Iterator[_DataSourceCall]:
+    """Record the latency and outcome of a data source call, a PokemonDataError resolves no pokemon"""
+    data_source_call = _DataSourceCall()
+    started_at = time.perf_counter()
+    outcome = "error"
+    try:
+        yield data_source_call
+        outcome = "found" if data_source_call.pokemon_record is not None else "not_found"
+    except PokemonDataError as e:
+        logger.warning("Could not resolve pokemon %s: %s", pokemon_name, e)
+    finally:
+        record_data_source_call(type(data_source).__name__, outcome, time.perf_counter() - started_at)
+
+
+def resolve_pokemon(pokemon_name: str) -> PokemonRecord | None:
+    """Resolve a pokemon through the configured data source.
     
     Args:
         pokemon_name: The name of the pokemon.
 
     Returns:
-        A list of pokemon types.
+        The resolved PokemonRecord, or None if the pokemon does not exist or the data source failed.
     """
-    logger.info(f"Getting type for pokemon: {pokemon_name}")
+    data_source = get_data_source()
+    with _recorded_data_source_call(data_source, pokemon_name) as data_source_call:
+        data_source_call.pokemon_record = data_source.get_pokemon(pokemon_name)
+    return data_source_call.pokemon_record
+
+
+async def aresolve_pokemon(pokemon_name: str) -> PokemonRecord | None:
+    """Async version of resolve_pokemon.
     
+    Args:
+        pokemon_name: The name of the pokemon.
+
+    Returns:
+        The resolved PokemonRecord, or None if the pokemon does not exist.
+    """
+    shared_lookups = _shared_lookups.get()
+    if shared_lookups is None:
+        return await _aresolve_pokemon(pokemon_name)
+
+    lookup_key = pokemon_name.lower()
+    if lookup_key not in shared_lookups:
+        shared_lookups[lookup_key] = asyncio.ensure_future(_aresolve_pokemon(pokemon_name))
+    return await asyncio.shield(shared_lookups[lookup_key])
+
+
+async def _aresolve_pokemon(pokemon_name: str) -> PokemonRecord | None:
+    data_source = get_data_source()
+    with _recorded_data_source_call(data_source, pokemon_name) as data_source_call:
+        data_source_call.pokemon_record = await data_source.aget_pokemon(pokemon_name)
+    return data_source_call.pokemon_record
+
+
+def _is_valid_pokemon_name(pokemon_name: str) -> bool:
     if not pokemon_name:
         logger.warning("Invalid input: Pokemon name is empty")
-        return []
+        return False
     
     if not isinstance(pokemon_name, str):
         logger.warning("Invalid input: Pokemon name is not a string")
+        return False
+
+    return True
+
+
+def _pokemon_record_types(pokemon_name: str, pokemon_record: PokemonRecord | None) -> list[str]:
+    if pokemon_record is None:
+        logger.error("Error getting pokemon type for %s", pokemon_name)
         return []
+
+    pokemon_types = list(pokemon_record.types)
+    logger.debug("Pokemon %s has types: %s", pokemon_name, pokemon_types)
+    return pokemon_types
+
+
+def get_pokemon_types(
+    pokemon_name: str,
+    pokemon_record: Annotated[Any, InjectedState("pokemon")] = None
+) -> list[str]:
+    """Get the type of a pokemon.
     
-    try:
-        pokemon_data = pb.pokemon(pokemon_name.lower())
-        pokemon_types = [type.type.name for type in pokemon_data.types]
-        logger.info(f"Pokemon {pokemon_name} has types: {pokemon_types}")
-        return pokemon_types
-    except Exception as e:
-        logger.error(f"Error getting pokemon type for {pokemon_name}: {e}")
+    Args:
+        pokemon_name: The name of the pokemon.
+        pokemon_record: The PokemonRecord already resolved in the graph state, injected by the ToolNode.
+
+    Returns:
+        A list of pokemon types.
+    """
+    logger.debug("Getting type for pokemon: %s", pokemon_name)
+    if not _is_valid_pokemon_name(pokemon_name):
+        return []
+    
+    # Reuse the record resolved by check_input instead of resolving it again
+    if pokemon_record is None or pokemon_record.name != pokemon_name.lower():
+        pokemon_record = resolve_pokemon(pokemon_name)
+
+    return _pokemon_record_types(pokemon_name, pokemon_record)
+
+
+async def aget_pokemon_types(
+    pokemon_name: str,
+    pokemon_record: Annotated[Any, InjectedState("pokemon")] = None
+) -> list[str]:
+    """Async version of get_pokemon_types.
+    
+    Args:
+        pokemon_name: The name of the pokemon.
+        pokemon_record: The PokemonRecord already resolved in the graph state, injected by the ToolNode.
+
+    Returns:
+        A list of pokemon types.
+    """
+    logger.debug("Getting type for pokemon: %s", pokemon_name)
+    if not _is_valid_pokemon_name(pokemon_name):
         return []
 
+    if pokemon_record is None or pokemon_record.name != pokemon_name.lower():
+        pokemon_record = await aresolve_pokemon(pokemon_name)
+
+    return _pokemon_record_types(pokemon_name, pokemon_record)
+
 
 def get_type_chart(pokemon_types: list[str]) -> PokemonTypeChart:
     """Get the type chart for a pokemon.
@@ -45,7 +180,7 @@ def get_type_chart(pokemon_types: list[str]) -> PokemonTypeChart:
     Returns:
         A PokemonTypeChart object.
     """
-    logger.info(f"Getting type chart for types: {pokemon_types}")
+    logger.debug("Getting type chart for types: %s", pokemon_types)
     if not pokemon_types:
         logger.warning("Invalid input: Pokemon type is empty")
         return PokemonTypeChart()
@@ -54,63 +189,185 @@ def get_type_chart(pokemon_types: list[str]) -> PokemonTypeChart:
         logger.warning("Invalid input: Pokemon type is not a list")
         return PokemonTypeChart()
     
-    type_key_map = {
-        "double_damage_from": 2,
-        "half_damage_from": 0.5,
-        "no_damage_from": 0,
-    }
-
-    raw_type_charts = []
-    types_available = set()
-    logger.info(f"Getting type chart for types: {pokemon_types}")
-    for pokemon_type in pokemon_types:
-        type_chart = {}
-        type_data = pb.type_(pokemon_type)
-        for type_key, type_value in type_key_map.items():
-            type_chart.update({ t.name: type_value for t in getattr(type_data.damage_relations, type_key, []) })
-            types_available.update(type_chart.keys())
-        raw_type_charts.append(type_chart)
-
-    type_charts = {}
-    if len(pokemon_types) == 1:
-        type_charts = raw_type_charts[0]
-    else:
-        for pokemon_type in types_available:
-            type_value_1 = raw_type_charts[0].get(pokemon_type, 1)
-            type_value_2 = raw_type_charts[1].get(pokemon_type, 1)
-            type_value = type_value_1 * type_value_2
-            type_charts[pokemon_type] = type_value
-    
-    logger.info(f"Type charts: {type_charts}")
-    logger.info(f"Types available: {types_available}")
-    logger.info("Getting final type chart")
-    pokemon_type_chart = PokemonTypeChart()
-    for type_key, type_value in type_charts.items():
-        if type_value == 4:
-            pokemon_type_chart.super_effective.add(type_key)
-        elif type_value == 2:
-            pokemon_type_chart.effective.add(type_key)
-        elif type_value == 1:
-            continue
-        elif type_value == 0.5:
-            pokemon_type_chart.resistant.add(type_key)
-        elif type_value == 0.25:
-            pokemon_type_chart.super_resistant.add(type_key)
-        elif type_value == 0:
-            pokemon_type_chart.immune.add(type_key)
-        else:
-            logger.warning(f"Unknown type value: {type_value} for type: {type_key}")
-
-    logger.info(f"Final type chart: {pokemon_type_chart}")
+    compact_type_chart = COMPACT_TYPE_CHARTS.get(type_indexes(pokemon_types))
+    if compact_type_chart is None:
+        logger.warning("Invalid input: Unknown type combination %s", pokemon_types)
+        return PokemonTypeChart()
+
+    pokemon_type_chart = compact_type_chart.to_chart()
+    logger.debug("Final type chart: %s", pokemon_type_chart)
     return pokemon_type_chart
+
+
+async def aget_type_chart(pokemon_types: list[str]) -> PokemonTypeChart:
+    """Async version of get_type_chart, the chart is a local lookup so it never awaits I/O.
     
-# Equip the butler with tools
+    Args:
+        pokemon_types: A list of pokemon types.
+
+    Returns:
+        A PokemonTypeChart object.
+    """
+    return get_type_chart(pokemon_types)
+
+
+def _team_names(pokemon_names: list[str]) -> list[str]:
+    if not isinstance(pokemon_names, list):
+        logger.warning("Invalid input: Pokemon names are not a list")
+        return []
+
+    if len(pokemon_names) > MAX_TEAM_SIZE:
+        logger.warning("Teams have at most %d pokemon, ignoring %s", MAX_TEAM_SIZE, pokemon_names[MAX_TEAM_SIZE:])
+    return [pokemon_name for pokemon_name in pokemon_names[:MAX_TEAM_SIZE] if _is_valid_pokemon_name(pokemon_name)]
+
+
+def _team_analysis(pokemon_names: list[str], pokemon_records: list[PokemonRecord | None]) -> TeamAnalysis:
+    team = [pokemon_record for pokemon_record in pokemon_records if pokemon_record is not None]
+    if len(team) < len(pokemon_names):
+        unknown_names = [name for name, pokemon_record in zip(pokemon_names, pokemon_records) if pokemon_record is None]
+        logger.warning("Leaving unknown pokemon out of the team analysis: %s", unknown_names)
+
+    team_analysis = analyze_team(team)
+    logger.debug("Team analysis: %s", team_analysis)
+    return team_analysis
+
+
+def get_team_analysis(pokemon_names: list[str]) -> TeamAnalysis:
+    """Analyse the shared weaknesses and type coverage of a team and suggest pokemon to add.
+    
+    Args:
+        pokemon_names: The names of up to six pokemon in the team.
+
+    Returns:
+        A TeamAnalysis object.
+    """
+    logger.debug("Analysing team: %s", pokemon_names)
+    pokemon_names = _team_names(pokemon_names)
+    return _team_analysis(pokemon_names, [resolve_pokemon(pokemon_name) for pokemon_name in pokemon_names])
+
+
+async def aget_team_analysis(pokemon_names: list[str]) -> TeamAnalysis:
+    """Async version of get_team_analysis, the members are resolved concurrently.
+    
+    Args:
+        pokemon_names: The names of up to six pokemon in the team.
+
+    Returns:
+        A TeamAnalysis object.
+    """
+    logger.debug("Analysing team: %s", pokemon_names)
+    pokemon_names = _team_names(pokemon_names)
+    pokemon_records = await asyncio.gather(*(aresolve_pokemon(pokemon_name) for pokemon_name in pokemon_names))
+    return _team_analysis(pokemon_names, list(pokemon_records))
+
+
+def find_pokemon_by_matchup(
+    weak_to: list[str] | None = None,
+    resists: list[str] | None = None,
+    immune_to: list[str] | None = None
+) -> list[str]:
+    """Find the pokemon matching every given matchup, e.g. immune to ground and weak to ice.
+    
+    Args:
+        weak_to: Attacking types the pokemon must take 2x or 4x damage from.
+        resists: Attacking types the pokemon must take 0.5x or 0.25x damage from.
+        immune_to: Attacking types the pokemon must take no damage from.
+
+    Returns:
+        The names of the matching pokemon in pokedex order, at most 50 of them.
+    """
+    logger.debug("Finding pokemon weak to %s, resisting %s, immune to %s", weak_to, resists, immune_to)
+    conditions = [
+        (attacking_type.lower(), bucket)
+        for attacking_types, bucket in ((weak_to, "weak"), (resists, "resists"), (immune_to, "immune"))
+        for attacking_type in attacking_types or ()
+    ]
+    if not conditions:
+        logger.warning("Invalid input: No matchup given")
+        return []
+
+    unknown_types = [attacking_type for attacking_type, _ in conditions if attacking_type not in TYPE_INDEX]
+    if unknown_types:
+        logger.warning("Invalid input: Unknown types %s", unknown_types)
+        return []
+
+    matchup_index = get_matchup_index()
+    if matchup_index is None:
+        logger.error("Matchup index unavailable, cannot answer matchup queries")
+        return []
+
+    pokemon_names = [pokemon_record.name for pokemon_record in matchup_index.query(all_of=conditions)]
+    if len(pokemon_names) > MAX_MATCHUP_RESULTS:
+        logger.debug("Returning %s of %s pokemon matching %s", MAX_MATCHUP_RESULTS, len(pokemon_names), conditions)
+    return pokemon_names[:MAX_MATCHUP_RESULTS]
+
+
+async def afind_pokemon_by_matchup(
+    weak_to: list[str] | None = None,
+    resists: list[str] | None = None,
+    immune_to: list[str] | None = None
+) -> list[str]:
+    """Async version of find_pokemon_by_matchup, the index is in memory so it never awaits I/O.
+    
+    Args:
+        weak_to: Attacking types the pokemon must take 2x or 4x damage from.
+        resists: Attacking types the pokemon must take 0.5x or 0.25x damage from.
+        immune_to: Attacking types the pokemon must take no damage from.
+
+    Returns:
+        The names of the matching pokemon in pokedex order, at most 50 of them.
+    """
+    return find_pokemon_by_matchup(weak_to, resists, immune_to)
+
+# Equip the butler with tools, each one runs natively under invoke and ainvoke
 tools = [
-    get_pokemon_types,
-    get_type_chart
+    StructuredTool.from_function(func=get_pokemon_types, coroutine=aget_pokemon_types, parse_docstring=True),
+    StructuredTool.from_function(func=get_type_chart, coroutine=aget_type_chart, parse_docstring=True),
+    StructuredTool.from_function(func=get_team_analysis, coroutine=aget_team_analysis, parse_docstring=True),
+    StructuredTool.from_function(func=find_pokemon_by_matchup, coroutine=afind_pokemon_by_matchup, parse_docstring=True)
 ]
 
-logger.info("Initializing LLM with GPT-4o model")
-llm = ChatOpenAI(model="gpt-4o")
-llm_with_tools = llm.bind_tools(tools, parallel_tool_calls=False)
-logger.info("LLM initialized successfully with tools")
+
+# Chat model used instead of GPT-4o when set through set_llm
+_llm_override: "BaseChatModel | None" = None
+
+
+def set_llm(llm: "BaseChatModel | None") -> None:
+    """Replace the shared chat model, e.g. with a local stand-in, pass None to restore GPT-4o."""
+    global _llm_override
+    _llm_override = llm
+    get_llm.cache_clear()
+    get_llm_with_tools.cache_clear()
+
+
+@lru_cache(maxsize=1)
+def get_llm() -> "BaseChatModel":
+    """Get the shared chat model, creating the client on first use.
+
+    Requests go through the rate-limited, connection-pooled clients of
+    src.pokemon_llm_client, and OPENAI_BASE_URL may point them at any
+    OpenAI-compatible server.
+    """
+    if _llm_override is not None:
+        return _llm_override
+
+    from langchain_openai import ChatOpenAI
+
+    from src.pokemon_llm_client import get_llm_http_clients
+
+    logger.info("Initializing LLM with GPT-4o model")
+    llm_http_clients = get_llm_http_clients()
+    return ChatOpenAI(
+        model="gpt-4o",
+        http_client=llm_http_clients.http_client,
+        http_async_client=llm_http_clients.http_async_client
+    )
+
+
+@lru_cache(maxsize=1)
+def get_llm_with_tools() -> "Runnable":
+    """Get the shared chat model with the agent tools bound."""
+    llm_with_tools = get_llm().bind_tools(tools, parallel_tool_calls=False)
+    logger.info("LLM initialized successfully with tools")
+    return llm_with_tools
+
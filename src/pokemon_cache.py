@@ -0,0 +1,298 @@
+"""
+Response caching for the Pokemon agent.
+
+Answers for valid queries only depend on the canonical Pokemon name and the type
+data, so they are cached in two tiers:
+
+- LRUCache: bounded in-process tier with per-entry TTL
+- SQLiteCache: on-disk tier shared by processes and kept across restarts
+
+Cache keys embed the answer format, type chart and species index versions, so
+refreshing any of them makes old entries unreachable instead of serving stale data.
+
+LLM name extractions are cached in memory by normalized input text, keyed by the
+extraction prompt and model so prompt or model changes never reuse old results.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from pathlib import Path
+from typing import Any
+
+from attrs import define
+
+from src.pokemon_agent_prompts import EXTRACT_POKEMON_NAME_PROMPT
+from src.pokemon_name_resolver import STOP_WORDS, tokenize
+from src.pokemon_species_index import get_species_index
+from src.pokemon_type_matrix import TYPE_CHART_VERSION
+from src.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+# Bump when the text produced by format_output changes
+ANSWER_FORMAT_VERSION = "1"
+# The project's cache directory, independent of the working directory
+CACHE_DIR = Path(__file__).parent.parent / "cache"
+DEFAULT_ANSWER_CACHE_PATH = CACHE_DIR / "pokemon_answers.sqlite3"
+DEFAULT_ANSWER_TTL_SECONDS = 7 * 24 * 60 * 60
+DEFAULT_MEMORY_CACHE_SIZE = 1024
+DEFAULT_SQLITE_CACHE_SIZE = 100_000
+DEFAULT_EXTRACTION_CACHE_SIZE = 10_000
+DEFAULT_EXTRACTION_TTL_SECONDS = 24 * 60 * 60
+DEFAULT_NO_POKEMON_TTL_SECONDS = 60 * 60
+
+# Cached extraction result for inputs where the LLM found no valid pokemon
+NO_POKEMON_FOUND = ""
+
+
+@define
+class CacheStats:
+    """Hit and miss counters of a cache."""
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class LRUCache:
+    """Thread-safe in-memory LRU cache with per-entry expiry."""
+
+    def __init__(self, max_size: int = DEFAULT_MEMORY_CACHE_SIZE, ttl_seconds: float = DEFAULT_ANSWER_TTL_SECONDS):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.stats = CacheStats()
+        self._entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Any | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.stats.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.stats.hits += 1
+            return entry[1]
+
+    def set(self, key: str, value: Any, ttl_seconds: float | None = None) -> None:
+        expires_at = time.monotonic() + (self.ttl_seconds if ttl_seconds is None else ttl_seconds)
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.stats.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class SQLiteCache:
+    """On-disk cache tier backed by SQLite, values are stored as JSON."""
+
+    def __init__(
+        self,
+        path: str | os.PathLike,
+        max_entries: int = DEFAULT_SQLITE_CACHE_SIZE,
+        ttl_seconds: float = DEFAULT_ANSWER_TTL_SECONDS
+    ):
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.stats = CacheStats()
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._connection.execute("CREATE INDEX IF NOT EXISTS cache_accessed_at ON cache (accessed_at)")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+    def get(self, key: str) -> Any | None:
+        now = time.time()
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT value FROM cache WHERE key = ? AND expires_at > ?", (key, now)
+            ).fetchone()
+            if row is None:
+                self.stats.misses += 1
+                return None
+
+            self._connection.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (now, key))
+            self.stats.hits += 1
+            return json.loads(row[0])
+
+    def set(self, key: str, value: Any, ttl_seconds: float | None = None) -> None:
+        now = time.time()
+        expires_at = now + (self.ttl_seconds if ttl_seconds is None else ttl_seconds)
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), expires_at, now)
+            )
+            self._evict(now)
+
+    def _evict(self, now: float) -> None:
+        evicted = self._connection.execute("DELETE FROM cache WHERE expires_at <= ?", (now,)).rowcount
+        overflow = self._connection.execute("SELECT COUNT(*) FROM cache").fetchone()[0] - self.max_entries
+        if overflow > 0:
+            evicted += self._connection.execute(
+                "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY accessed_at LIMIT ?)", (overflow,)
+            ).rowcount
+        self.stats.evictions += evicted
+
+    def clear(self) -> None:
+        with self._lock:
+            self._connection.execute("DELETE FROM cache")
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+
+class AnswerCache:
+    """Two-tier cache of final answers keyed by canonical Pokemon name."""
+
+    def __init__(self, memory_cache: LRUCache, sqlite_cache: SQLiteCache | None = None, data_version: str = ""):
+        self.memory_cache = memory_cache
+        self.sqlite_cache = sqlite_cache
+        self.data_version = data_version
+        self.stats = CacheStats()
+
+    def key(self, pokemon_name: str) -> str:
+        return f"answer:{ANSWER_FORMAT_VERSION}:{TYPE_CHART_VERSION}:{self.data_version}:{pokemon_name.lower()}"
+
+    def get(self, pokemon_name: str) -> str | None:
+        """Get the cached answer for a pokemon, promoting disk hits to memory.
+
+        Args:
+            pokemon_name: The canonical name of the pokemon.
+
+        Returns:
+            The cached answer, or None on a miss.
+        """
+        key = self.key(pokemon_name)
+        answer = self.memory_cache.get(key)
+        if answer is None and self.sqlite_cache is not None:
+            answer = self.sqlite_cache.get(key)
+            if answer is not None:
+                self.memory_cache.set(key, answer)
+
+        if answer is None:
+            self.stats.misses += 1
+        else:
+            self.stats.hits += 1
+        return answer
+
+    def set(self, pokemon_name: str, answer: str) -> None:
+        key = self.key(pokemon_name)
+        self.memory_cache.set(key, answer)
+        if self.sqlite_cache is not None:
+            self.sqlite_cache.set(key, answer)
+
+    def clear(self) -> None:
+        self.memory_cache.clear()
+        if self.sqlite_cache is not None:
+            self.sqlite_cache.clear()
+
+
+def normalize_user_input(user_message: str) -> str:
+    """Normalize case, punctuation, whitespace and stop words so near-identical inputs share a key."""
+    return " ".join(word for word in tokenize(user_message) if word not in STOP_WORDS)
+
+
+class ExtractionCache:
+    """Cache of LLM pokemon name extractions keyed by normalized input text."""
+
+    def __init__(
+        self,
+        memory_cache: LRUCache,
+        prompt: str,
+        no_pokemon_ttl_seconds: float = DEFAULT_NO_POKEMON_TTL_SECONDS
+    ):
+        self.memory_cache = memory_cache
+        self.prompt_version = hashlib.sha256(prompt.encode()).hexdigest()[:12]
+        self.no_pokemon_ttl_seconds = no_pokemon_ttl_seconds
+
+    def key(self, user_message: str, model_name: str) -> str:
+        return f"extraction:{self.prompt_version}:{model_name}:{normalize_user_input(user_message)}"
+
+    def get(self, user_message: str, model_name: str) -> str | None:
+        """Get the cached extraction for an input.
+
+        Args:
+            user_message: The user's message.
+            model_name: The model that would run the extraction.
+
+        Returns:
+            The extracted pokemon name, NO_POKEMON_FOUND for cached negative results, or None on a miss.
+        """
+        return self.memory_cache.get(self.key(user_message, model_name))
+
+    def set(self, user_message: str, model_name: str, pokemon_name: str) -> None:
+        """Cache an extraction, pass NO_POKEMON_FOUND to cache a negative result with the shorter TTL."""
+        ttl_seconds = self.no_pokemon_ttl_seconds if pokemon_name == NO_POKEMON_FOUND else None
+        self.memory_cache.set(self.key(user_message, model_name), pokemon_name, ttl_seconds)
+
+    @property
+    def stats(self) -> CacheStats:
+        return self.memory_cache.stats
+
+    def clear(self) -> None:
+        self.memory_cache.clear()
+
+
+@lru_cache(maxsize=1)
+def get_extraction_cache() -> ExtractionCache:
+    """Get the process-wide LLM extraction cache."""
+    memory_cache = LRUCache(max_size=DEFAULT_EXTRACTION_CACHE_SIZE, ttl_seconds=DEFAULT_EXTRACTION_TTL_SECONDS)
+    return ExtractionCache(memory_cache, EXTRACT_POKEMON_NAME_PROMPT)
+
+
+@lru_cache(maxsize=1)
+def get_answer_cache() -> AnswerCache:
+    """Get the process-wide answer cache.
+
+    The SQLite tier lives at POKEMON_ANSWER_CACHE_PATH (default cache/pokemon_answers.sqlite3
+    under the project root),
+    set the variable to an empty string to only cache in memory.
+
+    Returns:
+        The shared AnswerCache.
+    """
+    species_index = get_species_index()
+    data_version = species_index.version if species_index is not None else "pokeapi"
+
+    sqlite_cache = None
+    cache_path = os.environ.get("POKEMON_ANSWER_CACHE_PATH", DEFAULT_ANSWER_CACHE_PATH)
+    if cache_path:
+        try:
+            sqlite_cache = SQLiteCache(cache_path)
+        except (OSError, sqlite3.Error) as e:
+            logger.warning("Answer cache at %s unavailable, caching in memory only: %s", cache_path, e)
+
+    return AnswerCache(LRUCache(), sqlite_cache, data_version)
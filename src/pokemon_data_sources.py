@@ -0,0 +1,354 @@
+"""
+Pokemon data sources used by the tools and the input validation.
+
+- SnapshotDataSource: the local species index, with an optional fallback source for misses
+- PokeApiDataSource: the public PokeAPI over pooled keep-alive HTTP connections
+- LocalHttpDataSource: a PokeAPI-compatible server on the local network, e.g. a mirror or a test stand-in
+
+HTTP sources apply per-call timeouts, retry transient failures with jittered
+exponential backoff and stop calling the server while their circuit breaker is open.
+Swap the process-wide source with set_data_source().
+"""
+
+import asyncio
+import os
+import random
+import threading
+import time
+import weakref
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from urllib.parse import quote
+
+import httpx
+from attrs import frozen
+
+from src.pokemon_metrics import record_data_source_retry
+from src.pokemon_record import PokemonRecord
+from src.pokemon_species_index import PokemonSpeciesIndex, get_species_index
+from src.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+# Override with the POKEAPI_BASE_URL environment variable, e.g. to point at a local mirror
+POKEAPI_BASE_URL = "https://pokeapi.co/api/v2"
+LOCAL_HTTP_BASE_URL = "http://127.0.0.1:8000/api/v2"
+DEFAULT_TIMEOUT_SECONDS = 10.0
+DEFAULT_CONNECTION_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=20)
+
+# Responses worth retrying, anything else is returned or raised straight away
+RETRYABLE_STATUS_CODES = frozenset({
+    httpx.codes.TOO_MANY_REQUESTS,
+    httpx.codes.INTERNAL_SERVER_ERROR,
+    httpx.codes.BAD_GATEWAY,
+    httpx.codes.SERVICE_UNAVAILABLE,
+    httpx.codes.GATEWAY_TIMEOUT,
+})
+
+
+class PokemonDataError(Exception):
+    """The data source failed to answer, as opposed to the pokemon not existing."""
+
+
+class CircuitOpenError(PokemonDataError):
+    """The data source is skipped because its circuit breaker is open."""
+
+
+@frozen
+class RetryPolicy:
+    """Bounded retries with full-jitter exponential backoff."""
+    attempts: int = 3
+    base_delay_seconds: float = 0.1
+    max_delay_seconds: float = 2.0
+
+    def delay(self, attempt: int) -> float:
+        """Random delay before retrying after the given zero-based attempt."""
+        return random.uniform(0, min(self.max_delay_seconds, self.base_delay_seconds * 2 ** attempt))
+
+
+class CircuitBreaker:
+    """Stops calls to a failing dependency for a while.
+
+    The breaker opens after failure_threshold consecutive failures. Once
+    reset_timeout_seconds have passed a single trial call is let through, closing the
+    breaker again on success.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout_seconds: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout_seconds = reset_timeout_seconds
+        self._failures = 0
+        self._opened_at: float | None = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        return self._opened_at is not None
+
+    def allow_request(self) -> bool:
+        return self.admit() is not None
+
+    def admit(self) -> bool | None:
+        """Let a call through, taking the trial slot when the breaker is half-open.
+
+        Returns:
+            None if the call is refused, otherwise whether it is the trial call. The
+            trial's caller must record its outcome or call release_trial.
+        """
+        with self._lock:
+            if self._opened_at is None:
+                return False
+            if self._trial_in_flight or time.monotonic() - self._opened_at < self.reset_timeout_seconds:
+                return None
+            self._trial_in_flight = True
+            return True
+
+    def release_trial(self) -> None:
+        """Free the trial slot of a call that ended without an outcome, e.g. because it was cancelled."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+
+
+class PokemonDataSource(ABC):
+    """Looks up pokemon by name.
+
+    Implementations return None when the pokemon does not exist and raise
+    PokemonDataError when they cannot tell.
+    """
+
+    @abstractmethod
+    def get_pokemon(self, pokemon_name: str) -> PokemonRecord | None:
+        """Look up a pokemon.
+
+        Args:
+            pokemon_name: The name of the pokemon.
+
+        Returns:
+            The PokemonRecord, or None if the pokemon does not exist.
+        """
+
+    async def aget_pokemon(self, pokemon_name: str) -> PokemonRecord | None:
+        """Async version of get_pokemon."""
+        return self.get_pokemon(pokemon_name)
+
+    def close(self) -> None:
+        """Release the resources held by the source."""
+
+    async def aclose(self) -> None:
+        """Release the resources bound to the running event loop."""
+
+
+class SnapshotDataSource(PokemonDataSource):
+    """Serves pokemon from the local species index, asking the fallback source on misses."""
+
+    def __init__(self, species_index: PokemonSpeciesIndex, fallback: PokemonDataSource | None = None):
+        self.species_index = species_index
+        self.fallback = fallback
+
+    def get_pokemon(self, pokemon_name: str) -> PokemonRecord | None:
+        pokemon_record = self.species_index.lookup(pokemon_name)
+        if pokemon_record is not None or self.fallback is None:
+            return pokemon_record
+
+        logger.debug("Pokemon %s not found in the species index, querying the fallback source", pokemon_name)
+        return self.fallback.get_pokemon(pokemon_name)
+
+    async def aget_pokemon(self, pokemon_name: str) -> PokemonRecord | None:
+        pokemon_record = self.species_index.lookup(pokemon_name)
+        if pokemon_record is not None or self.fallback is None:
+            return pokemon_record
+
+        logger.debug("Pokemon %s not found in the species index, querying the fallback source", pokemon_name)
+        return await self.fallback.aget_pokemon(pokemon_name)
+
+    def close(self) -> None:
+        if self.fallback is not None:
+            self.fallback.close()
+
+    async def aclose(self) -> None:
+        if self.fallback is not None:
+            await self.fallback.aclose()
+
+
+class PokeApiDataSource(PokemonDataSource):
+    """Serves pokemon from a PokeAPI-compatible server over pooled keep-alive connections."""
+
+    def __init__(
+        self,
+        base_url: str = POKEAPI_BASE_URL,
+        timeout_seconds: float = DEFAULT_TIMEOUT_SECONDS,
+        retry_policy: RetryPolicy = RetryPolicy(),
+        circuit_breaker: CircuitBreaker | None = None,
+        limits: httpx.Limits = DEFAULT_CONNECTION_LIMITS
+    ):
+        self.base_url = base_url
+        self.timeout_seconds = timeout_seconds
+        self.retry_policy = retry_policy
+        self.circuit_breaker = circuit_breaker or CircuitBreaker()
+        self.limits = limits
+        self._client: httpx.Client | None = None
+        self._client_lock = threading.Lock()
+        # httpx async connection pools are bound to the event loop that created them
+        self._async_clients: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient] = (
+            weakref.WeakKeyDictionary()
+        )
+
+    def _http_client(self) -> httpx.Client:
+        with self._client_lock:
+            if self._client is None or self._client.is_closed:
+                logger.info("Creating pooled HTTP client for %s", self.base_url)
+                self._client = httpx.Client(base_url=self.base_url, timeout=self.timeout_seconds, limits=self.limits)
+            return self._client
+
+    def _async_http_client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        async_client = self._async_clients.get(loop)
+        if async_client is None or async_client.is_closed:
+            logger.info("Creating pooled async HTTP client for %s", self.base_url)
+            async_client = httpx.AsyncClient(base_url=self.base_url, timeout=self.timeout_seconds, limits=self.limits)
+            self._async_clients[loop] = async_client
+        return async_client
+
+    def _admit(self, pokemon_name: str) -> bool:
+        is_trial = self.circuit_breaker.admit()
+        if is_trial is None:
+            raise CircuitOpenError(f"Circuit open for {self.base_url}, skipping lookup of {pokemon_name}")
+        return is_trial
+
+    @staticmethod
+    def _pokemon_path(pokemon_name: str) -> str:
+        return f"/pokemon/{quote(pokemon_name.lower(), safe='')}"
+
+    def _parse_response(self, pokemon_name: str, response: httpx.Response) -> PokemonRecord | None:
+        if response.status_code == httpx.codes.NOT_FOUND:
+            return None
+
+        try:
+            pokemon_data = response.json()
+            return PokemonRecord(
+                id=pokemon_data["id"],
+                name=pokemon_data["name"],
+                types=[pokemon_type["type"]["name"] for pokemon_type in pokemon_data["types"]]
+            )
+        except (ValueError, KeyError, TypeError) as e:
+            # The server answered, a malformed body is not worth a retry or a breaker failure
+            raise PokemonDataError(f"Malformed response for {pokemon_name} from {self.base_url}: {e!r}") from e
+
+    def _should_retry(self, attempt: int, error: httpx.HTTPError) -> bool:
+        if isinstance(error, httpx.HTTPStatusError) and error.response.status_code not in RETRYABLE_STATUS_CODES:
+            return False
+        return attempt + 1 < self.retry_policy.attempts
+
+    def _failed_attempt(self, pokemon_name: str, attempt: int, error: httpx.HTTPError) -> None:
+        """Record a failed attempt, raising PokemonDataError when it is not worth a retry"""
+        if not self._should_retry(attempt, error):
+            self.circuit_breaker.record_failure()
+            raise PokemonDataError(f"Failed to fetch {pokemon_name} from {self.base_url}: {error!r}") from error
+        logger.warning("Attempt %d to fetch %s failed, retrying: %r", attempt + 1, pokemon_name, error)
+        record_data_source_retry(type(self).__name__)
+
+    def get_pokemon(self, pokemon_name: str) -> PokemonRecord | None:
+        is_trial = self._admit(pokemon_name)
+        try:
+            for attempt in range(self.retry_policy.attempts):
+                try:
+                    response = self._http_client().get(self._pokemon_path(pokemon_name))
+                    if response.status_code != httpx.codes.NOT_FOUND:
+                        response.raise_for_status()
+                except httpx.HTTPError as e:
+                    self._failed_attempt(pokemon_name, attempt, e)
+                    time.sleep(self.retry_policy.delay(attempt))
+                    continue
+                self.circuit_breaker.record_success()
+                return self._parse_response(pokemon_name, response)
+        finally:
+            # A cancelled trial records no outcome, free its slot so the breaker can try again
+            if is_trial:
+                self.circuit_breaker.release_trial()
+
+    async def aget_pokemon(self, pokemon_name: str) -> PokemonRecord | None:
+        is_trial = self._admit(pokemon_name)
+        try:
+            for attempt in range(self.retry_policy.attempts):
+                try:
+                    response = await self._async_http_client().get(self._pokemon_path(pokemon_name))
+                    if response.status_code != httpx.codes.NOT_FOUND:
+                        response.raise_for_status()
+                except httpx.HTTPError as e:
+                    self._failed_attempt(pokemon_name, attempt, e)
+                    await asyncio.sleep(self.retry_policy.delay(attempt))
+                    continue
+                self.circuit_breaker.record_success()
+                return self._parse_response(pokemon_name, response)
+        finally:
+            if is_trial:
+                self.circuit_breaker.release_trial()
+
+    def close(self) -> None:
+        with self._client_lock:
+            if self._client is not None:
+                self._client.close()
+                self._client = None
+
+    async def aclose(self) -> None:
+        async_client = self._async_clients.pop(asyncio.get_running_loop(), None)
+        if async_client is not None:
+            await async_client.aclose()
+
+
+class LocalHttpDataSource(PokeApiDataSource):
+    """PokeApiDataSource tuned for a server on the local network, failing fast instead of waiting."""
+
+    def __init__(
+        self,
+        base_url: str = LOCAL_HTTP_BASE_URL,
+        timeout_seconds: float = 1.0,
+        retry_policy: RetryPolicy = RetryPolicy(attempts=2, base_delay_seconds=0.01, max_delay_seconds=0.1),
+        circuit_breaker: CircuitBreaker | None = None,
+        limits: httpx.Limits = DEFAULT_CONNECTION_LIMITS
+    ):
+        super().__init__(base_url, timeout_seconds, retry_policy, circuit_breaker, limits)
+
+
+_data_source_override: PokemonDataSource | None = None
+
+
+def set_data_source(data_source: PokemonDataSource | None) -> None:
+    """Replace the process-wide data source, pass None to restore the default."""
+    global _data_source_override
+    _data_source_override = data_source
+    get_data_source.cache_clear()
+
+
+@lru_cache(maxsize=1)
+def get_data_source() -> PokemonDataSource:
+    """Get the process-wide data source.
+
+    Defaults to the species index backed by the PokeAPI at POKEAPI_BASE_URL, or
+    only the PokeAPI when the index is unavailable.
+
+    Returns:
+        The shared PokemonDataSource.
+    """
+    if _data_source_override is not None:
+        return _data_source_override
+
+    pokeapi = PokeApiDataSource(base_url=os.environ.get("POKEAPI_BASE_URL", POKEAPI_BASE_URL))
+    species_index = get_species_index()
+    if species_index is None:
+        return pokeapi
+    return SnapshotDataSource(species_index, fallback=pokeapi)
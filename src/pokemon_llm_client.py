@@ -0,0 +1,501 @@
+"""
+Managed HTTP layer between the chat model and the model provider.
+
+ChatOpenAI sends every request through the pooled httpx clients built here, whose
+transports apply client-side limits shared by all nodes:
+
+- TokenBucket: requests and tokens per minute, pausing everyone after a 429 with Retry-After
+- AdaptiveConcurrencyLimit: AIMD, the limit grows by one per round of fast successes and halves on 429, 503, timeouts or slow responses
+- single-flight: identical in-flight non-streaming requests share one upstream call
+
+Limits are read from LLMClientConfig.from_env(), and OPENAI_BASE_URL points the
+model at any OpenAI-compatible server, e.g. a local stand-in.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+import weakref
+from functools import lru_cache
+
+import httpx
+from attrs import define, frozen
+
+from src.pokemon_metrics import record_llm_client_event
+from src.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_CONNECTION_LIMITS = httpx.Limits(max_connections=64, max_keepalive_connections=16)
+# Completion tokens reserved for requests that do not set max_tokens
+DEFAULT_COMPLETION_TOKENS = 256
+# Rough prompt size, the provider counts about four characters per token
+CHARS_PER_TOKEN = 4
+
+_OVERLOADED_STATUS_CODES = frozenset({httpx.codes.TOO_MANY_REQUESTS, httpx.codes.SERVICE_UNAVAILABLE})
+
+
+@frozen
+class LLMClientConfig:
+    """Client-side limits of the model provider connection."""
+    requests_per_minute: float = 500
+    tokens_per_minute: float = 30_000
+    initial_concurrency: int = 8
+    min_concurrency: int = 1
+    max_concurrency: int = 32
+    latency_target_seconds: float = 30.0
+    backoff_factor: float = 0.5
+    timeout_seconds: float = 60.0
+    limits: httpx.Limits = DEFAULT_CONNECTION_LIMITS
+
+    @classmethod
+    def from_env(cls) -> "LLMClientConfig":
+        """Read the limits from the POKEMON_LLM_REQUESTS_PER_MINUTE, POKEMON_LLM_TOKENS_PER_MINUTE
+        and POKEMON_LLM_MAX_CONCURRENCY environment variables, defaults for unset ones."""
+        default = cls()
+        return cls(
+            requests_per_minute=float(os.environ.get("POKEMON_LLM_REQUESTS_PER_MINUTE", default.requests_per_minute)),
+            tokens_per_minute=float(os.environ.get("POKEMON_LLM_TOKENS_PER_MINUTE", default.tokens_per_minute)),
+            max_concurrency=int(os.environ.get("POKEMON_LLM_MAX_CONCURRENCY", default.max_concurrency)),
+        )
+
+
+class TokenBucket:
+    """Token bucket refilled at rate_per_second up to capacity.
+
+    Acquiring reserves the tokens straight away, letting the balance go negative,
+    and waits until the refill covers the debt, so callers are served in arrival order.
+    """
+
+    def __init__(self, rate_per_second: float, capacity: float):
+        self.rate_per_second = rate_per_second
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate_per_second)
+        self._updated_at = now
+
+    def reserve(self, amount: float = 1) -> float:
+        """Take amount tokens, capped at the capacity, and get the seconds to wait before using them."""
+        with self._lock:
+            self._refill()
+            self._tokens -= min(amount, self.capacity)
+            return max(0.0, -self._tokens / self.rate_per_second)
+
+    def pause(self, seconds: float) -> None:
+        """Hold back every caller for at least the given seconds."""
+        with self._lock:
+            self._refill()
+            self._tokens = min(self._tokens, -seconds * self.rate_per_second)
+
+    def acquire(self, amount: float = 1) -> float:
+        """Take amount tokens, sleeping until they are available, and get the seconds waited."""
+        wait_seconds = self.reserve(amount)
+        if wait_seconds:
+            time.sleep(wait_seconds)
+        return wait_seconds
+
+    async def aacquire(self, amount: float = 1) -> float:
+        """Async version of acquire."""
+        wait_seconds = self.reserve(amount)
+        if wait_seconds:
+            await asyncio.sleep(wait_seconds)
+        return wait_seconds
+
+
+class AdaptiveConcurrencyLimit:
+    """Limit on in-flight requests adjusted by additive increase, multiplicative decrease.
+
+    Every fast success adds 1 / limit, about one more slot per round of requests.
+    An overloaded or slow response multiplies the limit by backoff_factor, once per
+    round: responses to requests sent before the last decrease do not decrease it again.
+    """
+
+    def __init__(
+        self,
+        initial_limit: int = 8,
+        min_limit: int = 1,
+        max_limit: int = 32,
+        latency_target_seconds: float = 30.0,
+        backoff_factor: float = 0.5
+    ):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_target_seconds = latency_target_seconds
+        self.backoff_factor = backoff_factor
+        # The initial limit may come from a default above a configured maximum
+        self._limit = float(min(max(initial_limit, min_limit), max_limit))
+        self._in_flight = 0
+        self._decreased_at = float("-inf")
+        self._condition = threading.Condition()
+        self._async_waiters: list[tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+
+    @property
+    def limit(self) -> int:
+        return max(self.min_limit, int(self._limit))
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def _try_acquire(self) -> bool:
+        if self._in_flight >= self.limit:
+            return False
+        self._in_flight += 1
+        return True
+
+    def acquire(self) -> float:
+        """Take a slot, blocking while the limit is reached, and get the time it was taken at."""
+        with self._condition:
+            while not self._try_acquire():
+                self._condition.wait()
+        return time.monotonic()
+
+    async def aacquire(self) -> float:
+        """Async version of acquire."""
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._condition:
+                if self._try_acquire():
+                    return time.monotonic()
+                waiter = loop.create_future()
+                self._async_waiters.append((loop, waiter))
+            try:
+                await waiter
+            finally:
+                with self._condition:
+                    if (loop, waiter) in self._async_waiters:
+                        self._async_waiters.remove((loop, waiter))
+
+    def release(self, acquired_at: float, overloaded: bool) -> None:
+        """Free a slot and adjust the limit to the outcome of its request.
+
+        Args:
+            acquired_at: The time returned by acquire.
+            overloaded: Whether the provider rejected the request as overloaded.
+        """
+        now = time.monotonic()
+        with self._condition:
+            self._in_flight -= 1
+            if overloaded or now - acquired_at > self.latency_target_seconds:
+                if acquired_at > self._decreased_at:
+                    self._limit = max(self.min_limit, self._limit * self.backoff_factor)
+                    self._decreased_at = now
+                    logger.warning("LLM provider overloaded, concurrency limit lowered to %d", self.limit)
+            else:
+                self._limit = min(self.max_limit, self._limit + 1 / self._limit)
+
+            self._condition.notify_all()
+            async_waiters, self._async_waiters = self._async_waiters, []
+        for loop, waiter in async_waiters:
+            try:
+                loop.call_soon_threadsafe(_wake, waiter)
+            except RuntimeError:
+                pass
+
+
+def _wake(waiter: asyncio.Future) -> None:
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+class LLMRequestLimiter:
+    """Request and token buckets plus the adaptive concurrency limit, shared by the sync and async transports."""
+
+    def __init__(self, config: LLMClientConfig = LLMClientConfig()):
+        self.config = config
+        self.requests = TokenBucket(config.requests_per_minute / 60, max(1.0, config.requests_per_minute / 60))
+        self.tokens = TokenBucket(config.tokens_per_minute / 60, config.tokens_per_minute)
+        self.concurrency = AdaptiveConcurrencyLimit(
+            initial_limit=config.initial_concurrency,
+            min_limit=config.min_concurrency,
+            max_limit=config.max_concurrency,
+            latency_target_seconds=config.latency_target_seconds,
+            backoff_factor=config.backoff_factor,
+        )
+
+    def acquire(self, estimated_tokens: int) -> float:
+        """Wait for the buckets and a concurrency slot, see AdaptiveConcurrencyLimit.acquire."""
+        waited = self.requests.acquire() + self.tokens.acquire(estimated_tokens)
+        if waited:
+            record_llm_client_event("rate_limited")
+        return self.concurrency.acquire()
+
+    async def aacquire(self, estimated_tokens: int) -> float:
+        """Async version of acquire."""
+        waited = await self.requests.aacquire() + await self.tokens.aacquire(estimated_tokens)
+        if waited:
+            record_llm_client_event("rate_limited")
+        return await self.concurrency.aacquire()
+
+    def release(self, acquired_at: float, response: httpx.Response | None, error: Exception | None = None) -> None:
+        """Free the concurrency slot, feeding back the response or the transport error."""
+        overloaded = isinstance(error, httpx.TimeoutException)
+        if response is not None and response.status_code in _OVERLOADED_STATUS_CODES:
+            overloaded = True
+            record_llm_client_event("overloaded")
+            retry_after = _retry_after_seconds(response)
+            if retry_after:
+                self.requests.pause(retry_after)
+        self.concurrency.release(acquired_at, overloaded)
+
+
+def _retry_after_seconds(response: httpx.Response) -> float | None:
+    try:
+        return float(response.headers["retry-after"])
+    except (KeyError, ValueError):
+        return None
+
+
+@frozen
+class _PreparedRequest:
+    """What the transports need to know about a request before sending it."""
+    estimated_tokens: int
+    # Single-flight key, None for requests that must not be shared
+    flight_key: str | None
+    streaming: bool
+
+
+def _prepare(request: httpx.Request) -> _PreparedRequest:
+    try:
+        body = json.loads(request.content) if request.content else {}
+    except ValueError:
+        body = {}
+    if not isinstance(body, dict):
+        body = {}
+
+    completion_tokens = body.get("max_completion_tokens") or body.get("max_tokens") or DEFAULT_COMPLETION_TOKENS
+    estimated_tokens = len(request.content) // CHARS_PER_TOKEN + completion_tokens
+    streaming = bool(body.get("stream"))
+    flight_key = None
+    if request.method == "POST" and not streaming:
+        flight_key = hashlib.sha256(b"\n".join([
+            str(request.url).encode(),
+            request.headers.get("authorization", "").encode(),
+            request.content,
+        ])).hexdigest()
+    return _PreparedRequest(estimated_tokens, flight_key, streaming)
+
+
+@define
+class _BufferedResponse:
+    """A fully read upstream response, copied into a fresh httpx.Response for every caller sharing it."""
+    status_code: int
+    headers: list[tuple[bytes, bytes]]
+    content: bytes
+
+    def to_response(self, request: httpx.Request) -> httpx.Response:
+        return httpx.Response(self.status_code, headers=self.headers, content=self.content, request=request)
+
+
+class RateLimitedTransport(httpx.BaseTransport):
+    """Pooled HTTP transport applying an LLMRequestLimiter and coalescing identical in-flight requests."""
+
+    def __init__(self, limiter: LLMRequestLimiter, transport: httpx.BaseTransport | None = None):
+        self.limiter = limiter
+        self._transport = transport or httpx.HTTPTransport(limits=limiter.config.limits)
+        self._flights: dict[str, "_Flight"] = {}
+        self._lock = threading.Lock()
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        request.read()
+        prepared = _prepare(request)
+        if prepared.flight_key is None:
+            return self._send(request, prepared)
+
+        with self._lock:
+            flight = self._flights.get(prepared.flight_key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[prepared.flight_key] = _Flight()
+
+        if not leader:
+            record_llm_client_event("coalesced")
+            flight.done.wait()
+        else:
+            try:
+                flight.response = self._send_buffered(request, prepared)
+            except Exception as e:
+                flight.error = e
+            finally:
+                with self._lock:
+                    del self._flights[prepared.flight_key]
+                flight.done.set()
+
+        if flight.error is not None:
+            raise flight.error
+        return flight.response.to_response(request)
+
+    def _send(self, request: httpx.Request, prepared: _PreparedRequest) -> httpx.Response:
+        acquired_at = self.limiter.acquire(prepared.estimated_tokens)
+        response = error = None
+        try:
+            response = self._transport.handle_request(request)
+            return response
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self.limiter.release(acquired_at, response, error)
+
+    def _send_buffered(self, request: httpx.Request, prepared: _PreparedRequest) -> _BufferedResponse:
+        acquired_at = self.limiter.acquire(prepared.estimated_tokens)
+        response = error = None
+        try:
+            response = self._transport.handle_request(request)
+            # Raw bytes, every copy decodes them again from the original headers
+            content = b"".join(response.iter_raw())
+            response.close()
+            return _BufferedResponse(response.status_code, response.headers.raw, content)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self.limiter.release(acquired_at, response, error)
+
+    def close(self) -> None:
+        self._transport.close()
+
+
+class _Flight:
+    """An upstream call shared by the threads sending the same request."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.response: _BufferedResponse | None = None
+        self.error: Exception | None = None
+
+
+class AsyncRateLimitedTransport(httpx.AsyncBaseTransport):
+    """Async version of RateLimitedTransport.
+
+    Coalesced requests await the same upstream task, shielded so that cancelling
+    one caller does not cancel the call for the others. Requests only coalesce
+    within one event loop, and every event loop gets its own connection pool:
+    the client handed to ChatOpenAI outlives the loops of asyncio.run calls, the
+    pooled connections of a closed loop cannot be reused.
+    """
+
+    def __init__(self, limiter: LLMRequestLimiter, transport: httpx.AsyncBaseTransport | None = None):
+        self.limiter = limiter
+        # A given transport is used on every loop, otherwise each loop creates its own pool
+        self._transport = transport
+        self._loop_transports: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncBaseTransport] = (
+            weakref.WeakKeyDictionary()
+        )
+        self._flights: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict[str, asyncio.Task]] = (
+            weakref.WeakKeyDictionary()
+        )
+
+    def _loop_transport(self) -> httpx.AsyncBaseTransport:
+        if self._transport is not None:
+            return self._transport
+
+        loop = asyncio.get_running_loop()
+        transport = self._loop_transports.get(loop)
+        if transport is None:
+            logger.debug("Creating an LLM connection pool for event loop %s", id(loop))
+            transport = self._loop_transports[loop] = httpx.AsyncHTTPTransport(limits=self.limiter.config.limits)
+        return transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        await request.aread()
+        prepared = _prepare(request)
+        if prepared.flight_key is None:
+            return await self._send(request, prepared)
+
+        flights = self._flights.setdefault(asyncio.get_running_loop(), {})
+        flight = flights.get(prepared.flight_key)
+        if flight is not None:
+            record_llm_client_event("coalesced")
+        else:
+            flight = flights[prepared.flight_key] = asyncio.ensure_future(self._send_buffered(request, prepared))
+            flight.add_done_callback(lambda task: _end_flight(flights, prepared.flight_key, task))
+
+        buffered = await asyncio.shield(flight)
+        return buffered.to_response(request)
+
+    async def _send(self, request: httpx.Request, prepared: _PreparedRequest) -> httpx.Response:
+        acquired_at = await self.limiter.aacquire(prepared.estimated_tokens)
+        response = error = None
+        try:
+            response = await self._loop_transport().handle_async_request(request)
+            return response
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self.limiter.release(acquired_at, response, error)
+
+    async def _send_buffered(self, request: httpx.Request, prepared: _PreparedRequest) -> _BufferedResponse:
+        acquired_at = await self.limiter.aacquire(prepared.estimated_tokens)
+        response = error = None
+        try:
+            response = await self._loop_transport().handle_async_request(request)
+            content = b"".join([chunk async for chunk in response.aiter_raw()])
+            await response.aclose()
+            return _BufferedResponse(response.status_code, response.headers.raw, content)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self.limiter.release(acquired_at, response, error)
+
+    async def aclose(self) -> None:
+        """Close the connection pool of the running event loop."""
+        transport = self._transport or self._loop_transports.pop(asyncio.get_running_loop(), None)
+        if transport is not None:
+            await transport.aclose()
+
+
+def _end_flight(flights: dict[str, asyncio.Task], flight_key: str, task: asyncio.Task) -> None:
+    if flights.get(flight_key) is task:
+        del flights[flight_key]
+    # Mark the error as retrieved in case every caller was cancelled
+    if not task.cancelled():
+        task.exception()
+
+
+@frozen
+class LLMHttpClients:
+    """The pooled httpx clients handed to ChatOpenAI, sharing one limiter."""
+    limiter: LLMRequestLimiter
+    http_client: httpx.Client
+    http_async_client: httpx.AsyncClient
+
+
+def create_llm_http_clients(config: LLMClientConfig = LLMClientConfig()) -> LLMHttpClients:
+    """Build sync and async clients whose requests go through one LLMRequestLimiter.
+
+    Args:
+        config: The limits of the provider connection.
+
+    Returns:
+        The clients and their limiter.
+    """
+    limiter = LLMRequestLimiter(config)
+    return LLMHttpClients(
+        limiter=limiter,
+        http_client=httpx.Client(transport=RateLimitedTransport(limiter), timeout=config.timeout_seconds),
+        http_async_client=httpx.AsyncClient(
+            transport=AsyncRateLimitedTransport(limiter), timeout=config.timeout_seconds
+        ),
+    )
+
+
+@lru_cache(maxsize=1)
+def get_llm_http_clients() -> LLMHttpClients:
+    """Get the process-wide model provider clients, configured from the environment."""
+    config = LLMClientConfig.from_env()
+    logger.info(
+        "Creating rate-limited LLM clients: %g requests and %g tokens per minute, up to %d concurrent requests",
+        config.requests_per_minute, config.tokens_per_minute, config.max_concurrency
+    )
+    return create_llm_http_clients(config)
@@ -0,0 +1,191 @@
+"""
+Inverted index from attacking type and damage bucket to the species in it.
+
+Reverse questions such as "which pokemon are immune to ground and weak to ice?"
+are answered by intersecting precomputed species bitsets, with no per-species
+lookup. Bit i of a bitset stands for the i-th canonical record of the species
+index in pokemon ID order, and every (attacking type, bucket) pair has one bitset:
+
+    ("ground", "immune")  -> every species taking 0x from ground moves
+    ("ice", "weak")       -> every species taking 2x or 4x from ice moves
+
+The buckets are those of PokemonTypeChart plus the "weak" and "resists" groups.
+"""
+
+from collections.abc import Iterable, Sequence
+from functools import lru_cache
+
+from attrs import field, frozen
+
+from src.pokemon_name_resolver import tokenize
+from src.pokemon_record import PokemonRecord, StateRecord
+from src.pokemon_species_index import get_species_index
+from src.pokemon_type_chart import COMPACT_TYPE_CHARTS, TYPE_CHART_BUCKETS
+from src.pokemon_type_matrix import TYPE_INDEX, TYPE_NAMES, type_indexes
+from src.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+# Buckets made of several PokemonTypeChart buckets
+MATCHUP_GROUPS = {
+    "weak": ("super_effective", "effective"),
+    "resists": ("resistant", "super_resistant"),
+}
+MATCHUP_BUCKETS = TYPE_CHART_BUCKETS + tuple(MATCHUP_GROUPS)
+# Words of a reverse question and the bucket of the types following them, e.g. "immune to ground and weak to ice"
+MATCHUP_RELATION_WORDS = {
+    "weak": "weak", "weakness": "weak", "weaknesses": "weak",
+    "resist": "resists", "resists": "resists", "resistant": "resists", "resistance": "resists",
+    "immune": "immune", "immunity": "immune",
+}
+
+
+@frozen
+class MatchupQuery(StateRecord):
+    """The attacking types of a reverse question, grouped like the arguments of find_pokemon_by_matchup."""
+    weak_to: tuple[str, ...] = field(default=(), converter=tuple)
+    resists: tuple[str, ...] = field(default=(), converter=tuple)
+    immune_to: tuple[str, ...] = field(default=(), converter=tuple)
+
+    def __str__(self) -> str:
+        return " and ".join(
+            f"{relation} {' and '.join(attacking_types)}"
+            for relation, attacking_types in (
+                ("weak to", self.weak_to), ("resisting", self.resists), ("immune to", self.immune_to)
+            )
+            if attacking_types
+        )
+
+
+def parse_matchup_query(user_message: str) -> MatchupQuery | None:
+    """Parse a reverse question such as "which pokemon are immune to ground and weak to ice?".
+
+    Every type name counts for the closest relation word before it, type names before
+    the first relation word are ignored.
+
+    Args:
+        user_message: The user's message.
+
+    Returns:
+        The MatchupQuery, or None if the message pairs no relation word with a type.
+    """
+    attacking_types = {bucket: [] for bucket in MATCHUP_RELATION_WORDS.values()}
+    bucket = None
+    for word in tokenize(user_message):
+        if word in MATCHUP_RELATION_WORDS:
+            bucket = MATCHUP_RELATION_WORDS[word]
+        elif bucket is not None and word in TYPE_INDEX and word not in attacking_types[bucket]:
+            attacking_types[bucket].append(word)
+
+    if not any(attacking_types.values()):
+        return None
+    return MatchupQuery(
+        weak_to=tuple(attacking_types["weak"]),
+        resists=tuple(attacking_types["resists"]),
+        immune_to=tuple(attacking_types["immune"]),
+    )
+
+
+@frozen
+class MatchupIndex:
+    """Species bitsets keyed by (attacking type, bucket), build it with from_records."""
+    records: tuple[PokemonRecord, ...]
+    bitsets: dict[tuple[str, str], int]
+
+    @classmethod
+    def from_records(cls, records: Iterable[PokemonRecord]) -> "MatchupIndex":
+        """Index the records, records with an unknown type combination are left out."""
+        indexed_records = []
+        bitsets = {(type_name, bucket): 0 for type_name in TYPE_NAMES for bucket in MATCHUP_BUCKETS}
+        for record in sorted(records, key=lambda record: (record.id, record.name)):
+            compact_type_chart = COMPACT_TYPE_CHARTS.get(type_indexes(list(record.types)))
+            if compact_type_chart is None:
+                logger.warning("Leaving %s out of the matchup index, unknown types %s", record.name, record.types)
+                continue
+
+            record_bit = 1 << len(indexed_records)
+            indexed_records.append(record)
+            for bucket in TYPE_CHART_BUCKETS:
+                mask = getattr(compact_type_chart, bucket)
+                for type_name in TYPE_NAMES:
+                    if mask >> TYPE_INDEX[type_name] & 1:
+                        bitsets[type_name, bucket] |= record_bit
+
+        for type_name in TYPE_NAMES:
+            for group, buckets in MATCHUP_GROUPS.items():
+                for bucket in buckets:
+                    bitsets[type_name, group] |= bitsets[type_name, bucket]
+        return cls(tuple(indexed_records), bitsets)
+
+    @property
+    def all_species(self) -> int:
+        return (1 << len(self.records)) - 1
+
+    def bitset(self, attacking_type: str, bucket: str) -> int:
+        """Get the species taking damage in the bucket from the attacking type.
+
+        Raises:
+            KeyError: If the attacking type or the bucket is unknown.
+        """
+        return self.bitsets[attacking_type, bucket]
+
+    def intersection(self, conditions: Iterable[tuple[str, str]]) -> int:
+        """Get the species meeting every (attacking type, bucket) condition, all species if there are none."""
+        bitset = self.all_species
+        for attacking_type, bucket in conditions:
+            bitset &= self.bitset(attacking_type, bucket)
+        return bitset
+
+    def union(self, conditions: Iterable[tuple[str, str]]) -> int:
+        """Get the species meeting any (attacking type, bucket) condition."""
+        bitset = 0
+        for attacking_type, bucket in conditions:
+            bitset |= self.bitset(attacking_type, bucket)
+        return bitset
+
+    def species(self, bitset: int) -> list[PokemonRecord]:
+        """Get the records of a bitset, in pokemon ID order."""
+        records = []
+        while bitset:
+            lowest_bit = bitset & -bitset
+            records.append(self.records[lowest_bit.bit_length() - 1])
+            bitset ^= lowest_bit
+        return records
+
+    def query(
+        self,
+        all_of: Sequence[tuple[str, str]] = (),
+        any_of: Sequence[tuple[str, str]] = ()
+    ) -> list[PokemonRecord]:
+        """Find the species meeting every all_of condition and, if given, at least one any_of condition.
+
+        Args:
+            all_of: (attacking type, bucket) conditions every species must meet.
+            any_of: (attacking type, bucket) conditions species must meet at least one of.
+
+        Returns:
+            The matching records, in pokemon ID order.
+
+        Raises:
+            KeyError: If an attacking type or a bucket is unknown.
+        """
+        bitset = self.intersection(all_of)
+        if any_of:
+            bitset &= self.union(any_of)
+        return self.species(bitset)
+
+
+@lru_cache(maxsize=1)
+def get_matchup_index() -> MatchupIndex | None:
+    """Build the matchup index of the species index once per process.
+
+    Returns:
+        The shared MatchupIndex, or None if no species index is available.
+    """
+    species_index = get_species_index()
+    if species_index is None:
+        return None
+
+    matchup_index = MatchupIndex.from_records(species_index.records())
+    logger.info("Built matchup index over %d species", len(matchup_index.records))
+    return matchup_index
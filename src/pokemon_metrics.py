@@ -0,0 +1,378 @@
+"""
+Latency and usage metrics for the Pokemon agent.
+
+Records histograms and counters for every graph node, LLM call (with token usage
+per model and node) and data source call, plus the per-node timings and tokens of
+the most recent requests and the token totals of recent sessions. The registry can
+be dumped as a JSON snapshot or in the Prometheus text format.
+
+Graph runs are measured by MetricsCallbackHandler, attached when the graph is built.
+Requests are grouped by the trace ID found in the run's metadata, which the runners
+also store in PokemonState.
+"""
+
+import inspect
+import json
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from collections import OrderedDict, deque
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+from langchain_core.runnables import RunnableConfig
+
+from src.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+TRACE_ID_KEY = "trace_id"
+# Run metadata key of the session, LangGraph copies the configurable thread_id into it
+SESSION_ID_KEY = "thread_id"
+DEFAULT_LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DEFAULT_RECENT_TRACES = 100
+# Sessions with token totals, kept out of the Prometheus labels to bound their cardinality
+DEFAULT_TRACKED_SESSIONS = 1000
+
+REQUEST_DURATION = "pokemon_agent_request_duration_seconds"
+NODE_DURATION = "pokemon_agent_node_duration_seconds"
+NODE_ERRORS = "pokemon_agent_node_errors_total"
+LLM_CALL_DURATION = "pokemon_agent_llm_call_duration_seconds"
+LLM_CALL_ERRORS = "pokemon_agent_llm_call_errors_total"
+LLM_TOKENS = "pokemon_agent_llm_tokens_total"
+LLM_CLIENT_EVENTS = "pokemon_agent_llm_client_events_total"
+DATA_SOURCE_CALL_DURATION = "pokemon_agent_data_source_call_duration_seconds"
+DATA_SOURCE_RETRIES = "pokemon_agent_data_source_retries_total"
+SERVER_REQUESTS = "pokemon_agent_server_requests_total"
+SERVER_REJECTED_REQUESTS = "pokemon_agent_server_rejected_requests_total"
+
+_Labels = tuple[tuple[str, str], ...]
+
+
+def new_trace_id() -> str:
+    """Create an ID grouping every metric recorded for one request."""
+    return uuid.uuid4().hex
+
+
+class Histogram:
+    """Cumulative-bucket histogram, not thread-safe on its own."""
+
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.bucket_counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.bucket_counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, quantile: float) -> float:
+        """Estimate a quantile as the upper bound of the bucket it falls in."""
+        rank = quantile * self.count
+        cumulative_count = 0
+        for upper_bound, bucket_count in zip(self.buckets, self.bucket_counts):
+            cumulative_count += bucket_count
+            if cumulative_count >= rank:
+                return min(upper_bound, self.max)
+        return self.max
+
+
+class MetricsRegistry:
+    """Thread-safe store of labelled histograms and counters."""
+
+    def __init__(self, recent_traces: int = DEFAULT_RECENT_TRACES, tracked_sessions: int = DEFAULT_TRACKED_SESSIONS):
+        self._histograms: dict[str, dict[_Labels, Histogram]] = {}
+        self._counters: dict[str, dict[_Labels, float]] = {}
+        self._recent_traces: deque[dict[str, Any]] = deque(maxlen=recent_traces)
+        self._session_tokens: OrderedDict[str, dict[str, int]] = OrderedDict()
+        self._tracked_sessions = tracked_sessions
+        self._lock = threading.Lock()
+
+    def observe(self, name: str, labels: dict[str, str], value: float) -> None:
+        label_key = tuple(sorted(labels.items()))
+        with self._lock:
+            histograms = self._histograms.setdefault(name, {})
+            histogram = histograms.get(label_key)
+            if histogram is None:
+                histogram = histograms[label_key] = Histogram()
+            histogram.observe(value)
+
+    def increment(self, name: str, labels: dict[str, str], amount: float = 1) -> None:
+        label_key = tuple(sorted(labels.items()))
+        with self._lock:
+            counters = self._counters.setdefault(name, {})
+            counters[label_key] = counters.get(label_key, 0) + amount
+
+    def record_trace(self, trace: dict[str, Any]) -> None:
+        with self._lock:
+            self._recent_traces.append(trace)
+
+    def add_session_tokens(self, session_id: str, kind: str, amount: int) -> None:
+        """Add to a session's token total, the least recently active sessions are forgotten first."""
+        with self._lock:
+            session_tokens = self._session_tokens.pop(session_id, None) or {"input": 0, "output": 0}
+            session_tokens[kind] = session_tokens.get(kind, 0) + amount
+            self._session_tokens[session_id] = session_tokens
+            while len(self._session_tokens) > self._tracked_sessions:
+                self._session_tokens.popitem(last=False)
+
+    def session_tokens(self, session_id: str) -> dict[str, int]:
+        """Get the input and output tokens used by a session so far."""
+        with self._lock:
+            return dict(self._session_tokens.get(session_id) or {"input": 0, "output": 0})
+
+    def clear(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+            self._recent_traces.clear()
+            self._session_tokens.clear()
+
+    def snapshot(self) -> dict[str, Any]:
+        """Get every metric as JSON-serializable data.
+
+        Returns:
+            Histograms with count, sum, max and estimated p50/p95/p99, counters, the recent
+            traces and the token totals of the tracked sessions.
+        """
+        with self._lock:
+            return {
+                "histograms": {
+                    name: [
+                        {
+                            "labels": dict(label_key),
+                            "count": histogram.count,
+                            "sum": histogram.sum,
+                            "max": histogram.max,
+                            "p50": histogram.quantile(0.5),
+                            "p95": histogram.quantile(0.95),
+                            "p99": histogram.quantile(0.99),
+                        }
+                        for label_key, histogram in histograms.items()
+                    ]
+                    for name, histograms in self._histograms.items()
+                },
+                "counters": {
+                    name: [{"labels": dict(label_key), "value": value} for label_key, value in counters.items()]
+                    for name, counters in self._counters.items()
+                },
+                "recent_traces": list(self._recent_traces),
+                "session_tokens": {session_id: dict(tokens) for session_id, tokens in self._session_tokens.items()},
+            }
+
+    def to_prometheus(self) -> str:
+        """Render every histogram and counter in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            for name, histograms in self._histograms.items():
+                lines.append(f"# TYPE {name} histogram")
+                for label_key, histogram in histograms.items():
+                    cumulative_count = 0
+                    for upper_bound, bucket_count in zip(histogram.buckets, histogram.bucket_counts):
+                        cumulative_count += bucket_count
+                        lines.append(f"{name}_bucket{_prometheus_labels(label_key, le=repr(upper_bound))} {cumulative_count}")
+                    lines.append(f"{name}_bucket{_prometheus_labels(label_key, le='+Inf')} {histogram.count}")
+                    lines.append(f"{name}_sum{_prometheus_labels(label_key)} {histogram.sum}")
+                    lines.append(f"{name}_count{_prometheus_labels(label_key)} {histogram.count}")
+
+            for name, counters in self._counters.items():
+                lines.append(f"# TYPE {name} counter")
+                for label_key, value in counters.items():
+                    lines.append(f"{name}{_prometheus_labels(label_key)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def _prometheus_labels(label_key: _Labels, **extra_labels: str) -> str:
+    labels = [*label_key, *extra_labels.items()]
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape_label_value(value)}"' for key, value in labels) + "}"
+
+
+def _escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+@lru_cache(maxsize=1)
+def get_metrics() -> MetricsRegistry:
+    """Get the process-wide metrics registry."""
+    return MetricsRegistry()
+
+
+def write_metrics(output_path: str | Path) -> Path:
+    """Dump the metrics to a file, in the Prometheus format for .prom files and as JSON otherwise.
+
+    Args:
+        output_path: Where to write the metrics.
+
+    Returns:
+        The path of the written file.
+    """
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    if output_path.suffix == ".prom":
+        output_path.write_text(get_metrics().to_prometheus(), encoding="utf-8")
+    else:
+        output_path.write_text(json.dumps(get_metrics().snapshot(), indent=2), encoding="utf-8")
+    return output_path
+
+
+def record_data_source_call(source: str, outcome: str, duration_seconds: float) -> None:
+    get_metrics().observe(DATA_SOURCE_CALL_DURATION, {"source": source, "outcome": outcome}, duration_seconds)
+
+
+def record_data_source_retry(source: str) -> None:
+    get_metrics().increment(DATA_SOURCE_RETRIES, {"source": source})
+
+
+def record_llm_client_event(event: str) -> None:
+    get_metrics().increment(LLM_CLIENT_EVENTS, {"event": event})
+
+
+def _trace_id(state: dict[str, Any], config: RunnableConfig) -> str:
+    return state.get(TRACE_ID_KEY) or config.get("metadata", {}).get(TRACE_ID_KEY) or new_trace_id()
+
+
+def with_trace_id(node: Callable) -> Callable:
+    """Wrap a node so its update carries the request's trace ID into PokemonState.
+
+    The ID is taken from the state, then from the run metadata, and created otherwise.
+    """
+    # Not functools.wraps: RunnableLambda must see the config parameter to pass the run config
+    if inspect.iscoroutinefunction(node):
+        async def traced_node(state: dict[str, Any], config: RunnableConfig) -> dict[str, Any]:
+            return {**await node(state), TRACE_ID_KEY: _trace_id(state, config)}
+    else:
+        def traced_node(state: dict[str, Any], config: RunnableConfig) -> dict[str, Any]:
+            return {**node(state), TRACE_ID_KEY: _trace_id(state, config)}
+
+    traced_node.__name__ = node.__name__
+    traced_node.__doc__ = node.__doc__
+    return traced_node
+
+
+class MetricsCallbackHandler(BaseCallbackHandler):
+    """Records graph, node and LLM call metrics from LangChain callbacks."""
+
+    run_inline = True
+
+    def __init__(self, metrics: MetricsRegistry):
+        self.metrics = metrics
+        self._graph_runs: dict[UUID, tuple[float, str | None]] = {}
+        self._node_runs: dict[UUID, tuple[str, float, str | None]] = {}
+        self._llm_runs: dict[UUID, tuple[str, float, dict[str, Any]]] = {}
+        self._traces: dict[str, dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def on_chain_start(
+        self,
+        serialized: Any,
+        inputs: Any,
+        *,
+        run_id: UUID,
+        parent_run_id: UUID | None = None,
+        metadata: dict[str, Any] | None = None,
+        **kwargs: Any
+    ) -> None:
+        metadata = metadata or {}
+        trace_id = metadata.get(TRACE_ID_KEY)
+        if parent_run_id is None:
+            with self._lock:
+                self._graph_runs[run_id] = (time.perf_counter(), trace_id)
+                if trace_id is not None:
+                    self._traces[trace_id] = {TRACE_ID_KEY: trace_id, "nodes": [], "llm_calls": 0, "tokens": {}}
+            return
+
+        # A node wraps its runnable in a run of the same name, only time the outer one
+        node_name = metadata.get("langgraph_node")
+        if node_name is not None and kwargs.get("name") == node_name and parent_run_id not in self._node_runs:
+            with self._lock:
+                self._node_runs[run_id] = (node_name, time.perf_counter(), trace_id)
+
+    def on_chain_end(self, outputs: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._finish_chain(run_id, failed=False)
+
+    def on_chain_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._finish_chain(run_id, failed=True)
+
+    def _finish_chain(self, run_id: UUID, failed: bool) -> None:
+        finished_at = time.perf_counter()
+        with self._lock:
+            node_run = self._node_runs.pop(run_id, None)
+            graph_run = self._graph_runs.pop(run_id, None)
+            trace = self._traces.pop(graph_run[1], None) if graph_run is not None and graph_run[1] else None
+
+        if node_run is not None:
+            node_name, started_at, trace_id = node_run
+            self.metrics.observe(NODE_DURATION, {"node": node_name}, finished_at - started_at)
+            if failed:
+                self.metrics.increment(NODE_ERRORS, {"node": node_name})
+            with self._lock:
+                if trace_id in self._traces:
+                    self._traces[trace_id]["nodes"].append({"node": node_name, "seconds": finished_at - started_at})
+
+        if graph_run is not None:
+            outcome = "error" if failed else "ok"
+            self.metrics.observe(REQUEST_DURATION, {"outcome": outcome}, finished_at - graph_run[0])
+            if trace is not None:
+                self.metrics.record_trace({**trace, "seconds": finished_at - graph_run[0], "outcome": outcome})
+
+    def on_chat_model_start(
+        self,
+        serialized: Any,
+        messages: Any,
+        *,
+        run_id: UUID,
+        metadata: dict[str, Any] | None = None,
+        **kwargs: Any
+    ) -> None:
+        metadata = metadata or {}
+        model_name = metadata.get("ls_model_name") or kwargs.get("invocation_params", {}).get("model_name", "unknown")
+        with self._lock:
+            self._llm_runs[run_id] = (model_name, time.perf_counter(), metadata)
+            trace = self._traces.get(metadata.get(TRACE_ID_KEY))
+            if trace is not None:
+                trace["llm_calls"] += 1
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        with self._lock:
+            llm_run = self._llm_runs.pop(run_id, None)
+        if llm_run is None:
+            return
+
+        model_name, started_at, metadata = llm_run
+        self.metrics.observe(LLM_CALL_DURATION, {"model": model_name}, time.perf_counter() - started_at)
+        node_name = metadata.get("langgraph_node", "none")
+        for generations in response.generations:
+            for generation in generations:
+                usage_metadata = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+                for token_kind in ("input_tokens", "output_tokens"):
+                    if usage_metadata.get(token_kind):
+                        self._record_tokens(model_name, node_name, metadata, token_kind.removesuffix("_tokens"), usage_metadata[token_kind])
+
+    def _record_tokens(self, model_name: str, node_name: str, metadata: dict[str, Any], kind: str, amount: int) -> None:
+        self.metrics.increment(LLM_TOKENS, {"model": model_name, "node": node_name, "kind": kind}, amount)
+        session_id = metadata.get(SESSION_ID_KEY)
+        if session_id is not None:
+            self.metrics.add_session_tokens(str(session_id), kind, amount)
+        with self._lock:
+            trace = self._traces.get(metadata.get(TRACE_ID_KEY))
+            if trace is not None:
+                node_tokens = trace["tokens"].setdefault(node_name, {"input": 0, "output": 0})
+                node_tokens[kind] += amount
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        with self._lock:
+            llm_run = self._llm_runs.pop(run_id, None)
+        if llm_run is not None:
+            self.metrics.observe(LLM_CALL_DURATION, {"model": llm_run[0]}, time.perf_counter() - llm_run[1])
+            self.metrics.increment(LLM_CALL_ERRORS, {"model": llm_run[0]})
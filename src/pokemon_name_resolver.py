@@ -0,0 +1,224 @@
+import re
+from functools import lru_cache
+from typing import Iterable
+
+from attrs import frozen
+
+from src.pokemon_species_index import get_species_index, normalize_pokemon_name
+from src.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+# Resolutions at or above this confidence skip the LLM extraction entirely
+RESOLVER_CONFIDENCE_THRESHOLD = 0.8
+
+# Near misses, words one edit past their typo budget, are only looked for up to this distance
+_MAX_NEAR_MISS_DISTANCE = 2
+_TOKEN_PATTERN = re.compile(r"[\w♀♂'’.-]+")
+_MAX_NGRAM = 3
+STOP_WORDS = frozenset({
+    "a", "about", "against", "an", "and", "any", "are", "at", "be", "beat", "beats", "best", "can", "counter",
+    "counters", "do", "does", "for", "from", "good", "help", "how", "i", "in", "is", "it", "me", "my", "of", "on",
+    "or", "pokemon", "pokémon", "should", "strong", "tell", "the", "to", "type", "types", "use", "vs", "weak",
+    "weakness", "weaknesses", "what", "what's", "whats", "which", "who", "with", "you",
+})
+
+
+@frozen
+class NameResolution:
+    """The outcome of resolving a pokemon name locally."""
+    pokemon_name: str | None
+    confidence: float
+
+
+def levenshtein_distance(source: str, target: str) -> int:
+    """Compute the edit distance between two strings."""
+    if len(source) < len(target):
+        source, target = target, source
+
+    previous_row = list(range(len(target) + 1))
+    for source_index, source_char in enumerate(source, start=1):
+        current_row = [source_index]
+        for target_index, target_char in enumerate(target, start=1):
+            current_row.append(min(
+                previous_row[target_index] + 1,
+                current_row[target_index - 1] + 1,
+                previous_row[target_index - 1] + (source_char != target_char),
+            ))
+        previous_row = current_row
+    return previous_row[-1]
+
+
+class BKTree:
+    """Burkhard-Keller tree for bounded edit-distance search."""
+
+    def __init__(self, words: Iterable[str]):
+        self._root: tuple[str, dict[int, tuple]] | None = None
+        for word in words:
+            self.add(word)
+
+    def add(self, word: str) -> None:
+        if self._root is None:
+            self._root = (word, {})
+            return
+
+        node_word, children = self._root
+        while True:
+            distance = levenshtein_distance(word, node_word)
+            if distance == 0:
+                return
+            if distance not in children:
+                children[distance] = (word, {})
+                return
+            node_word, children = children[distance]
+
+    def search(self, word: str, max_distance: int) -> list[tuple[int, str]]:
+        """Find every word within max_distance edits, closest first."""
+        if self._root is None:
+            return []
+
+        matches = []
+        pending = [self._root]
+        while pending:
+            node_word, children = pending.pop()
+            distance = levenshtein_distance(word, node_word)
+            if distance <= max_distance:
+                matches.append((distance, node_word))
+            for child_distance, child in children.items():
+                if distance - max_distance <= child_distance <= distance + max_distance:
+                    pending.append(child)
+        return sorted(matches)
+
+
+def max_edit_distance(token: str) -> int:
+    """Allowed typos for a token, short tokens must match exactly."""
+    # Plenty of 5 and 6 letter English words are one edit away from a name, e.g. horse, monkey and kitten
+    if len(token) <= 6:
+        return 0
+    if len(token) <= 7:
+        return 1
+    return 2
+
+
+def tokenize(text: str) -> list[str]:
+    """Split user input into lowercase words.
+
+    Args:
+        text: The user's message.
+
+    Returns:
+        The words in the order they appear, with surrounding punctuation removed.
+    """
+    words = []
+    for word in _TOKEN_PATTERN.findall(text.lower()):
+        word = word.strip(".'’-")
+        if word:
+            words.append(word)
+    return words
+
+
+class PokemonNameResolver:
+    """Resolves pokemon names from free text without calling the LLM."""
+
+    def __init__(self, names: Iterable[str]):
+        self._names = frozenset(names)
+        self._tree = BKTree(sorted(self._names))
+
+    def _possessive_stripped(self, token: str) -> str:
+        if token not in self._names and token.endswith(("'s", "’s")):
+            return token[:-2]
+        return token
+
+    def _fuzzy_resolution(self, word: str) -> NameResolution | None:
+        matches = self._tree.search(word, max_edit_distance(word))
+        if not matches:
+            return None
+
+        distance, name = matches[0]
+        confidence = 1 - distance / max(len(word), len(name))
+        if len(matches) > 1 and matches[1][0] == distance:
+            confidence /= 2
+        return NameResolution(pokemon_name=name, confidence=confidence)
+
+    def _near_miss(self, word: str) -> NameResolution | None:
+        """A name just past the word's typo budget, e.g. "chrzard", which the LLM has to settle"""
+        max_distance = max_edit_distance(word) + 1
+        # Words shorter than 4 letters are a single edit away from too many names
+        if len(word) < 4 or max_distance > _MAX_NEAR_MISS_DISTANCE:
+            return None
+
+        matches = self._tree.search(word, max_distance)
+        if not matches:
+            return None
+
+        distance, name = matches[0]
+        # Always below RESOLVER_CONFIDENCE_THRESHOLD, a near miss is a mention the resolver could not settle
+        return NameResolution(pokemon_name=name, confidence=(1 - distance / max(len(word), len(name))) / 2)
+
+    def resolve_all(self, text: str) -> list[NameResolution]:
+        """Find every pokemon name mentioned in a message, e.g. both names of "compare gyarados and dragonite".
+
+        Words are matched left to right, multi-word names first, so the words of a
+        matched name are not matched again on their own. Words just past their typo
+        budget are returned too, with a confidence below RESOLVER_CONFIDENCE_THRESHOLD.
+
+        Args:
+            text: The user's message.
+
+        Returns:
+            One NameResolution per distinct name, in the order they are mentioned.
+        """
+        words = [self._possessive_stripped(word) for word in tokenize(text)]
+        resolutions: dict[str, NameResolution] = {}
+        position = 0
+        while position < len(words):
+            resolution, matched_words = None, 1
+            for ngram_size in range(min(_MAX_NGRAM, len(words) - position), 1, -1):
+                ngram = words[position:position + ngram_size]
+                candidate = next((name for name in (" ".join(ngram), "-".join(ngram)) if name in self._names), None)
+                if candidate is not None:
+                    resolution, matched_words = NameResolution(pokemon_name=candidate, confidence=1.0), ngram_size
+                    break
+
+            word = words[position]
+            if resolution is None and word not in STOP_WORDS:
+                if word in self._names:
+                    resolution = NameResolution(pokemon_name=word, confidence=1.0)
+                else:
+                    resolution = self._fuzzy_resolution(word) or self._near_miss(word)
+
+            if resolution is not None and resolution.pokemon_name not in resolutions:
+                resolutions[resolution.pokemon_name] = resolution
+            position += matched_words
+        return list(resolutions.values())
+
+
+@lru_cache(maxsize=1)
+def get_name_resolver() -> PokemonNameResolver:
+    """Build the resolver over the species index names once per process."""
+    species_index = get_species_index()
+    names = species_index.names() if species_index is not None else ()
+    return PokemonNameResolver(names)
+
+
+def resolve_pokemon_names(text: str) -> list[NameResolution]:
+    """Resolve every pokemon name in a message to its canonical name.
+
+    Args:
+        text: The user's message.
+
+    Returns:
+        One NameResolution per distinct canonical pokemon name, in the order they are mentioned.
+    """
+    species_index = get_species_index()
+    if species_index is None:
+        return []
+
+    resolutions: dict[str, NameResolution] = {}
+    for resolution in get_name_resolver().resolve_all(text):
+        # Aliases and forms of the same species collapse to one canonical name
+        pokemon_name = species_index.lookup(normalize_pokemon_name(resolution.pokemon_name)).name
+        if pokemon_name not in resolutions:
+            resolutions[pokemon_name] = NameResolution(pokemon_name=pokemon_name, confidence=resolution.confidence)
+    logger.debug("Resolved '%s' to %s", text, list(resolutions))
+    return list(resolutions.values())
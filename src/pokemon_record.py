@@ -0,0 +1,25 @@
+from typing import Any
+
+from attrs import asdict, frozen, field
+
+
+class StateRecord:
+    """Base of the attrs records kept in the graph state.
+
+    LangGraph's msgpack serializer stores objects with an _asdict method, like
+    namedtuples, as the keyword arguments of their constructor, so checkpoints of
+    the state need no pickle. Tuple fields convert their values back from the
+    lists msgpack restores.
+    """
+    __slots__ = ()
+
+    def _asdict(self) -> dict[str, Any]:
+        return asdict(self, recurse=False)
+
+
+@frozen
+class PokemonRecord(StateRecord):
+    """The slim subset of a Pokemon resource the agent actually needs."""
+    id: int
+    name: str
+    types: tuple[str, ...] = field(converter=tuple)
@@ -0,0 +1,370 @@
+"""
+Long-running HTTP server for the Pokemon agent.
+
+Endpoints:
+- POST /query: {"input": "...", "session_id": "..."} -> {"output": "...", "trace_id": "..."}, session_id is optional
+- POST /query/stream: the same request answered as newline-delimited JSON StreamEvents
+- GET /healthz: liveness, 200 while the process serves requests
+- GET /readyz: readiness, 200 once the data, graph and model client are warmed up
+- GET /metrics: the metrics registry in the Prometheus text format
+
+The endpoints are a Starlette app served by uvicorn, which parses HTTP, keeps
+connections alive and drains them on shutdown. This module adds the admission
+control: graph runs execute on the event loop through the async node versions,
+at most max_concurrency at once, up to max_queue more wait for a slot and
+anything beyond that is shed with 503 and a Retry-After header. On SIGTERM or
+SIGINT the server stops accepting connections, reports not ready, closes the
+idle keep-alive connections, waits for the in-flight requests up to
+shutdown_timeout_seconds and closes the data source. Run it behind a reverse
+proxy for TLS.
+"""
+
+import asyncio
+import json
+import time
+from contextlib import aclosing, asynccontextmanager
+from http import HTTPStatus
+from typing import Any, AsyncIterator
+
+import uvicorn
+from attrs import asdict, frozen
+from starlette.applications import Starlette
+from starlette.exceptions import HTTPException
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from starlette.routing import Route
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.pokemon_metrics import SERVER_REJECTED_REQUESTS, SERVER_REQUESTS, get_metrics
+from src.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8080
+DEFAULT_MAX_CONCURRENCY = 16
+DEFAULT_MAX_QUEUE = 64
+# Longest request line and headers uvicorn buffers while they arrive, longer ones are answered with 400
+MAX_REQUEST_HEAD_BYTES = 16 * 1024
+# Longest path and query string, longer ones are answered with 414
+MAX_REQUEST_TARGET_BYTES = 8 * 1024
+
+
+@frozen
+class ServerConfig:
+    """Options of the Pokemon agent HTTP server."""
+    host: str = DEFAULT_HOST
+    port: int = DEFAULT_PORT
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY
+    max_queue: int = DEFAULT_MAX_QUEUE
+    request_timeout_seconds: float = 60.0
+    keep_alive_timeout_seconds: float = 5.0
+    shutdown_timeout_seconds: float = 30.0
+    max_body_bytes: int = 64 * 1024
+    retry_after_seconds: int = 1
+
+
+class ClosingStreamingResponse(StreamingResponse):
+    """StreamingResponse closing its body iterator however the response ends.
+
+    Starlette stops iterating when the client disconnects, closing the iterator
+    runs its cleanup, e.g. releasing the request's slot, right away.
+    """
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        async with aclosing(self.body_iterator):
+            await super().__call__(scope, receive, send)
+
+
+class RequestTargetLimitMiddleware:
+    """ASGI middleware answering requests with a path and query string over max_target_bytes with 414.
+
+    uvicorn only bounds request heads that arrive in pieces, a long request line
+    sent at once reaches the app.
+    """
+
+    def __init__(self, app: ASGIApp, max_target_bytes: int = MAX_REQUEST_TARGET_BYTES):
+        self.app = app
+        self.max_target_bytes = max_target_bytes
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http" and len(scope["raw_path"]) + len(scope["query_string"]) > self.max_target_bytes:
+            response = error_response(HTTPStatus.REQUEST_URI_TOO_LONG, "Request line too long", {"Connection": "close"})
+            await response(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
+
+
+class RequestMetricsMiddleware:
+    """ASGI middleware counting the responses by path and status."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = HTTPStatus.INTERNAL_SERVER_ERROR.value
+
+        async def send_counted(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_counted)
+        finally:
+            get_metrics().increment(SERVER_REQUESTS, {"path": scope["path"], "status": str(status)})
+
+
+def error_response(status: int, message: str, headers: dict[str, str] | None = None) -> JSONResponse:
+    """Build the JSON body of an error status."""
+    return JSONResponse({"error": message}, status_code=status, headers=headers)
+
+
+def warm_up() -> dict[str, bool]:
+    """Load the data, build the graph and create the model client.
+
+    Returns:
+        Whether each dependency is ready, keyed by name.
+    """
+    from src.main import get_compiled_graph
+    from src.pokemon_agent_tools import get_llm, get_llm_with_tools
+    from src.pokemon_cache import get_answer_cache, get_extraction_cache
+    from src.pokemon_data_sources import get_data_source
+    from src.pokemon_name_resolver import get_name_resolver
+    from src.pokemon_species_index import get_species_index
+
+    checks = {}
+    warm_ups = {
+        "species_index": lambda: get_species_index() is not None,
+        "name_resolver": lambda: get_name_resolver() is not None,
+        "data_source": lambda: get_data_source() is not None,
+        "caches": lambda: get_answer_cache() is not None and get_extraction_cache() is not None,
+        "llm": lambda: get_llm() is not None and get_llm_with_tools() is not None,
+        "graph": lambda: get_compiled_graph() is not None,
+    }
+    for name, check in warm_ups.items():
+        try:
+            checks[name] = check()
+        except Exception as e:
+            logger.error("Warm-up of %s failed: %s", name, e)
+            checks[name] = False
+    return checks
+
+
+class PokemonAgentServer:
+    """HTTP server running the compiled Pokemon agent graph behind admission control."""
+
+    def __init__(self, config: ServerConfig | None = None):
+        self.config = config or ServerConfig()
+        self.readiness_checks: dict[str, bool] = {}
+        self.app = Starlette(
+            routes=[
+                Route("/healthz", self._healthz, methods=["GET"]),
+                Route("/readyz", self._readyz, methods=["GET"]),
+                Route("/metrics", self._metrics, methods=["GET"]),
+                Route("/query", self._query, methods=["POST"]),
+                Route("/query/stream", self._query_stream, methods=["POST"]),
+            ],
+            exception_handlers={HTTPException: self._http_error, Exception: self._internal_error},
+            lifespan=self._lifespan,
+        )
+        self.app.add_middleware(RequestTargetLimitMiddleware)
+        # Added last so it is the outermost middleware and counts the 414s too
+        self.app.add_middleware(RequestMetricsMiddleware)
+        self._server: uvicorn.Server | None = None
+        self._serving: asyncio.Task | None = None
+        self._port: int | None = None
+        self._slots: asyncio.Semaphore | None = None
+        self._admitted = 0
+
+    @property
+    def port(self) -> int:
+        """The port the server listens on, useful when started on port 0."""
+        return self._port
+
+    @property
+    def shutting_down(self) -> bool:
+        return self._server is not None and self._server.should_exit
+
+    @property
+    def is_ready(self) -> bool:
+        return not self.shutting_down and bool(self.readiness_checks) and all(self.readiness_checks.values())
+
+    async def start(self) -> None:
+        """Start listening, then warm up the dependencies."""
+        self._slots = asyncio.Semaphore(self.config.max_concurrency)
+        self._server = uvicorn.Server(uvicorn.Config(
+            self.app,
+            host=self.config.host,
+            port=self.config.port,
+            http="h11",
+            h11_max_incomplete_event_size=MAX_REQUEST_HEAD_BYTES,
+            timeout_keep_alive=self.config.keep_alive_timeout_seconds,
+            timeout_graceful_shutdown=self.config.shutdown_timeout_seconds,
+            log_config=None,
+            access_log=False,
+        ))
+        # Binding first gives the port before uvicorn starts, connections wait in the backlog until it accepts them
+        listening_socket = self._server.config.bind_socket()
+        listening_socket.listen(self._server.config.backlog)
+        self._port = listening_socket.getsockname()[1]
+        self._serving = asyncio.create_task(self._server.serve(sockets=[listening_socket]))
+        logger.info("Pokemon agent server listening on %s:%s", self.config.host, self.port)
+
+        # Liveness is served during the warm-up, readiness only after it
+        self.readiness_checks = await asyncio.to_thread(warm_up)
+        if self.is_ready:
+            logger.info("Pokemon agent server is ready")
+        else:
+            logger.warning("Pokemon agent server is not ready: %s", self.readiness_checks)
+
+    async def shutdown(self) -> None:
+        """Stop accepting connections, drain the in-flight requests and release the data source."""
+        self._server.should_exit = True
+        await self._serving
+
+    async def serve_forever(self) -> None:
+        """Run until SIGTERM or SIGINT, which uvicorn turns into a graceful shutdown."""
+        await self.start()
+        await self._serving
+
+    @asynccontextmanager
+    async def _lifespan(self, app: Starlette) -> AsyncIterator[None]:
+        from src.pokemon_data_sources import get_data_source
+
+        yield
+        # uvicorn ends the lifespan once the in-flight requests are drained
+        await get_data_source().aclose()
+        logger.info("Pokemon agent server stopped")
+
+    async def _http_error(self, request: Request, exc: HTTPException) -> Response:
+        return error_response(exc.status_code, exc.detail, exc.headers)
+
+    async def _internal_error(self, request: Request, exc: Exception) -> Response:
+        # Starlette re-raises the error after this response, uvicorn logs its traceback
+        return error_response(HTTPStatus.INTERNAL_SERVER_ERROR, "Internal server error")
+
+    async def _healthz(self, request: Request) -> Response:
+        return JSONResponse({"status": "ok"})
+
+    async def _readyz(self, request: Request) -> Response:
+        status = HTTPStatus.OK if self.is_ready else HTTPStatus.SERVICE_UNAVAILABLE
+        return JSONResponse({
+            "ready": self.is_ready,
+            "shutting_down": self.shutting_down,
+            "checks": self.readiness_checks,
+        }, status_code=status)
+
+    async def _metrics(self, request: Request) -> Response:
+        return PlainTextResponse(get_metrics().to_prometheus(), media_type="text/plain; version=0.0.4")
+
+    async def _read_body(self, request: Request) -> bytes:
+        body = b""
+        async for chunk in request.stream():
+            body += chunk
+            if len(body) > self.config.max_body_bytes:
+                raise HTTPException(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, f"Body larger than {self.config.max_body_bytes} bytes")
+        return body
+
+    async def _query_input(self, request: Request) -> tuple[str, str | None]:
+        try:
+            payload = json.loads(await self._read_body(request))
+        except ValueError:
+            raise HTTPException(HTTPStatus.BAD_REQUEST, "Body must be JSON")
+        if not isinstance(payload, dict):
+            raise HTTPException(HTTPStatus.BAD_REQUEST, 'Body must be {"input": "<question>"}')
+
+        user_input = payload.get("input")
+        if not isinstance(user_input, str) or not user_input.strip():
+            raise HTTPException(HTTPStatus.BAD_REQUEST, 'Body must be {"input": "<question>"}')
+        session_id = payload.get("session_id")
+        if session_id is not None and (not isinstance(session_id, str) or not session_id):
+            raise HTTPException(HTTPStatus.BAD_REQUEST, "session_id must be a non-empty string")
+        return user_input, session_id
+
+    def _admit(self) -> None:
+        """Reserve a slot or a queue position for a graph run, shedding the request when both are full."""
+        if not self.is_ready:
+            reason = "shutting_down" if self.shutting_down else "not_ready"
+            get_metrics().increment(SERVER_REJECTED_REQUESTS, {"reason": reason})
+            raise HTTPException(
+                HTTPStatus.SERVICE_UNAVAILABLE, "Server is not ready", {"Retry-After": str(self.config.retry_after_seconds)}
+            )
+        if self._admitted >= self.config.max_concurrency + self.config.max_queue:
+            get_metrics().increment(SERVER_REJECTED_REQUESTS, {"reason": "saturated"})
+            raise HTTPException(
+                HTTPStatus.SERVICE_UNAVAILABLE, "Server is saturated", {"Retry-After": str(self.config.retry_after_seconds)}
+            )
+        self._admitted += 1
+
+    def _release(self) -> None:
+        self._admitted -= 1
+
+    async def _query(self, request: Request) -> Response:
+        from src.run_agent import new_agent_input
+
+        user_input, session_id = await self._query_input(request)
+        self._admit()
+        try:
+            initial_state, config = new_agent_input(user_input, session_id)
+            start = time.perf_counter()
+            # The deadline covers the wait for a slot, so queued requests time out too
+            result = await asyncio.wait_for(
+                self._run_graph(initial_state, config, session_id), self.config.request_timeout_seconds
+            )
+        except asyncio.TimeoutError:
+            raise HTTPException(HTTPStatus.GATEWAY_TIMEOUT, "The agent did not answer in time")
+        finally:
+            self._release()
+
+        return JSONResponse({
+            "output": result.get("output_message"),
+            "trace_id": initial_state["trace_id"],
+            "duration_seconds": time.perf_counter() - start,
+        })
+
+    async def _run_graph(self, initial_state: dict[str, Any], config: dict[str, Any], session_id: str | None) -> dict[str, Any]:
+        from src.run_agent import get_agent_graph
+
+        async with self._slots:
+            return await get_agent_graph(session_id).ainvoke(initial_state, config)
+
+    async def _query_stream(self, request: Request) -> Response:
+        user_input, session_id = await self._query_input(request)
+        self._admit()
+        return ClosingStreamingResponse(self._stream_events(user_input, session_id), media_type="application/x-ndjson")
+
+    async def _stream_events(self, user_input: str, session_id: str | None) -> AsyncIterator[bytes]:
+        from src.run_agent import astream_pokemon_agent
+
+        deadline = time.monotonic() + self.config.request_timeout_seconds
+        events = astream_pokemon_agent(user_input, session_id)
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.config.request_timeout_seconds)
+            try:
+                while True:
+                    try:
+                        event = await asyncio.wait_for(anext(events), deadline - time.monotonic())
+                    except StopAsyncIteration:
+                        break
+                    yield json.dumps(asdict(event)).encode() + b"\n"
+            finally:
+                self._slots.release()
+                await events.aclose()
+        except asyncio.TimeoutError:
+            yield json.dumps({"kind": "error", "content": "The agent did not answer in time"}).encode() + b"\n"
+        except Exception as e:
+            logger.error("Streamed query failed: %s", e)
+            yield json.dumps({"kind": "error", "content": "Internal server error"}).encode() + b"\n"
+        finally:
+            self._release()
+
+
+def serve(config: ServerConfig | None = None) -> None:
+    """Run the Pokemon agent server until it is stopped with SIGTERM or SIGINT."""
+    asyncio.run(PokemonAgentServer(config).serve_forever())
@@ -0,0 +1,268 @@
+"""
+Multi-turn sessions for the Pokemon agent.
+
+A session is a LangGraph thread: graphs built with GraphConfig(session_store=...)
+keep their state in a checkpointer keyed by the run's thread_id, so each turn only
+sends its new HumanMessage. Two stores are available:
+
+- "memory": PruningInMemorySaver, sessions live as long as the process
+- "sqlite": PruningSqliteSaver at POKEMON_SESSION_DB_PATH, shared by processes and kept across restarts
+
+The history is bounded by a HistoryPolicy applied at the start of every turn, and
+pokemon resolved in earlier turns are kept in the state's session_lookups so
+follow-up questions about them need no new lookups.
+"""
+
+import asyncio
+import os
+import sqlite3
+from collections.abc import AsyncIterator, Sequence
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable
+
+from attrs import frozen
+from langchain_core.messages import AnyMessage, HumanMessage, RemoveMessage
+from langchain_core.messages.utils import count_tokens_approximately
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+)
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+from src.pokemon_name_resolver import tokenize
+from src.pokemon_state import PokemonState
+from src.pokemon_type_matrix import TYPE_NAMES
+from src.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+MEMORY_SESSION_STORE = "memory"
+SQLITE_SESSION_STORE = "sqlite"
+# The project's cache directory, independent of the working directory
+CACHE_DIR = Path(__file__).parent.parent / "cache"
+DEFAULT_SESSION_DB_PATH = CACHE_DIR / "pokemon_sessions.sqlite3"
+# Turns of a session's message history kept between runs
+DEFAULT_HISTORY_MAX_TURNS = 5
+# Older checkpoints of a thread are only needed for time travel, which the agent does not use
+DEFAULT_MAX_CHECKPOINTS_PER_THREAD = 10
+
+# Words that refer back to the pokemon of the previous turn, e.g. "what is it weak to?"
+FOLLOW_UP_WORDS = frozenset({"it", "its", "it's", "that", "this", "them", "they", "their", "same"})
+# A follow-up also asks about matchups, "tell me a joke about that" is not about the previous pokemon
+MATCHUP_WORDS = frozenset({
+    "against", "beat", "beats", "counter", "counters", "effective", "immune", "immunities", "matchup", "matchups",
+    "resist", "resistant", "resistances", "resists", "strong", "strengths", "type", "types", "weak", "weakness",
+    "weaknesses",
+}) | frozenset(TYPE_NAMES)
+
+
+def session_serializer() -> JsonPlusSerializer:
+    """Serializer for session state, without a pickle fallback: the state's records are StateRecords."""
+    return JsonPlusSerializer()
+
+
+@frozen
+class HistoryPolicy:
+    """How much of a session's message history is kept between turns.
+
+    A turn starts at a HumanMessage. The last max_turns turns are kept, then the
+    oldest turns are dropped until the history fits in max_tokens. The current
+    turn is always kept. None disables a limit.
+    """
+    max_turns: int | None = DEFAULT_HISTORY_MAX_TURNS
+    max_tokens: int | None = None
+
+    def messages_to_drop(self, messages: Sequence[AnyMessage]) -> list[AnyMessage]:
+        """Get the oldest messages that fall outside the policy."""
+        turn_starts = [position for position, message in enumerate(messages) if isinstance(message, HumanMessage)]
+        if not turn_starts:
+            return []
+
+        kept_turns = len(turn_starts) if self.max_turns is None else max(1, self.max_turns)
+        first_kept = turn_starts[-min(kept_turns, len(turn_starts))]
+        if self.max_tokens is not None:
+            for turn_start in turn_starts:
+                if turn_start < first_kept:
+                    continue
+                if turn_start == turn_starts[-1] or count_tokens_approximately(messages[turn_start:]) <= self.max_tokens:
+                    first_kept = turn_start
+                    break
+        return list(messages[:first_kept])
+
+
+def trim_history_node(policy: HistoryPolicy) -> Callable[[PokemonState], dict[str, Any]]:
+    """Build the graph node that applies the history policy at the start of a turn."""
+    def trim_history(state: PokemonState) -> dict[str, Any]:
+        dropped_messages = policy.messages_to_drop(state["messages"])
+        if not dropped_messages:
+            return {}
+
+        logger.debug("Dropping %s messages from the session history", len(dropped_messages))
+        return {"messages": [RemoveMessage(id=message.id) for message in dropped_messages]}
+
+    return trim_history
+
+
+def is_follow_up(user_message: str) -> bool:
+    """Check if the message asks about the matchups of an earlier pokemon instead of naming one."""
+    words = set(tokenize(user_message))
+    return not words.isdisjoint(FOLLOW_UP_WORDS) and not words.isdisjoint(MATCHUP_WORDS)
+
+
+class PruningInMemorySaver(InMemorySaver):
+    """InMemorySaver keeping only the latest max_checkpoints_per_thread checkpoints of a thread.
+
+    Pruned checkpoints take their pending writes and the channel values no kept
+    checkpoint refers to with them, like PruningSqliteSaver.
+    """
+
+    def __init__(self, max_checkpoints_per_thread: int = DEFAULT_MAX_CHECKPOINTS_PER_THREAD):
+        super().__init__(serde=session_serializer())
+        self.max_checkpoints_per_thread = max_checkpoints_per_thread
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        saved_config = super().put(config, checkpoint, metadata, new_versions)
+        self._prune(saved_config["configurable"]["thread_id"], saved_config["configurable"]["checkpoint_ns"])
+        return saved_config
+
+    def _prune(self, thread_id: str, checkpoint_ns: str) -> None:
+        checkpoints = self.storage[thread_id][checkpoint_ns]
+        if len(checkpoints) <= self.max_checkpoints_per_thread:
+            return
+
+        # Checkpoint IDs sort in creation order
+        for checkpoint_id in sorted(checkpoints)[:-self.max_checkpoints_per_thread]:
+            del checkpoints[checkpoint_id]
+            self.writes.pop((thread_id, checkpoint_ns, checkpoint_id), None)
+
+        kept_versions = {
+            (channel, version)
+            for serialized_checkpoint, _, _ in checkpoints.values()
+            for channel, version in self.serde.loads_typed(serialized_checkpoint)["channel_versions"].items()
+        }
+        for blob_key in [
+            blob_key for blob_key in self.blobs
+            if blob_key[:2] == (thread_id, checkpoint_ns) and blob_key[2:] not in kept_versions
+        ]:
+            del self.blobs[blob_key]
+
+
+class PruningSqliteSaver(SqliteSaver):
+    """SqliteSaver keeping only the latest max_checkpoints_per_thread checkpoints of a thread.
+
+    The async methods run the sync ones in a worker thread. AsyncSqliteSaver is bound
+    to the event loop of its connection, while one compiled session graph serves
+    invoke and astream alike.
+    """
+
+    def __init__(
+        self,
+        path: str | os.PathLike,
+        max_checkpoints_per_thread: int = DEFAULT_MAX_CHECKPOINTS_PER_THREAD
+    ):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # SqliteSaver serializes every query with its lock, the connection is shared by the worker threads
+        super().__init__(sqlite3.connect(self.path, check_same_thread=False), serde=session_serializer())
+        self.max_checkpoints_per_thread = max_checkpoints_per_thread
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        saved_config = super().put(config, checkpoint, metadata, new_versions)
+        self._prune(saved_config["configurable"]["thread_id"], saved_config["configurable"]["checkpoint_ns"])
+        return saved_config
+
+    def _prune(self, thread_id: str, checkpoint_ns: str) -> None:
+        with self.cursor() as cursor:
+            oldest_kept = cursor.execute(
+                "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+                "ORDER BY checkpoint_id DESC LIMIT 1 OFFSET ?",
+                (thread_id, checkpoint_ns, self.max_checkpoints_per_thread - 1)
+            ).fetchone()
+            if oldest_kept is None:
+                return
+            for table in ("checkpoints", "writes"):
+                cursor.execute(
+                    f"DELETE FROM {table} WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id < ?",
+                    (thread_id, checkpoint_ns, oldest_kept[0])
+                )
+
+    async def aget_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: RunnableConfig | None,
+        *,
+        filter: dict[str, Any] | None = None,
+        before: RunnableConfig | None = None,
+        limit: int | None = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        checkpoint_tuples = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for checkpoint_tuple in checkpoint_tuples:
+            yield checkpoint_tuple
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+    def close(self) -> None:
+        with self.lock:
+            self.conn.close()
+
+
+@lru_cache(maxsize=None)
+def get_checkpointer(session_store: str) -> BaseCheckpointSaver:
+    """Get the process-wide checkpointer of a session store.
+
+    The SQLite store lives at POKEMON_SESSION_DB_PATH (default
+    cache/pokemon_sessions.sqlite3 under the project root).
+
+    Args:
+        session_store: "memory" or "sqlite".
+
+    Returns:
+        The shared checkpointer.
+    """
+    if session_store == MEMORY_SESSION_STORE:
+        return PruningInMemorySaver()
+    if session_store == SQLITE_SESSION_STORE:
+        return PruningSqliteSaver(os.environ.get("POKEMON_SESSION_DB_PATH", DEFAULT_SESSION_DB_PATH))
+    raise ValueError(f"Unknown session store {session_store!r}, expected {MEMORY_SESSION_STORE!r} or {SQLITE_SESSION_STORE!r}")
@@ -0,0 +1,413 @@
+"""
+Concurrent builder of the species snapshot from a PokeAPI-compatible server.
+
+Every pokemon (species and alternate forms) and every type is listed, then fetched
+with bounded parallelism over one pooled async client. Each fetched resource is
+reduced to the few fields the snapshot needs and appended to a JSONL journal next
+to the snapshot:
+
+    {"run": "<id>", "event": "started"}
+    {"run": "<id>", "path": "/pokemon/venusaur", "etag": "...", "last_modified": "...", "resource": {...}}
+    {"run": "<id>", "event": "finished"}
+
+A build interrupted before its "finished" line resumes on the next run, without
+requesting the resources already journaled again. Finished journals make the next
+build incremental: known resources are revalidated with If-None-Match /
+If-Modified-Since, so only new and changed resources are downloaded.
+
+The snapshot keeps the hand-written aliases of the previous snapshot and adds the
+attack relations of every type, which are checked against the built-in type chart.
+"""
+
+import asyncio
+import json
+import os
+import time
+import uuid
+from collections.abc import Iterable
+from pathlib import Path
+from typing import IO, Any
+
+import httpx
+from attrs import frozen
+
+from src.pokemon_data_sources import (
+    DEFAULT_CONNECTION_LIMITS,
+    DEFAULT_TIMEOUT_SECONDS,
+    POKEAPI_BASE_URL,
+    RETRYABLE_STATUS_CODES,
+    PokemonDataError,
+    RetryPolicy,
+)
+from src.pokemon_species_index import DEFAULT_SNAPSHOT_PATH
+from src.pokemon_type_matrix import TYPE_INDEX, TYPE_NAMES, effectiveness
+from src.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_DOWNLOAD_CONCURRENCY = 32
+# Large enough for a list endpoint to return every resource in one page
+LIST_PAGE_SIZE = 100_000
+JOURNAL_SUFFIX = ".journal.jsonl"
+
+# Damage relation of a type -> multiplier of its attacks
+_DAMAGE_RELATIONS = (("double_damage_to", 2), ("half_damage_to", 0.5), ("no_damage_to", 0))
+
+_RESUMED = "resumed"
+_NOT_MODIFIED = "not_modified"
+_FETCHED = "fetched"
+
+
+@frozen
+class SnapshotBuildStats:
+    """What a build downloaded and wrote."""
+    fetched: int
+    not_modified: int
+    resumed: int
+    species: int
+    forms: int
+    types: int
+    duration_seconds: float
+
+    def __str__(self) -> str:
+        return (
+            f"{self.species} species, {self.forms} forms and {self.types} types in {self.duration_seconds:.2f}s "
+            f"({self.fetched} fetched, {self.not_modified} unchanged, {self.resumed} resumed)"
+        )
+
+
+def journal_path_for(snapshot_path: str | os.PathLike) -> Path:
+    """Get the path of the journal kept next to a snapshot."""
+    snapshot_path = Path(snapshot_path)
+    return snapshot_path.with_name(snapshot_path.stem + JOURNAL_SUFFIX)
+
+
+def _compact_pokemon(pokemon_data: dict[str, Any]) -> dict[str, Any]:
+    return {
+        "id": pokemon_data["id"],
+        "name": pokemon_data["name"],
+        "types": [
+            pokemon_type["type"]["name"]
+            for pokemon_type in sorted(pokemon_data["types"], key=lambda pokemon_type: pokemon_type["slot"])
+        ],
+        "species": pokemon_data["species"]["name"],
+        "is_default": pokemon_data["is_default"],
+    }
+
+
+def _compact_type(type_data: dict[str, Any]) -> dict[str, Any]:
+    damage_to = {}
+    for relation, multiplier in _DAMAGE_RELATIONS:
+        for defending_type in type_data["damage_relations"][relation]:
+            damage_to[defending_type["name"]] = multiplier
+    return {"name": type_data["name"], "damage_to": damage_to}
+
+
+def _compact_resource(path: str, resource_data: dict[str, Any]) -> dict[str, Any]:
+    if path.startswith("/type/"):
+        return _compact_type(resource_data)
+    return _compact_pokemon(resource_data)
+
+
+def load_journal(journal_path: str | os.PathLike) -> tuple[dict[str, dict[str, Any]], str | None]:
+    """Read a build journal.
+
+    A line cut short by an interruption is skipped.
+
+    Args:
+        journal_path: Path of the JSONL journal.
+
+    Returns:
+        The latest entry of every resource path, and the ID of the unfinished run, if any.
+    """
+    entries, unfinished_run = {}, None
+    try:
+        journal_lines = Path(journal_path).read_text(encoding="utf-8").splitlines()
+    except FileNotFoundError:
+        return entries, unfinished_run
+
+    for line in journal_lines:
+        if not line.strip():
+            continue
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            logger.warning("Skipping a truncated line of %s", journal_path)
+            continue
+        if "path" in entry:
+            entries[entry["path"]] = entry
+        elif entry.get("event") == "started":
+            unfinished_run = entry["run"]
+        elif entry.get("event") == "finished":
+            unfinished_run = None
+    return entries, unfinished_run
+
+
+def _load_aliases(snapshot_path: Path) -> dict[str, list[str]]:
+    try:
+        snapshot = json.loads(snapshot_path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    return {species["name"]: species["aliases"] for species in snapshot.get("species", []) if species.get("aliases")}
+
+
+def _valid_types(pokemon: dict[str, Any]) -> bool:
+    return 1 <= len(pokemon["types"]) <= 2 and all(pokemon_type in TYPE_INDEX for pokemon_type in pokemon["types"])
+
+
+def assemble_snapshot(
+    resources: Iterable[dict[str, Any]],
+    aliases: dict[str, list[str]] | None = None
+) -> dict[str, Any]:
+    """Group compact pokemon and type resources into a snapshot.
+
+    Args:
+        resources: Compact resources, as stored in the journal.
+        aliases: Aliases to keep, by species name.
+
+    Returns:
+        The snapshot: species in ID order with their forms and aliases, and the
+        attack relations of the types of the built-in chart.
+    """
+    aliases = aliases or {}
+    pokemon, types = [], {}
+    for resource in resources:
+        if "damage_to" in resource:
+            types[resource["name"]] = resource["damage_to"]
+        elif _valid_types(resource):
+            pokemon.append(resource)
+        else:
+            logger.warning("Leaving %s out of the snapshot, unsupported types %s", resource["name"], resource["types"])
+
+    pokemon.sort(key=lambda record: record["id"])
+    species_by_name = {}
+    for record in pokemon:
+        if record["is_default"]:
+            species_by_name[record["species"]] = {"id": record["id"], "name": record["name"], "types": record["types"]}
+    for record in pokemon:
+        if record["is_default"]:
+            continue
+        species = species_by_name.get(record["species"])
+        if species is None:
+            logger.warning("No default pokemon for species %s, adding %s as a species", record["species"], record["name"])
+            species_by_name[record["species"]] = {"id": record["id"], "name": record["name"], "types": record["types"]}
+            continue
+        species.setdefault("forms", []).append({"id": record["id"], "name": record["name"], "types": record["types"]})
+
+    species_list = sorted(species_by_name.values(), key=lambda species: species["id"])
+    for species in species_list:
+        if species["name"] in aliases:
+            species["aliases"] = aliases[species["name"]]
+
+    return {
+        "source": "pokeapi",
+        "species": species_list,
+        "types": {
+            type_name: {
+                defending_type: multiplier
+                for defending_type, multiplier in types[type_name].items()
+                if defending_type in TYPE_INDEX
+            }
+            for type_name in TYPE_NAMES if type_name in types
+        },
+    }
+
+
+def check_type_chart(snapshot: dict[str, Any]) -> list[str]:
+    """Compare the snapshot's type relations with the built-in type chart.
+
+    Returns:
+        The attacking types whose relations differ, empty when the charts agree.
+    """
+    different_types = []
+    for attacking_type, damage_to in snapshot.get("types", {}).items():
+        for defending_type in TYPE_NAMES:
+            multiplier = damage_to.get(defending_type, 1)
+            if multiplier != effectiveness(TYPE_INDEX[attacking_type], TYPE_INDEX[defending_type]):
+                different_types.append(attacking_type)
+                break
+    return different_types
+
+
+def render_snapshot(snapshot: dict[str, Any]) -> str:
+    """Render a snapshot as JSON with one species and one type per line, like the committed snapshot."""
+    species_lines = ",\n".join(f"    {json.dumps(species, ensure_ascii=False)}" for species in snapshot["species"])
+    sections = [f'  "source": {json.dumps(snapshot["source"])}', f'  "species": [\n{species_lines}\n  ]']
+    if snapshot.get("types"):
+        type_lines = ",\n".join(
+            f"    {json.dumps(type_name)}: {json.dumps(damage_to)}" for type_name, damage_to in snapshot["types"].items()
+        )
+        sections.append(f'  "types": {{\n{type_lines}\n  }}')
+    return "{\n" + ",\n".join(sections) + "\n}\n"
+
+
+def _ends_with_newline(path: Path) -> bool:
+    with open(path, "rb") as file:
+        file.seek(-1, os.SEEK_END)
+        return file.read(1) == b"\n"
+
+
+def _write_atomically(path: Path, content: str) -> None:
+    # Readers never see a partial file
+    temporary_path = path.with_suffix(f".{os.getpid()}.tmp")
+    temporary_path.write_text(content, encoding="utf-8")
+    os.replace(temporary_path, path)
+
+
+class SnapshotBuilder:
+    """Downloads the species snapshot from a PokeAPI-compatible server, see the module docstring."""
+
+    def __init__(
+        self,
+        base_url: str = POKEAPI_BASE_URL,
+        snapshot_path: str | os.PathLike = DEFAULT_SNAPSHOT_PATH,
+        max_concurrency: int = DEFAULT_DOWNLOAD_CONCURRENCY,
+        timeout_seconds: float = DEFAULT_TIMEOUT_SECONDS,
+        retry_policy: RetryPolicy = RetryPolicy(),
+        limits: httpx.Limits = DEFAULT_CONNECTION_LIMITS
+    ):
+        self.base_url = base_url
+        self.snapshot_path = Path(snapshot_path)
+        self.journal_path = journal_path_for(snapshot_path)
+        self.max_concurrency = max_concurrency
+        self.timeout_seconds = timeout_seconds
+        self.retry_policy = retry_policy
+        self.limits = limits
+
+    def build(self, full: bool = False) -> SnapshotBuildStats:
+        """Build the snapshot, see abuild."""
+        return asyncio.run(self.abuild(full))
+
+    async def abuild(self, full: bool = False) -> SnapshotBuildStats:
+        """Download every pokemon and type and write the snapshot.
+
+        Args:
+            full: Ignore the journal and download every resource again.
+
+        Returns:
+            The SnapshotBuildStats of the build.
+
+        Raises:
+            PokemonDataError: If a resource cannot be downloaded. The resources
+                downloaded so far stay in the journal and the next build resumes.
+        """
+        started = time.perf_counter()
+        entries, unfinished_run = ({}, None) if full else load_journal(self.journal_path)
+        run_id = unfinished_run or uuid.uuid4().hex
+        if unfinished_run is not None:
+            logger.info("Resuming unfinished snapshot build %s", run_id)
+
+        self.snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+        async with httpx.AsyncClient(base_url=self.base_url, timeout=self.timeout_seconds, limits=self.limits) as client:
+            with open(self.journal_path, "w" if full else "a", encoding="utf-8") as journal:
+                if journal.tell() and not _ends_with_newline(self.journal_path):
+                    journal.write("\n")
+                if unfinished_run is None:
+                    self._journal(journal, {"run": run_id, "event": "started"})
+
+                paths = [*await self._list(client, "pokemon"), *await self._list(client, "type")]
+                semaphore = asyncio.Semaphore(self.max_concurrency)
+                # Let every other download reach the journal before giving up on a failed one
+                results = await asyncio.gather(*[
+                    self._resource(client, semaphore, path, entries.get(path), run_id, journal) for path in paths
+                ], return_exceptions=True)
+                errors = [result for result in results if isinstance(result, BaseException)]
+                if errors:
+                    logger.error("%d of %d resources failed, the next build resumes", len(errors), len(paths))
+                    raise errors[0]
+
+        resources = {path: entry for path, (entry, _) in zip(paths, results)}
+        snapshot = assemble_snapshot(
+            (entry["resource"] for entry in resources.values()), _load_aliases(self.snapshot_path)
+        )
+        different_types = check_type_chart(snapshot)
+        if different_types:
+            logger.warning("Type relations differ from the built-in chart for %s", ", ".join(different_types))
+        _write_atomically(self.snapshot_path, render_snapshot(snapshot))
+
+        # Compact the journal to the current resources, closing the run
+        _write_atomically(self.journal_path, "".join(
+            json.dumps(entry) + "\n"
+            for entry in [{"run": run_id, "event": "started"}, *resources.values(), {"run": run_id, "event": "finished"}]
+        ))
+
+        outcomes = [outcome for _, outcome in results]
+        stats = SnapshotBuildStats(
+            fetched=outcomes.count(_FETCHED),
+            not_modified=outcomes.count(_NOT_MODIFIED),
+            resumed=outcomes.count(_RESUMED),
+            species=len(snapshot["species"]),
+            forms=sum(len(species.get("forms", [])) for species in snapshot["species"]),
+            types=len(snapshot["types"]),
+            duration_seconds=time.perf_counter() - started,
+        )
+        logger.info("Wrote snapshot to %s: %s", self.snapshot_path, stats)
+        return stats
+
+    @staticmethod
+    def _journal(journal: IO[str], entry: dict[str, Any]) -> None:
+        journal.write(json.dumps(entry) + "\n")
+        journal.flush()
+
+    async def _get(self, client: httpx.AsyncClient, path: str, headers: dict[str, str] | None = None) -> httpx.Response:
+        for attempt in range(self.retry_policy.attempts):
+            try:
+                response = await client.get(path, headers=headers)
+                if response.status_code in RETRYABLE_STATUS_CODES:
+                    response.raise_for_status()
+                return response
+            except httpx.HTTPError as e:
+                retryable = not isinstance(e, httpx.HTTPStatusError) or e.response.status_code in RETRYABLE_STATUS_CODES
+                if not retryable or attempt + 1 >= self.retry_policy.attempts:
+                    raise PokemonDataError(f"Failed to fetch {path} from {self.base_url}: {e!r}") from e
+                logger.warning("Attempt %d to fetch %s failed, retrying: %r", attempt + 1, path, e)
+                await asyncio.sleep(self.retry_policy.delay(attempt))
+
+    async def _list(self, client: httpx.AsyncClient, resource_type: str) -> list[str]:
+        response = await self._get(client, f"/{resource_type}?limit={LIST_PAGE_SIZE}")
+        try:
+            response.raise_for_status()
+            return [f"/{resource_type}/{result['name']}" for result in response.json()["results"]]
+        except (httpx.HTTPError, ValueError, KeyError) as e:
+            raise PokemonDataError(f"Failed to list {resource_type} resources from {self.base_url}: {e!r}") from e
+
+    async def _resource(
+        self,
+        client: httpx.AsyncClient,
+        semaphore: asyncio.Semaphore,
+        path: str,
+        entry: dict[str, Any] | None,
+        run_id: str,
+        journal: IO[str]
+    ) -> tuple[dict[str, Any], str]:
+        """Get the journal entry of a resource, downloading it unless the run already has it or it is unchanged."""
+        if entry is not None and entry["run"] == run_id:
+            return entry, _RESUMED
+
+        headers = {}
+        if entry is not None and entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry is not None and entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+
+        async with semaphore:
+            response = await self._get(client, path, headers)
+
+        if response.status_code == httpx.codes.NOT_MODIFIED and entry is not None:
+            entry, outcome = {**entry, "run": run_id}, _NOT_MODIFIED
+        else:
+            try:
+                response.raise_for_status()
+                resource = _compact_resource(path, response.json())
+            except (httpx.HTTPError, ValueError, KeyError) as e:
+                raise PokemonDataError(f"Failed to fetch {path} from {self.base_url}: {e!r}") from e
+            entry, outcome = {
+                "run": run_id,
+                "path": path,
+                "etag": response.headers.get("etag"),
+                "last_modified": response.headers.get("last-modified"),
+                "resource": resource,
+            }, _FETCHED
+
+        self._journal(journal, entry)
+        return entry, outcome
@@ -0,0 +1,206 @@
+"""
+Compact, memory-mapped index of Pokemon species.
+
+The index is a read-only binary file built from the JSON snapshot in src/data:
+
+    header  | magic, format version, entry count, digest of the source snapshot
+    entries | fixed-size records sorted by name (name offset/length, pokemon ID,
+            | position of the canonical entry, packed type IDs, entry kind)
+    names   | UTF-8 names referenced by the entries
+
+Species, alternate forms and aliases all get an entry so a single binary search
+resolves any of them. The file is mapped with mmap so every worker process shares
+the same read-only pages instead of holding its own copy.
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+from functools import lru_cache
+from pathlib import Path
+from typing import Iterator
+
+from src.pokemon_record import PokemonRecord
+from src.pokemon_type_matrix import TYPE_INDEX, TYPE_NAMES
+from src.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+DATA_DIR = Path(__file__).parent / "data"
+DEFAULT_SNAPSHOT_PATH = DATA_DIR / "pokemon_species.json"
+DEFAULT_INDEX_PATH = DATA_DIR / "pokemon_species.idx"
+
+INDEX_MAGIC = b"PKSI"
+INDEX_FORMAT_VERSION = 1
+_HEADER = struct.Struct("<4sHHI16s")
+_ENTRY = struct.Struct("<IHHHBBB")
+_NO_TYPE = 0xFF
+
+KIND_SPECIES = 0
+KIND_FORM = 1
+KIND_ALIAS = 2
+
+
+def normalize_pokemon_name(pokemon_name: str) -> str:
+    """Normalize a name the same way index entries are stored."""
+    return " ".join(pokemon_name.lower().split())
+
+
+class PokemonSpeciesIndex:
+    """Read-only view over a memory-mapped species index file."""
+
+    def __init__(self, index_path: str | os.PathLike):
+        self.path = Path(index_path)
+        with open(self.path, "rb") as index_file:
+            self._buffer = mmap.mmap(index_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, format_version, _, entry_count, digest = _HEADER.unpack_from(self._buffer, 0)
+        if magic != INDEX_MAGIC or format_version != INDEX_FORMAT_VERSION:
+            self._buffer.close()
+            raise ValueError(f"{self.path} is not a species index (format version {INDEX_FORMAT_VERSION})")
+
+        self._entry_count = entry_count
+        self._names_offset = _HEADER.size + entry_count * _ENTRY.size
+        self.version = digest.hex()
+
+    def __len__(self) -> int:
+        return self._entry_count
+
+    def close(self) -> None:
+        self._buffer.close()
+
+    def _entry(self, position: int) -> tuple[int, ...]:
+        return _ENTRY.unpack_from(self._buffer, _HEADER.size + position * _ENTRY.size)
+
+    def _name(self, entry: tuple[int, ...]) -> bytes:
+        start = self._names_offset + entry[0]
+        return self._buffer[start:start + entry[1]]
+
+    def _record(self, position: int) -> PokemonRecord:
+        entry = self._entry(position)
+        if entry[3] != position:
+            entry = self._entry(entry[3])
+        _, _, pokemon_id, _, first_type, second_type, _ = entry
+        types = tuple(TYPE_NAMES[type_id] for type_id in (first_type, second_type) if type_id != _NO_TYPE)
+        return PokemonRecord(id=pokemon_id, name=self._name(entry).decode(), types=types)
+
+    def _find(self, name: bytes) -> int | None:
+        low, high = 0, self._entry_count
+        while low < high:
+            middle = (low + high) // 2
+            if self._name(self._entry(middle)) < name:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self._entry_count and self._name(self._entry(low)) == name:
+            return low
+        return None
+
+    def lookup(self, pokemon_name: str) -> PokemonRecord | None:
+        """Resolve a species, form or alias name to its canonical record.
+
+        Args:
+            pokemon_name: The name of the pokemon.
+
+        Returns:
+            The canonical PokemonRecord, or None if the name is not indexed.
+        """
+        position = self._find(normalize_pokemon_name(pokemon_name).encode())
+        if position is None:
+            return None
+        return self._record(position)
+
+    def names(self) -> Iterator[str]:
+        """Iterate over every indexed name, aliases included, in sorted order."""
+        for position in range(self._entry_count):
+            yield self._name(self._entry(position)).decode()
+
+    def records(self) -> Iterator[PokemonRecord]:
+        """Iterate over the canonical species and form records in name order."""
+        for position in range(self._entry_count):
+            if self._entry(position)[6] != KIND_ALIAS:
+                yield self._record(position)
+
+
+def _snapshot_entries(snapshot: dict) -> list[tuple[str, int, str, tuple[str, ...], int]]:
+    """Flatten a snapshot into (name, pokemon_id, canonical_name, types, kind) rows."""
+    entries = []
+    for species in snapshot["species"]:
+        entries.append((species["name"], species["id"], species["name"], tuple(species["types"]), KIND_SPECIES))
+        for form in species.get("forms", []):
+            entries.append((form["name"], form["id"], form["name"], tuple(form["types"]), KIND_FORM))
+        for alias in species.get("aliases", []):
+            entries.append((alias, species["id"], species["name"], (), KIND_ALIAS))
+    return entries
+
+
+def build_species_index(
+    snapshot_path: str | os.PathLike = DEFAULT_SNAPSHOT_PATH,
+    index_path: str | os.PathLike = DEFAULT_INDEX_PATH
+) -> Path:
+    """Build the binary species index from a JSON snapshot.
+
+    Args:
+        snapshot_path: Path to the JSON species snapshot.
+        index_path: Path where the binary index is written.
+
+    Returns:
+        The path of the written index.
+    """
+    snapshot_bytes = Path(snapshot_path).read_bytes()
+    entries = _snapshot_entries(json.loads(snapshot_bytes))
+
+    encoded_entries = sorted(
+        (normalize_pokemon_name(name).encode(), pokemon_id, normalize_pokemon_name(canonical_name).encode(), types, kind)
+        for name, pokemon_id, canonical_name, types, kind in entries
+    )
+    positions = {name: position for position, (name, *_) in enumerate(encoded_entries)}
+    if len(positions) != len(encoded_entries):
+        raise ValueError(f"Duplicate pokemon names in {snapshot_path}")
+
+    entry_table = bytearray()
+    names_blob = bytearray()
+    for name, pokemon_id, canonical_name, types, kind in encoded_entries:
+        type_ids = [TYPE_INDEX[pokemon_type] for pokemon_type in types] + [_NO_TYPE, _NO_TYPE]
+        entry_table += _ENTRY.pack(
+            len(names_blob), len(name), pokemon_id, positions[canonical_name], type_ids[0], type_ids[1], kind
+        )
+        names_blob += name
+
+    digest = hashlib.sha256(snapshot_bytes).digest()[:16]
+    header = _HEADER.pack(INDEX_MAGIC, INDEX_FORMAT_VERSION, 0, len(encoded_entries), digest)
+
+    # Write to a temporary file first so concurrent readers never map a partial index
+    index_path = Path(index_path)
+    temporary_path = index_path.with_suffix(f".{os.getpid()}.tmp")
+    temporary_path.write_bytes(header + entry_table + names_blob)
+    os.replace(temporary_path, index_path)
+    logger.info("Built species index with %d entries at %s", len(encoded_entries), index_path)
+    return index_path
+
+
+@lru_cache(maxsize=1)
+def get_species_index() -> PokemonSpeciesIndex | None:
+    """Map the species index once per process.
+
+    The index path can be overridden with the POKEMON_SPECIES_INDEX environment variable.
+
+    Returns:
+        The shared PokemonSpeciesIndex, or None if no index is available.
+    """
+    index_path = Path(os.environ.get("POKEMON_SPECIES_INDEX", DEFAULT_INDEX_PATH))
+    try:
+        species_index = PokemonSpeciesIndex(index_path)
+    except (OSError, ValueError) as e:
+        logger.warning("Species index unavailable, falling back to the PokeAPI: %s", e)
+        return None
+
+    logger.info("Loaded species index with %d entries from %s", len(species_index), index_path)
+    return species_index
+
+
+if __name__ == "__main__":
+    build_species_index(*sys.argv[1:3])
@@ -1,15 +1,60 @@
 from typing import Annotated, TypedDict
+
+from attrs import converters, field, frozen
 from langchain_core.messages import AnyMessage
 from langgraph.graph.message import add_messages
 
+from src.pokemon_matchup_index import MatchupQuery
+from src.pokemon_record import PokemonRecord, StateRecord
+from src.pokemon_team_analysis import TeamAnalysis
 from src.pokemon_type_chart import PokemonTypeChart
 
+# Pokemon remembered per session, the least recently used ones are forgotten first
+MAX_SESSION_LOOKUPS = 32
+
+
+@frozen
+class SessionLookup(StateRecord):
+    """A pokemon resolved earlier in the session, with its types and chart once looked up."""
+    pokemon: PokemonRecord
+    pokemon_types: tuple[str, ...] | None = field(default=None, converter=converters.optional(tuple))
+    pokemon_type_chart: PokemonTypeChart | None = None
+
+
+def merge_session_lookups(
+    existing: dict[str, SessionLookup] | None,
+    update: dict[str, SessionLookup] | None
+) -> dict[str, SessionLookup]:
+    """Merge lookups keyed by pokemon name, keeping the most recently used one last."""
+    merged = dict(existing or {})
+    for pokemon_name, lookup in (update or {}).items():
+        merged.pop(pokemon_name, None)
+        merged[pokemon_name] = lookup
+    while len(merged) > MAX_SESSION_LOOKUPS:
+        merged.pop(next(iter(merged)))
+    return merged
+
 
 class PokemonState(TypedDict):
     """State for the Pokemon Agent"""
     messages: Annotated[list[AnyMessage], add_messages]
     is_input_valid: bool | None
     pokemon_name: str | None
+    pokemon: PokemonRecord | None
+    # Every pokemon the input asks about in the order they are mentioned, pokemon is the first one
+    all_pokemon: tuple[PokemonRecord, ...] | None
     pokemon_types: tuple[str, ...] | None
     pokemon_type_chart: PokemonTypeChart | None
+    # Set when the input asks about its pokemon as one team, answered with team_analysis instead of one chart each
+    is_team_question: bool | None
+    team_analysis: TeamAnalysis | None
+    # Set for reverse questions naming types instead of a pokemon, answered with the matching matchup_pokemon
+    matchup_query: MatchupQuery | None
+    matchup_pokemon: list[str] | None
+    # Why the LLM extraction retried, only format_output reads them and they stay out of the messages
+    extraction_notes: list[str] | None
+    is_answer_cached: bool | None
     output_message: str | None
+    trace_id: str | None
+    # Looked up pokemon, one per branch of a multi-pokemon question, kept across the turns of a session by the checkpointer
+    session_lookups: Annotated[dict[str, SessionLookup], merge_session_lookups]
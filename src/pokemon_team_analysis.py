@@ -0,0 +1,195 @@
+"""
+Defensive analysis of a whole team of up to six Pokemon.
+
+Every member's defensive multipliers are rows of DEFENSIVE_ARRAY, the 171 single and
+dual type combinations of DEFENSIVE_TABLE as a NumPy array, so a team is analysed
+with a handful of array operations over an (members x attacking types) matrix:
+
+- weaknesses / resistances: per attacking type, how many members take more / less than 1x
+- shared weaknesses: attacking types at least two members are weak to and more members are weak to than resist
+- uncovered types: attacking types no member resists
+
+Candidate additions are ranked in one batched computation over a (candidates x
+attacking types) matrix, by how much they lower the team's exposure.
+"""
+
+from collections.abc import Sequence
+from functools import lru_cache
+
+import numpy as np
+from attrs import field, frozen
+
+from src.pokemon_name_resolver import tokenize
+from src.pokemon_record import PokemonRecord, StateRecord
+from src.pokemon_species_index import get_species_index
+from src.pokemon_type_matrix import DEFENSIVE_TABLE, TYPE_NAMES, type_indexes
+
+MAX_TEAM_SIZE = 6
+SHARED_WEAKNESS_MIN_MEMBERS = 2
+DEFAULT_SUGGESTION_COUNT = 5
+# Words asking about several pokemon as one team, e.g. "team: pikachu, charizard, blastoise"
+TEAM_WORDS = frozenset({"lineup", "party", "roster", "team", "teams"})
+
+# Row i holds the multiplier of every attacking type against the i-th type combination
+_COMBINATIONS = tuple(DEFENSIVE_TABLE)
+_COMBINATION_ROWS = {type_combination: row for row, type_combination in enumerate(_COMBINATIONS)}
+DEFENSIVE_ARRAY = np.array([DEFENSIVE_TABLE[type_combination] for type_combination in _COMBINATIONS], dtype=np.float32)
+
+
+@frozen
+class CandidateRanking(StateRecord):
+    """A candidate addition and how much it lowers the team's exposure."""
+    name: str
+    types: tuple[str, ...] = field(converter=tuple)
+    score: int
+
+
+@frozen
+class TeamAnalysis(StateRecord):
+    """Defensive coverage of a team, counts are keyed by attacking type."""
+    members: tuple[str, ...] = field(converter=tuple)
+    weaknesses: dict[str, int]
+    resistances: dict[str, int]
+    shared_weaknesses: tuple[str, ...] = field(converter=tuple)
+    uncovered_types: tuple[str, ...] = field(converter=tuple)
+    suggestions: tuple[CandidateRanking, ...] = field(default=(), converter=tuple)
+
+    def __str__(self) -> str:
+        lines = [f"Team: {', '.join(self.members)}"]
+        if self.shared_weaknesses:
+            lines.append(f"Shared weaknesses: {', '.join(self.shared_weaknesses)}")
+        if self.uncovered_types:
+            lines.append(f"Not resisted by any member: {', '.join(self.uncovered_types)}")
+        if self.suggestions:
+            lines.append("Suggested additions: " + ", ".join(
+                f"{suggestion.name} ({'/'.join(suggestion.types)})" for suggestion in self.suggestions
+            ))
+        return "\n".join(lines)
+
+
+def is_team_question(user_message: str) -> bool:
+    """Check if the message asks about its pokemon as a team rather than one by one."""
+    return not set(tokenize(user_message)).isdisjoint(TEAM_WORDS)
+
+
+def _combination_row(pokemon_types: Sequence[str]) -> int | None:
+    indexes = type_indexes(list(pokemon_types))
+    return _COMBINATION_ROWS[indexes] if indexes is not None else None
+
+
+def team_multipliers(team: Sequence[PokemonRecord]) -> np.ndarray:
+    """Get the (members x attacking types) multiplier matrix of a team.
+
+    Raises:
+        ValueError: If the team has more than MAX_TEAM_SIZE members or a member has an invalid type combination.
+    """
+    if len(team) > MAX_TEAM_SIZE:
+        raise ValueError(f"Teams have at most {MAX_TEAM_SIZE} pokemon, got {len(team)}")
+
+    rows = [_combination_row(member.types) for member in team]
+    if None in rows:
+        invalid_members = [member.name for member, row in zip(team, rows) if row is None]
+        raise ValueError(f"Invalid type combination for {', '.join(invalid_members)}")
+    return DEFENSIVE_ARRAY[rows]
+
+
+def _exposure(weak_counts: np.ndarray, resist_counts: np.ndarray) -> np.ndarray:
+    """Exposure per team along the last axis: weaknesses left unanswered plus attacking types nobody resists."""
+    return np.maximum(weak_counts - resist_counts, 0).sum(axis=-1) + (resist_counts == 0).sum(axis=-1)
+
+
+@lru_cache(maxsize=1)
+def _species_candidates() -> tuple[tuple[PokemonRecord, ...], np.ndarray]:
+    species_index = get_species_index()
+    records = tuple(species_index.records()) if species_index is not None else ()
+    return _candidate_arrays(records)
+
+
+def _candidate_arrays(candidates: Sequence[PokemonRecord]) -> tuple[tuple[PokemonRecord, ...], np.ndarray]:
+    valid_candidates, rows = [], []
+    for candidate in candidates:
+        row = _combination_row(candidate.types)
+        if row is not None:
+            valid_candidates.append(candidate)
+            rows.append(row)
+    return tuple(valid_candidates), np.array(rows, dtype=np.intp)
+
+
+def rank_candidates(
+    team: Sequence[PokemonRecord],
+    candidates: Sequence[PokemonRecord] | None = None,
+    limit: int = DEFAULT_SUGGESTION_COUNT
+) -> list[CandidateRanking]:
+    """Rank candidate additions by how much they lower the team's exposure.
+
+    Args:
+        team: The current team, with room for one more member.
+        candidates: The pokemon to choose from, defaults to every species in the species index.
+        limit: Number of candidates returned.
+
+    Returns:
+        The best candidates, highest score first. Ties go to candidates with fewer
+        weaknesses of their own, then to the name.
+    """
+    if len(team) >= MAX_TEAM_SIZE:
+        return []
+
+    records, rows = _species_candidates() if candidates is None else _candidate_arrays(candidates)
+    team_matrix = team_multipliers(team)
+    weak_counts = (team_matrix > 1).sum(axis=0)
+    resist_counts = (team_matrix < 1).sum(axis=0)
+
+    candidate_matrix = DEFENSIVE_ARRAY[rows]
+    candidate_weaknesses = candidate_matrix > 1
+    scores = _exposure(weak_counts, resist_counts) - _exposure(
+        weak_counts + candidate_weaknesses, resist_counts + (candidate_matrix < 1)
+    )
+
+    team_names = {member.name for member in team}
+    order = np.lexsort((np.array([record.name for record in records]), candidate_weaknesses.sum(axis=1), -scores))
+    rankings = []
+    for position in order:
+        record = records[position]
+        if record.name in team_names:
+            continue
+        rankings.append(CandidateRanking(name=record.name, types=tuple(record.types), score=int(scores[position])))
+        if len(rankings) == limit:
+            break
+    return rankings
+
+
+def analyze_team(
+    team: Sequence[PokemonRecord],
+    candidates: Sequence[PokemonRecord] | None = None,
+    suggestion_count: int = DEFAULT_SUGGESTION_COUNT
+) -> TeamAnalysis:
+    """Analyse the defensive coverage of a team and suggest additions while it has free slots.
+
+    Args:
+        team: Up to six pokemon.
+        candidates: The pokemon to suggest from, defaults to every species in the species index.
+        suggestion_count: Number of suggested additions, 0 to skip the ranking.
+
+    Returns:
+        The team's TeamAnalysis.
+
+    Raises:
+        ValueError: If the team is too large or a member has an invalid type combination.
+    """
+    team_matrix = team_multipliers(team)
+    weak_counts = (team_matrix > 1).sum(axis=0)
+    resist_counts = (team_matrix < 1).sum(axis=0)
+
+    shared = (weak_counts >= SHARED_WEAKNESS_MIN_MEMBERS) & (weak_counts > resist_counts)
+    # Most shared first, ties in TYPE_NAMES order
+    shared_order = np.argsort(-weak_counts, kind="stable")
+    suggestions = rank_candidates(team, candidates, suggestion_count) if suggestion_count and team else []
+
+    return TeamAnalysis(
+        members=tuple(member.name for member in team),
+        weaknesses={TYPE_NAMES[index]: int(count) for index, count in enumerate(weak_counts) if count},
+        resistances={TYPE_NAMES[index]: int(count) for index, count in enumerate(resist_counts) if count},
+        shared_weaknesses=tuple(TYPE_NAMES[index] for index in shared_order if shared[index]),
+        uncovered_types=tuple(TYPE_NAMES[index] for index in np.flatnonzero(resist_counts == 0)) if team else (),
+        suggestions=tuple(suggestions),
+    )
@@ -1,8 +1,27 @@
-from attrs import define, field
+from collections.abc import Iterable, Sequence
+
+from attrs import define, field, frozen
+
+from src.pokemon_record import StateRecord
+from src.pokemon_type_matrix import DEFENSIVE_TABLE, TYPE_INDEX, TYPE_NAMES
+
+# Bucket fields in the order they are printed, shared by both chart classes
+TYPE_CHART_BUCKETS = ("super_effective", "effective", "resistant", "super_resistant", "immune")
+_BUCKET_LABELS = ("Super Effective", "Effective", "Resistant", "Super Resistant", "Immune")
+# Damage multiplier of the attacking types in each bucket, neutral (1x) types are in none
+_BUCKET_MULTIPLIERS = {4: "super_effective", 2: "effective", 0.5: "resistant", 0.25: "super_resistant", 0: "immune"}
+
+
+def _format_buckets(buckets: Iterable[Iterable[str]]) -> str:
+    return "\n".join(
+        f"{label}: {', '.join(sorted(type_names))}"
+        for label, type_names in zip(_BUCKET_LABELS, buckets)
+        if type_names
+    )
 
 
 @define
-class PokemonTypeChart:
+class PokemonTypeChart(StateRecord):
     """Represents the type effectiveness chart for Pokemon types."""
     super_effective: set[str] = field(factory=set, converter=set)
     effective: set[str] = field(factory=set, converter=set)
@@ -12,21 +31,80 @@ class PokemonTypeChart:
 
     def __str__(self) -> str:
         """Return a string representation of non-empty type effectiveness attributes."""
-        output_parts = []
-        
-        if self.super_effective:
-            output_parts.append(f"Super Effective: {', '.join(sorted(self.super_effective))}")
-            
-        if self.effective:
-            output_parts.append(f"Effective: {', '.join(sorted(self.effective))}")
-            
-        if self.resistant:
-            output_parts.append(f"Resistant: {', '.join(sorted(self.resistant))}")
-            
-        if self.super_resistant:
-            output_parts.append(f"Super Resistant: {', '.join(sorted(self.super_resistant))}")
-            
-        if self.immune:
-            output_parts.append(f"Immune: {', '.join(sorted(self.immune))}")
-            
-        return "\n".join(output_parts)
+        return _format_buckets(getattr(self, bucket) for bucket in TYPE_CHART_BUCKETS)
+
+
+def types_to_mask(type_names: Iterable[str]) -> int:
+    """Convert type names to a bit mask, bit i is set for TYPE_NAMES[i].
+
+    Raises:
+        KeyError: If a type is unknown.
+    """
+    mask = 0
+    for type_name in type_names:
+        mask |= 1 << TYPE_INDEX[type_name]
+    return mask
+
+
+def mask_to_types(mask: int) -> tuple[str, ...]:
+    """Convert a bit mask back to type names, in TYPE_NAMES order."""
+    return tuple(type_name for index, type_name in enumerate(TYPE_NAMES) if mask >> index & 1)
+
+
+@frozen(cache_hash=True)
+class CompactTypeChart:
+    """Type chart storing each bucket as an 18-bit mask over TYPE_NAMES.
+
+    Instances are slotted, immutable and hashable, so they can be shared between
+    every species with the same types. Set operations apply bucket by bucket. Use
+    from_chart and to_chart to convert from and to PokemonTypeChart.
+    """
+    super_effective: int = 0
+    effective: int = 0
+    resistant: int = 0
+    super_resistant: int = 0
+    immune: int = 0
+
+    @classmethod
+    def from_chart(cls, chart: PokemonTypeChart) -> "CompactTypeChart":
+        return cls(*(types_to_mask(getattr(chart, bucket)) for bucket in TYPE_CHART_BUCKETS))
+
+    @classmethod
+    def from_multipliers(cls, multipliers: Sequence[float]) -> "CompactTypeChart":
+        """Build the chart from one damage multiplier per attacking type, in TYPE_NAMES order."""
+        masks = dict.fromkeys(TYPE_CHART_BUCKETS, 0)
+        for index, multiplier in enumerate(multipliers):
+            bucket = _BUCKET_MULTIPLIERS.get(multiplier)
+            if bucket is not None:
+                masks[bucket] |= 1 << index
+        return cls(**masks)
+
+    def to_chart(self) -> PokemonTypeChart:
+        return PokemonTypeChart(*(mask_to_types(mask) for mask in self._masks()))
+
+    def _masks(self) -> tuple[int, ...]:
+        return self.super_effective, self.effective, self.resistant, self.super_resistant, self.immune
+
+    def union(self, other: "CompactTypeChart") -> "CompactTypeChart":
+        return CompactTypeChart(*(mask | other_mask for mask, other_mask in zip(self._masks(), other._masks())))
+
+    def intersection(self, other: "CompactTypeChart") -> "CompactTypeChart":
+        return CompactTypeChart(*(mask & other_mask for mask, other_mask in zip(self._masks(), other._masks())))
+
+    def difference(self, other: "CompactTypeChart") -> "CompactTypeChart":
+        return CompactTypeChart(*(mask & ~other_mask for mask, other_mask in zip(self._masks(), other._masks())))
+
+    __or__ = union
+    __and__ = intersection
+    __sub__ = difference
+
+    def __str__(self) -> str:
+        """Return the same text as PokemonTypeChart."""
+        return _format_buckets(mask_to_types(mask) for mask in self._masks())
+
+
+# Chart of every single and dual type combination, keyed like DEFENSIVE_TABLE
+COMPACT_TYPE_CHARTS: dict[tuple[int, ...], CompactTypeChart] = {
+    type_combination: CompactTypeChart.from_multipliers(multipliers)
+    for type_combination, multipliers in DEFENSIVE_TABLE.items()
+}
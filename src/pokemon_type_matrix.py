@@ -0,0 +1,118 @@
+from array import array
+from itertools import combinations
+
+# Bump whenever the effectiveness data below changes so anything derived from it
+# (precomputed tables, caches, snapshots) can be invalidated.
+TYPE_CHART_VERSION = "gen6-v1"
+
+# Ordered by PokeAPI type ID (normal=1 ... fairy=18), the matrix index is ID - 1.
+TYPE_NAMES: tuple[str, ...] = (
+    "normal", "fighting", "flying", "poison", "ground", "rock",
+    "bug", "ghost", "steel", "fire", "water", "grass",
+    "electric", "psychic", "ice", "dragon", "dark", "fairy",
+)
+TYPE_COUNT = len(TYPE_NAMES)
+TYPE_INDEX: dict[str, int] = {type_name: index for index, type_name in enumerate(TYPE_NAMES)}
+
+# Attacking type -> {defending type: multiplier}, only non-neutral matchups are listed
+_ATTACK_RELATIONS: dict[str, dict[str, float]] = {
+    "normal": {"rock": 0.5, "steel": 0.5, "ghost": 0},
+    "fighting": {"normal": 2, "rock": 2, "steel": 2, "ice": 2, "dark": 2,
+                 "flying": 0.5, "poison": 0.5, "bug": 0.5, "psychic": 0.5, "fairy": 0.5, "ghost": 0},
+    "flying": {"fighting": 2, "bug": 2, "grass": 2, "rock": 0.5, "steel": 0.5, "electric": 0.5},
+    "poison": {"grass": 2, "fairy": 2, "poison": 0.5, "ground": 0.5, "rock": 0.5, "ghost": 0.5, "steel": 0},
+    "ground": {"poison": 2, "rock": 2, "steel": 2, "fire": 2, "electric": 2,
+               "bug": 0.5, "grass": 0.5, "flying": 0},
+    "rock": {"flying": 2, "bug": 2, "fire": 2, "ice": 2, "fighting": 0.5, "ground": 0.5, "steel": 0.5},
+    "bug": {"grass": 2, "psychic": 2, "dark": 2, "fighting": 0.5, "flying": 0.5, "poison": 0.5,
+            "ghost": 0.5, "steel": 0.5, "fire": 0.5, "fairy": 0.5},
+    "ghost": {"ghost": 2, "psychic": 2, "dark": 0.5, "normal": 0},
+    "steel": {"rock": 2, "ice": 2, "fairy": 2, "steel": 0.5, "fire": 0.5, "water": 0.5, "electric": 0.5},
+    "fire": {"bug": 2, "steel": 2, "grass": 2, "ice": 2, "rock": 0.5, "fire": 0.5, "water": 0.5, "dragon": 0.5},
+    "water": {"ground": 2, "rock": 2, "fire": 2, "water": 0.5, "grass": 0.5, "dragon": 0.5},
+    "grass": {"ground": 2, "rock": 2, "water": 2, "flying": 0.5, "poison": 0.5, "bug": 0.5,
+              "steel": 0.5, "fire": 0.5, "grass": 0.5, "dragon": 0.5},
+    "electric": {"flying": 2, "water": 2, "grass": 0.5, "electric": 0.5, "dragon": 0.5, "ground": 0},
+    "psychic": {"fighting": 2, "poison": 2, "steel": 0.5, "psychic": 0.5, "dark": 0},
+    "ice": {"flying": 2, "ground": 2, "grass": 2, "dragon": 2, "steel": 0.5, "fire": 0.5, "water": 0.5, "ice": 0.5},
+    "dragon": {"dragon": 2, "steel": 0.5, "fairy": 0},
+    "dark": {"ghost": 2, "psychic": 2, "fighting": 0.5, "dark": 0.5, "fairy": 0.5},
+    "fairy": {"fighting": 2, "dragon": 2, "dark": 2, "poison": 0.5, "steel": 0.5, "fire": 0.5},
+}
+
+
+def _build_effectiveness_matrix() -> array:
+    matrix = array("d", [1.0] * (TYPE_COUNT * TYPE_COUNT))
+    for attacking_type, relations in _ATTACK_RELATIONS.items():
+        for defending_type, multiplier in relations.items():
+            matrix[TYPE_INDEX[attacking_type] * TYPE_COUNT + TYPE_INDEX[defending_type]] = multiplier
+    return matrix
+
+
+# Flat row-major 18x18 matrix: EFFECTIVENESS_MATRIX[attacking * TYPE_COUNT + defending]
+EFFECTIVENESS_MATRIX = _build_effectiveness_matrix()
+
+
+def effectiveness(attacking_index: int, defending_index: int) -> float:
+    """Get the damage multiplier of an attacking type against a single defending type.
+
+    Args:
+        attacking_index: Matrix index of the attacking type (type ID - 1).
+        defending_index: Matrix index of the defending type (type ID - 1).
+
+    Returns:
+        The damage multiplier.
+    """
+    return EFFECTIVENESS_MATRIX[attacking_index * TYPE_COUNT + defending_index]
+
+
+def _defensive_multipliers(defending_indexes: tuple[int, ...]) -> tuple[float, ...]:
+    multipliers = []
+    for attacking_index in range(TYPE_COUNT):
+        multiplier = 1.0
+        for defending_index in defending_indexes:
+            multiplier *= effectiveness(attacking_index, defending_index)
+        multipliers.append(multiplier)
+    return tuple(multipliers)
+
+
+# Every single and dual type combination (18 + 153 = 171), keyed by the sorted matrix indexes
+DEFENSIVE_TABLE: dict[tuple[int, ...], tuple[float, ...]] = {
+    type_combination: _defensive_multipliers(type_combination)
+    for size in (1, 2)
+    for type_combination in combinations(range(TYPE_COUNT), size)
+}
+
+
+def type_indexes(type_names: list[str]) -> tuple[int, ...] | None:
+    """Convert type names to the sorted key used by DEFENSIVE_TABLE.
+
+    Args:
+        type_names: A list of pokemon types.
+
+    Returns:
+        The sorted matrix indexes, or None if a type is unknown or there are more than two types.
+    """
+    try:
+        indexes = tuple(sorted({TYPE_INDEX[type_name.lower()] for type_name in type_names}))
+    except (KeyError, AttributeError):
+        return None
+
+    if not 1 <= len(indexes) <= 2:
+        return None
+    return indexes
+
+
+def defensive_multipliers(type_names: list[str]) -> dict[str, float] | None:
+    """Get the damage multiplier of every attacking type against a type combination.
+
+    Args:
+        type_names: A list of one or two pokemon types.
+
+    Returns:
+        A mapping of attacking type to multiplier, or None if the combination is invalid.
+    """
+    indexes = type_indexes(type_names)
+    if indexes is None:
+        return None
+    return dict(zip(TYPE_NAMES, DEFENSIVE_TABLE[indexes]))
@@ -5,13 +5,160 @@ This script demonstrates how to run the Pokemon agent with logging enabled.
 You can customize the logging level and optionally log to a file.
 """
 
-from langchain_core.messages import HumanMessage
-from src.main import compiled_graph
+import asyncio
+import os
+import time
+from typing import TYPE_CHECKING, Any, AsyncIterator, Iterator
+
+from attrs import define
+from langchain_core.messages import AIMessageChunk, HumanMessage
+from src.main import GraphConfig, get_compiled_graph
+from src.pokemon_agent_tools import shared_pokemon_lookups
+from src.pokemon_metrics import TRACE_ID_KEY, new_trace_id
+from src.pokemon_sessions import MEMORY_SESSION_STORE
 from src.pokemon_state import PokemonState
 from src.logging_config import setup_logging, get_logger
 
+if TYPE_CHECKING:
+    from langgraph.graph.state import CompiledStateGraph
+
+DEFAULT_BATCH_CONCURRENCY = 8
+# LangGraph stream modes used by stream_pokemon_agent: node updates and LLM tokens
+STREAM_MODES = ["updates", "messages"]
+# Nodes whose LLM tokens are part of the answer, the other LLM calls are internal
+ANSWER_NODES = frozenset({"format_output"})
+
+NODE_EVENT = "node"
+TOKEN_EVENT = "token"
+DONE_EVENT = "done"
+
+
+@define
+class BatchResult:
+    """The outcome of one input in a batch run."""
+    user_input: str
+    output: str | None = None
+    error: str | None = None
+    duration_seconds: float = 0.0
+
+
+@define
+class StreamEvent:
+    """An event of a streamed agent run.
+
+    Node events report that a graph node finished, token events carry the next
+    piece of the answer and the done event carries the whole answer. Joining every
+    token event gives the same text as the done event.
+    """
+    kind: str
+    node: str | None = None
+    content: str = ""
+    trace_id: str | None = None
+
+
+def new_agent_input(user_input: str, session_id: str | None = None) -> tuple[PokemonState, dict[str, Any]]:
+    """Build the initial state and run config of a graph run, tagged with a new trace ID.
+
+    With a session_id the run continues that session's thread, so the per-turn
+    fields are reset while the history and the session's lookups are kept.
+    """
+    trace_id = new_trace_id()
+    initial_state = PokemonState(
+        messages=[HumanMessage(content=user_input)],
+        is_input_valid=False,
+        pokemon_name=None,
+        pokemon=None,
+        all_pokemon=None,
+        pokemon_types=None,
+        pokemon_type_chart=None,
+        is_answer_cached=None,
+        output_message=None,
+        trace_id=trace_id
+    )
+    config = {"metadata": {TRACE_ID_KEY: trace_id}}
+    if session_id is not None:
+        config["configurable"] = {"thread_id": session_id}
+    return initial_state, config
+
+
+def get_agent_graph(session_id: str | None = None) -> "CompiledStateGraph":
+    """Get the graph for a run, the session graph keeps state in POKEMON_SESSION_STORE (default memory)."""
+    if session_id is None:
+        return get_compiled_graph()
+    return get_compiled_graph(GraphConfig(session_store=os.environ.get("POKEMON_SESSION_STORE", MEMORY_SESSION_STORE)))
+
+
+class _StreamEventBuilder:
+    """Turns LangGraph (mode, chunk) pairs into StreamEvents."""
+
+    def __init__(self, trace_id: str):
+        self.trace_id = trace_id
+        self.streamed_content: list[str] = []
+
+    def events(self, stream_mode: str, chunk: Any) -> Iterator[StreamEvent]:
+        if stream_mode == "messages":
+            message_chunk, metadata = chunk
+            # Whole messages written to the state arrive here too, the answer among them is sent with the node's update
+            if not isinstance(message_chunk, AIMessageChunk):
+                return
+            if metadata.get("langgraph_node") in ANSWER_NODES and isinstance(message_chunk.content, str) and message_chunk.content:
+                self.streamed_content.append(message_chunk.content)
+                yield StreamEvent(kind=TOKEN_EVENT, node=metadata["langgraph_node"], content=message_chunk.content, trace_id=self.trace_id)
+            return
+
+        for node_name, update in chunk.items():
+            yield StreamEvent(kind=NODE_EVENT, node=node_name, trace_id=self.trace_id)
+            output_message = update.get("output_message") if isinstance(update, dict) else None
+            if output_message is None:
+                continue
+
+            # Answers that were not generated token by token, e.g. cached or deterministic ones, arrive whole
+            if not self.streamed_content:
+                yield StreamEvent(kind=TOKEN_EVENT, node=node_name, content=output_message, trace_id=self.trace_id)
+            yield StreamEvent(kind=DONE_EVENT, node=node_name, content=output_message, trace_id=self.trace_id)
+
+
+def stream_pokemon_agent(user_input: str, session_id: str | None = None) -> Iterator[StreamEvent]:
+    """
+    Run the Pokemon agent and yield its progress as it happens.
+    
+    Args:
+        user_input: The user's question about a Pokemon
+        session_id: Continue this multi-turn session, None for a single run
+        
+    Yields:
+        A node event per finished node, the answer's tokens and a final done event
+    """
+    initial_state, config = new_agent_input(user_input, session_id)
+    event_builder = _StreamEventBuilder(initial_state["trace_id"])
+    for stream_mode, chunk in get_agent_graph(session_id).stream(initial_state, config, stream_mode=STREAM_MODES):
+        yield from event_builder.events(stream_mode, chunk)
+
+
+async def astream_pokemon_agent(user_input: str, session_id: str | None = None) -> AsyncIterator[StreamEvent]:
+    """
+    Async version of stream_pokemon_agent.
+    
+    Args:
+        user_input: The user's question about a Pokemon
+        session_id: Continue this multi-turn session, None for a single run
+        
+    Yields:
+        A node event per finished node, the answer's tokens and a final done event
+    """
+    initial_state, config = new_agent_input(user_input, session_id)
+    event_builder = _StreamEventBuilder(initial_state["trace_id"])
+    async for stream_mode, chunk in get_agent_graph(session_id).astream(initial_state, config, stream_mode=STREAM_MODES):
+        for event in event_builder.events(stream_mode, chunk):
+            yield event
+
 
-def run_pokemon_agent(user_input: str, log_level: str = "INFO", log_to_file: bool = False) -> str:
+def run_pokemon_agent(
+    user_input: str,
+    log_level: str = "INFO",
+    log_to_file: bool = False,
+    session_id: str | None = None
+) -> str:
     """
     Run the Pokemon agent with the given user input.
     
@@ -19,6 +166,7 @@ def run_pokemon_agent(user_input: str, log_level: str = "INFO", log_to_file: boo
         user_input: The user's question about a Pokemon
         log_level: Logging level (DEBUG, INFO, WARNING, ERROR, CRITICAL)
         log_to_file: Whether to log to a file in addition to console
+        session_id: Continue this multi-turn session, None for a single run
         
     Returns:
         The agent's response
@@ -28,29 +176,109 @@ def run_pokemon_agent(user_input: str, log_level: str = "INFO", log_to_file: boo
     setup_logging(log_level=log_level, log_file=log_file)
     
     logger = get_logger(__name__)
-    logger.info(f"Starting Pokemon agent with user input: '{user_input}'")
+    logger.info("Starting Pokemon agent with user input: '%s'", user_input)
     
     # Create initial state
-    initial_state = PokemonState(
-        messages=[HumanMessage(content=user_input)],
-        is_input_valid=False,
-        pokemon_name=None
-    )
+    initial_state, config = new_agent_input(user_input, session_id)
     
     try:
         # Run the graph
-        logger.info("Invoking Pokemon agent graph")
-        result = compiled_graph.invoke(initial_state)
+        logger.info("Invoking Pokemon agent graph (trace %s)", initial_state["trace_id"])
+        result = get_agent_graph(session_id).invoke(initial_state, config)
         
-        output = result.get("output", "No output generated")
-        logger.info(f"Pokemon agent completed successfully. Output: {output}")
+        output = result.get("output_message", "No output generated")
+        logger.info("Pokemon agent completed successfully. Output: %s", output)
         return output
         
     except Exception as e:
-        logger.error(f"Error running Pokemon agent: {str(e)}", exc_info=True)
+        logger.error("Error running Pokemon agent: %s", e, exc_info=True)
         return f"An error occurred: {str(e)}"
 
 
+def _normalize_batch_input(user_input: str) -> str:
+    return " ".join(user_input.lower().split())
+
+
+async def arun_pokemon_agent_batch(
+    user_inputs: list[str],
+    max_concurrency: int = DEFAULT_BATCH_CONCURRENCY
+) -> list[BatchResult]:
+    """
+    Run many user inputs through the Pokemon agent graph concurrently.
+    
+    Inputs that only differ in case or whitespace run the graph once, and every
+    pokemon is resolved at most once for the whole batch.
+    
+    Args:
+        user_inputs: The user's questions about Pokemon
+        max_concurrency: Maximum number of graph runs in flight at the same time
+        
+    Returns:
+        One BatchResult per input, in input order
+    """
+    if max_concurrency < 1:
+        raise ValueError("max_concurrency must be at least 1")
+
+    logger = get_logger(__name__)
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    unique_inputs: dict[str, str] = {}
+    for user_input in user_inputs:
+        unique_inputs.setdefault(_normalize_batch_input(user_input), user_input)
+    logger.info("Running batch of %d inputs (%d unique) with concurrency %d", len(user_inputs), len(unique_inputs), max_concurrency)
+
+    async def run_one(user_input: str) -> BatchResult:
+        async with semaphore:
+            start_time = time.perf_counter()
+            initial_state, config = new_agent_input(user_input)
+            try:
+                result = await get_agent_graph().ainvoke(initial_state, config)
+                output = result.get("output_message", "No output generated")
+                return BatchResult(user_input=user_input, output=output, duration_seconds=time.perf_counter() - start_time)
+            except Exception as e:
+                logger.error("Error running Pokemon agent for input '%s': %s", user_input, e, exc_info=True)
+                return BatchResult(user_input=user_input, error=str(e), duration_seconds=time.perf_counter() - start_time)
+
+    with shared_pokemon_lookups():
+        unique_results = await asyncio.gather(*(run_one(user_input) for user_input in unique_inputs.values()))
+
+    results_by_input = dict(zip(unique_inputs, unique_results))
+    results = []
+    for user_input in user_inputs:
+        unique_result = results_by_input[_normalize_batch_input(user_input)]
+        results.append(BatchResult(
+            user_input=user_input,
+            output=unique_result.output,
+            error=unique_result.error,
+            duration_seconds=unique_result.duration_seconds
+        ))
+    return results
+
+
+def run_pokemon_agent_batch(
+    user_inputs: list[str],
+    max_concurrency: int = DEFAULT_BATCH_CONCURRENCY,
+    log_level: str = "INFO",
+    log_to_file: bool = False
+) -> list[BatchResult]:
+    """
+    Run many user inputs through the Pokemon agent, see arun_pokemon_agent_batch.
+    
+    Args:
+        user_inputs: The user's questions about Pokemon
+        max_concurrency: Maximum number of graph runs in flight at the same time
+        log_level: Logging level (DEBUG, INFO, WARNING, ERROR, CRITICAL)
+        log_to_file: Whether to log to a file in addition to console
+        
+    Returns:
+        One BatchResult per input, in input order
+    """
+    log_file = "logs/pokemon_agent.log" if log_to_file else None
+    setup_logging(log_level=log_level, log_file=log_file)
+
+    return asyncio.run(arun_pokemon_agent_batch(user_inputs, max_concurrency))
+
+
 def main():
     """Main function to demonstrate the Pokemon agent."""
     print("Pokemon Agent Demo")
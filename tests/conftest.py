@@ -1,5 +1,7 @@
 import pytest
 
+from src.pokemon_cache import get_answer_cache, get_extraction_cache
+
 # TODO: Remove this line if it's not needed.
 # Add src directory to Python path for imports
 # sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
@@ -9,6 +11,16 @@ OUT_OF_SCOPE_POKEMON_RESPONSE = "I'm here to provide type advantages and disadva
 NOT_RECOGNIZED_POKEMON_RESPONSE = "I couldn't find that Pokémon. Please check the name and try again."
 OUT_OF_SCOPE_RESPONSE = "I can only help with Pokémon-related questions. Please ask about a specific Pokémon's types or type effectiveness."
 
+@pytest.fixture(autouse=True)
+def isolated_answer_cache(monkeypatch):
+    """Keep cached answers in memory and start every test with empty caches."""
+    monkeypatch.setenv("POKEMON_ANSWER_CACHE_PATH", "")
+    get_answer_cache.cache_clear()
+    get_extraction_cache.cache_clear()
+    yield
+    get_answer_cache.cache_clear()
+    get_extraction_cache.cache_clear()
+
 @pytest.fixture(scope="session")
 def pokemon_type_chart():
     """Pokemon type effectiveness chart for testing."""
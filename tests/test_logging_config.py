@@ -0,0 +1,83 @@
+import json
+import logging
+
+import pytest
+from assertpy import assert_that
+
+from src import logging_config
+from src.logging_config import DeferredQueueHandler, JsonFormatter, RateLimitFilter, setup_logging
+
+
+def make_record(message: str = "Getting type for pokemon: %s", args: tuple = ("pikachu",), level: int = logging.INFO, **extra):
+    record = logging.LogRecord("pokemon_agent.test", level, "tools.py", 42, message, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+@pytest.fixture
+def restore_logging():
+    """Stop the queue listener started by a test and forget its settings."""
+    yield
+    logging_config._stop_queue_listener()
+    logging_config._active_settings = None
+
+
+class TestSetupLogging:
+    """Unit tests for setup_logging."""
+
+    def test_repeated_calls_keep_the_configuration(self, restore_logging):
+        """Test calling setup_logging again with the same arguments does not reconfigure logging."""
+        setup_logging(log_level="CRITICAL")
+        queue_listener = logging_config._queue_listener
+
+        setup_logging(log_level="CRITICAL")
+
+        assert_that(logging_config._queue_listener).is_same_as(queue_listener)
+        assert_that(logging.getLogger("pokemon_agent").handlers[0]).is_instance_of(DeferredQueueHandler)
+
+
+class TestRateLimitFilter:
+    """Unit tests for the per call site rate limit."""
+
+    def test_drops_bursts_and_reports_them(self):
+        """Test records over the limit are dropped and counted in the next window."""
+        rate_limit_filter = RateLimitFilter(max_records=2, interval_seconds=0.05)
+        results = [rate_limit_filter.filter(make_record()) for _ in range(5)]
+
+        assert_that(results).is_equal_to([True, True, False, False, False])
+
+        rate_limit_filter._windows[("tools.py", 42)][0] -= 1
+        record = make_record()
+        assert_that(rate_limit_filter.filter(record)).is_true()
+        assert_that(record.getMessage()).ends_with("(3 similar messages suppressed)")
+
+    def test_warnings_are_never_dropped(self):
+        """Test records at WARNING and above always pass."""
+        rate_limit_filter = RateLimitFilter(max_records=0)
+
+        assert_that(rate_limit_filter.filter(make_record(level=logging.WARNING))).is_true()
+
+
+class TestDeferredQueueHandler:
+    """Unit tests for the deferred formatting queue handler."""
+
+    def test_prepare_keeps_the_arguments(self):
+        """Test records are queued without formatting their message."""
+        record = make_record()
+
+        prepared_record = DeferredQueueHandler(None).prepare(record)
+
+        assert_that(prepared_record.msg).is_equal_to("Getting type for pokemon: %s")
+        assert_that(prepared_record.args).is_equal_to(("pikachu",))
+
+
+class TestJsonFormatter:
+    """Unit tests for the structured log format."""
+
+    def test_formats_records_and_extra_fields(self):
+        """Test records become one JSON object with their extra fields."""
+        log_entry = json.loads(JsonFormatter().format(make_record(trace_id="trace-1")))
+
+        assert_that(log_entry).contains_entry(
+            {"level": "INFO"}, {"message": "Getting type for pokemon: pikachu"}, {"trace_id": "trace-1"}
+        )
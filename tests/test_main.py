@@ -0,0 +1,104 @@
+import pytest
+from assertpy import assert_that
+from langchain_core.language_models.fake_chat_models import FakeMessagesListChatModel
+from langchain_core.messages import AIMessage, ToolMessage
+
+from benchmarks.stand_ins import ScriptedChatModel
+from src.main import DETERMINISTIC_MODE_KEY, GraphConfig, build_graph
+from src.pokemon_agent_tools import set_llm
+from src.run_agent import new_agent_input
+
+AGENT_ANSWER = "Pikachu is an electric type, ground types are super effective against it."
+
+
+class ToolCallingModel(FakeMessagesListChatModel):
+    """Chat model answering with its scripted messages in order, tool calls included."""
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+
+def tool_call(name: str, args: dict, call_id: str) -> AIMessage:
+    return AIMessage(content="", tool_calls=[{"name": name, "args": args, "id": call_id, "type": "tool_call"}])
+
+
+@pytest.fixture
+def scripted_model():
+    """Use a ScriptedChatModel as the shared chat model, so any model call is counted."""
+    llm = ScriptedChatModel()
+    set_llm(llm)
+    yield llm
+    set_llm(None)
+
+
+@pytest.fixture
+def tool_calling_model():
+    """Use a model that looks up pikachu's types and type chart with the tools before answering."""
+    llm = ToolCallingModel(responses=[
+        tool_call("get_pokemon_types", {"pokemon_name": "pikachu"}, "call-types"),
+        tool_call("get_type_chart", {"pokemon_types": ["electric"]}, "call-chart"),
+        AIMessage(content=AGENT_ANSWER),
+    ])
+    set_llm(llm)
+    yield llm
+    set_llm(None)
+
+
+class TestGraphRoutes:
+    """Integration tests of the routes valid inputs take through the compiled graph."""
+
+    def test_deterministic_route_makes_no_model_call(self, scripted_model):
+        """Test the default graph looks the pokemon up without the LLM."""
+        graph = build_graph(GraphConfig(metrics=False))
+
+        result = graph.invoke(*new_agent_input("What beats Pikachu?"))
+
+        assert_that(result["output_message"]).contains("pikachu", "ground")
+        assert_that(result["pokemon_types"]).is_equal_to(["electric"])
+        assert_that(scripted_model.calls).is_zero()
+
+    def test_agent_route_runs_the_tool_calls(self, tool_calling_model):
+        """Test the agent's tool calls run in the tools node and its last message is the answer."""
+        graph = build_graph(GraphConfig(deterministic=False, metrics=False))
+
+        result = graph.invoke(*new_agent_input("What beats Pikachu?"))
+
+        tool_messages = [message for message in result["messages"] if isinstance(message, ToolMessage)]
+        assert_that(result["output_message"]).is_equal_to(AGENT_ANSWER)
+        assert_that([message.name for message in tool_messages]).is_equal_to(["get_pokemon_types", "get_type_chart"])
+        assert_that(tool_messages[0].content).contains("electric")
+        assert_that(tool_messages[1].content).contains("ground")
+
+    def test_configurable_overrides_the_graph_mode(self, tool_calling_model):
+        """Test a run's configurable selects the agent route of a deterministic graph."""
+        graph = build_graph(GraphConfig(metrics=False))
+        initial_state, config = new_agent_input("What beats Pikachu?")
+
+        result = graph.invoke(initial_state, {**config, "configurable": {DETERMINISTIC_MODE_KEY: False}})
+
+        assert_that(result["output_message"]).is_equal_to(AGENT_ANSWER)
+
+    def test_team_question_is_analysed_as_a_team(self, scripted_model):
+        """Test a team question gets one team analysis instead of a lookup per pokemon."""
+        graph = build_graph(GraphConfig(metrics=False))
+
+        result = graph.invoke(*new_agent_input("team: pikachu, charizard, blastoise, snorlax"))
+
+        assert_that(result["team_analysis"].members).is_equal_to(("pikachu", "charizard", "blastoise", "snorlax"))
+        assert_that(result["output_message"]).is_equal_to(str(result["team_analysis"]))
+        assert_that(result["output_message"]).starts_with("Team: pikachu, charizard, blastoise, snorlax")
+        # No lookup_each_pokemon branch ran, none of the members has a type chart
+        assert_that([lookup.pokemon_type_chart for lookup in result["session_lookups"].values()]).is_equal_to([None] * 4)
+        assert_that(scripted_model.calls).is_zero()
+
+    def test_reverse_question_returns_the_matching_species(self, scripted_model):
+        """Test a question naming types instead of a pokemon is answered from the matchup index."""
+        graph = build_graph(GraphConfig(metrics=False))
+
+        result = graph.invoke(*new_agent_input("which pokemon are immune to ground and weak to ice?"))
+
+        assert_that(result["is_input_valid"]).is_true()
+        assert_that(result["matchup_pokemon"]).contains("dragonite", "zapdos").does_not_contain("pikachu")
+        assert_that(result["output_message"]).starts_with("The pokemon weak to ice and immune to ground are:")
+        assert_that(result["output_message"]).contains("dragonite")
+        assert_that(scripted_model.calls).is_zero()
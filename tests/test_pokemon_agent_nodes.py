@@ -1,13 +1,54 @@
+import asyncio
+
 import pytest
 from assertpy import assert_that
+from langchain_core.language_models import FakeListChatModel
 from langchain_core.messages import HumanMessage
+from langchain_core.runnables import RunnableLambda
 
-from src.pokemon_agent_nodes import check_input, format_output
+from src import pokemon_agent_nodes
+from src.pokemon_agent_nodes import acheck_input, check_input, format_output
+from src.pokemon_agent_tools import set_llm
+from src.pokemon_matchup_index import MatchupQuery
+from src.pokemon_record import PokemonRecord
 from src.pokemon_state import PokemonState
 from src.pokemon_type_chart import PokemonTypeChart
 from tests.conftest import NOT_RECOGNIZED_POKEMON_RESPONSE, OUT_OF_SCOPE_NO_POKEMON_RESPONSE, OUT_OF_SCOPE_POKEMON_RESPONSE
 
 
+class CandidateExtractionModel(FakeListChatModel):
+    """Chat model extracting the same ranked candidates, as (name, confidence) pairs, from every input.
+
+    Set mentions to extract several pokemon, each with its own candidates.
+    """
+    candidates: list[tuple[str, float]] = []
+    mentions: list[list[tuple[str, float]]] = []
+    extraction_error: Exception | None = None
+    extraction_calls: list = []
+
+    def with_structured_output(self, schema, **kwargs):
+        return RunnableLambda(self._extract)
+
+    def _extract(self, messages):
+        self.extraction_calls.append(list(messages))
+        if self.extraction_error is not None:
+            raise self.extraction_error
+        mentions = self.mentions or ([self.candidates] if self.candidates else [])
+        return {"pokemon_mentions": [
+            {"candidates": [{"pokemon_name": pokemon_name, "confidence": confidence} for pokemon_name, confidence in candidates]}
+            for candidates in mentions
+        ]}
+
+
+@pytest.fixture
+def candidate_extraction_model():
+    """Use a CandidateExtractionModel as the shared chat model."""
+    llm = CandidateExtractionModel(responses=["I can only help with Pokémon type strengths and weaknesses."], extraction_calls=[])
+    set_llm(llm)
+    yield llm
+    set_llm(None)
+
+
 class TestCheckInput:
     """Unit tests for the check_input function."""
     
@@ -24,6 +65,68 @@ class TestCheckInput:
         assert_that(result["is_input_valid"]).is_true()
         assert_that(result["pokemon_name"])
     
+    def test_check_input_stores_resolved_record(self):
+        """Test check_input keeps the resolved Pokemon record for downstream nodes."""
+        state: PokemonState = {
+            "messages": [HumanMessage(content="What's good against Pikachu?")]
+        }
+        
+        result = check_input(state)
+        
+        assert_that(result["pokemon"]).is_equal_to(PokemonRecord(id=25, name="pikachu", types=["electric"]))
+
+    def test_acheck_input_resolves_without_blocking(self, monkeypatch):
+        """Test acheck_input looks up the locally resolved Pokemon with the async resolver only."""
+        def blocking_resolve_pokemon(pokemon_name):
+            raise AssertionError(f"{pokemon_name} was resolved on the event loop with the sync resolver")
+
+        monkeypatch.setattr(pokemon_agent_nodes, "resolve_pokemon", blocking_resolve_pokemon)
+        state: PokemonState = {
+            "messages": [HumanMessage(content="Compare Gyarados and Dragonite")]
+        }
+
+        result = asyncio.run(acheck_input(state))
+
+        assert_that([pokemon.name for pokemon in result["all_pokemon"]]).is_equal_to(["gyarados", "dragonite"])
+
+    def test_check_input_with_several_pokemon_names(self):
+        """Test check_input keeps every Pokemon of a comparison, the first one as the main pokemon."""
+        state: PokemonState = {
+            "messages": [HumanMessage(content="Compare Gyarados and Dragonite")]
+        }
+
+        result = check_input(state)
+
+        assert_that(result["pokemon_name"]).is_equal_to("gyarados")
+        assert_that([pokemon.name for pokemon in result["all_pokemon"]]).is_equal_to(["gyarados", "dragonite"])
+        assert_that(result["session_lookups"]).contains_key("gyarados", "dragonite")
+        assert_that(result["is_team_question"]).is_false()
+
+    def test_check_input_with_team_question(self):
+        """Test check_input flags several Pokemon asked about as a team."""
+        state: PokemonState = {
+            "messages": [HumanMessage(content="team: pikachu, charizard, blastoise, snorlax")]
+        }
+
+        result = check_input(state)
+
+        assert_that([pokemon.name for pokemon in result["all_pokemon"]]).is_equal_to(
+            ["pikachu", "charizard", "blastoise", "snorlax"]
+        )
+        assert_that(result["is_team_question"]).is_true()
+
+    def test_check_input_with_reverse_question(self):
+        """Test check_input accepts a question naming types instead of a Pokemon."""
+        state: PokemonState = {
+            "messages": [HumanMessage(content="Which pokemon are immune to ground and weak to ice?")]
+        }
+
+        result = check_input(state)
+
+        assert_that(result["is_input_valid"]).is_true()
+        assert_that(result["pokemon_name"]).is_none()
+        assert_that(result["matchup_query"]).is_equal_to(MatchupQuery(weak_to=("ice",), immune_to=("ground",)))
+    
     def test_check_input_with_incorrect_pokemon_name(self):
         """Test check_input with a message containing an incorrect Pokemon name."""
         state: PokemonState = {
@@ -90,6 +193,102 @@ class TestCheckInput:
         assert_that(result["pokemon_name"]).is_none()
 
 
+class TestCandidateExtraction:
+    """Unit tests for the n-best name extraction of check_input."""
+
+    def test_lower_ranked_candidate_is_validated_in_the_same_call(self, candidate_extraction_model):
+        """Test a valid candidate is used without another LLM call when the most confident one is unknown."""
+        candidate_extraction_model.candidates = [("pikachoo", 0.6), ("fakemon", 0.1), ("pikachu", 0.3)]
+        state: PokemonState = {
+            "messages": [HumanMessage(content="What beats the yellow electric mouse?")]
+        }
+
+        result = asyncio.run(acheck_input(state))
+
+        assert_that(result["pokemon_name"]).is_equal_to("pikachu")
+        assert_that(candidate_extraction_model.extraction_calls).is_length(1)
+
+    def test_no_retry_when_no_pokemon_is_mentioned(self, candidate_extraction_model):
+        """Test an input without pokemon costs a single LLM call."""
+        state: PokemonState = {
+            "messages": [HumanMessage(content="What's the weather like today?")]
+        }
+
+        result = check_input(state)
+
+        assert_that(result["is_input_valid"]).is_false()
+        assert_that(candidate_extraction_model.extraction_calls).is_length(1)
+
+    def test_retry_only_when_every_candidate_fails(self, candidate_extraction_model):
+        """Test the LLM is asked again only after all the candidates are unknown."""
+        candidate_extraction_model.candidates = [("fakemon", 0.9), ("notamon", 0.5)]
+        state: PokemonState = {
+            "messages": [HumanMessage(content="What beats the fake pokemon?")]
+        }
+
+        result = check_input(state)
+
+        assert_that(result["is_input_valid"]).is_false()
+        assert_that(candidate_extraction_model.extraction_calls).is_length(3)
+        # The last attempt sees the notes of the first two
+        last_attempt_notes = [message.content for message in candidate_extraction_model.extraction_calls[-1][2:]]
+        assert_that(last_attempt_notes).is_equal_to(result["extraction_notes"][:2])
+
+    def test_retry_notes_stay_out_of_the_messages(self, candidate_extraction_model):
+        """Test the retry notes reach format_output through extraction_notes, not the persisted messages."""
+        candidate_extraction_model.candidates = [("fakemon", 0.9)]
+        state: PokemonState = {
+            "messages": [HumanMessage(content="What beats the fake pokemon?")]
+        }
+
+        result = check_input(state)
+        format_output({**state, **result})
+
+        assert_that(result).does_not_contain_key("messages")
+        assert_that(result["extraction_notes"]).is_length(3)
+        assert_that(result["extraction_notes"][0]).contains("['fakemon']")
+
+    def test_failed_extraction_notes(self, candidate_extraction_model):
+        """Test a model error is noted as a failed extraction, not as candidates named None."""
+        candidate_extraction_model.extraction_error = ValueError("malformed extraction")
+        state: PokemonState = {
+            "messages": [HumanMessage(content="What beats the fake pokemon?")]
+        }
+
+        result = check_input(state)
+
+        assert_that(result["is_input_valid"]).is_false()
+        assert_that(result["extraction_notes"]).is_length(3)
+        assert_that(result["extraction_notes"][0]).does_not_contain("None")
+
+    @pytest.mark.parametrize("user_message,extracted_name", [
+        ("pikachu vs bulbasuar", "bulbasaur"),
+        ("compare pikachu and chrzard", "charizard"),
+    ])
+    def test_mixed_confidence_mentions_are_extracted_by_the_llm(self, candidate_extraction_model, user_message, extracted_name):
+        """Test a confident name does not skip the LLM when another mention is below the threshold."""
+        candidate_extraction_model.mentions = [[("pikachu", 0.9)], [(extracted_name, 0.8)]]
+        state: PokemonState = {
+            "messages": [HumanMessage(content=user_message)]
+        }
+
+        result = check_input(state)
+
+        assert_that([pokemon.name for pokemon in result["all_pokemon"]]).is_equal_to(["pikachu", extracted_name])
+        assert_that(candidate_extraction_model.extraction_calls).is_length(1)
+
+    def test_confident_mentions_skip_the_llm(self, candidate_extraction_model):
+        """Test inputs whose every mention resolves confidently make no LLM call."""
+        state: PokemonState = {
+            "messages": [HumanMessage(content="compare gyarados and dragonite")]
+        }
+
+        result = check_input(state)
+
+        assert_that([pokemon.name for pokemon in result["all_pokemon"]]).is_equal_to(["gyarados", "dragonite"])
+        assert_that(candidate_extraction_model.extraction_calls).is_empty()
+
+
 class TestFormatOutput:
     """Unit tests for the format_output function."""
     
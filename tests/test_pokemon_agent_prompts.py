@@ -0,0 +1,38 @@
+from assertpy import assert_that
+from langchain_core.messages import HumanMessage
+
+from src.pokemon_agent_prompts import (
+    FORMAT_INVALID_INPUT_RESPONSE_PROMPT,
+    MAIN_POKEMON_ASSISTANT_PROMPT,
+    compact_prompt,
+    prompt_messages,
+)
+
+
+class TestPromptBuilding:
+    """Unit tests for the prompt compaction and message building."""
+
+    def test_compact_prompt_keeps_only_the_wording(self):
+        """Test indentation, trailing spaces and repeated blank lines are dropped."""
+        prompt = """First line.
+                    - a rule   
+
+
+                    Last line.
+                 """
+
+        assert_that(compact_prompt(prompt)).is_equal_to("First line.\n- a rule\n\nLast line.")
+
+    def test_prompts_are_compacted(self):
+        """Test the shipped prompts carry no indentation and no pasted tool descriptions."""
+        for prompt in (MAIN_POKEMON_ASSISTANT_PROMPT, FORMAT_INVALID_INPUT_RESPONSE_PROMPT):
+            assert_that(prompt).does_not_contain("\n ", "  ")
+        assert_that(MAIN_POKEMON_ASSISTANT_PROMPT).does_not_contain("get_type_chart")
+
+    def test_system_prompt_prefix_is_stable(self):
+        """Test every call starts with the same system message, followed by the conversation."""
+        first_messages = prompt_messages(MAIN_POKEMON_ASSISTANT_PROMPT, [HumanMessage(content="What beats Pikachu?")])
+        second_messages = prompt_messages(MAIN_POKEMON_ASSISTANT_PROMPT, [HumanMessage(content="What beats Eevee?")])
+
+        assert_that(first_messages[0]).is_same_as(second_messages[0])
+        assert_that(first_messages[1].content).is_equal_to("What beats Pikachu?")
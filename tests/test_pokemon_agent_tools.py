@@ -1,7 +1,12 @@
+import asyncio
+
 from assertpy import assert_that
 import pytest
 
-from src.pokemon_agent_tools import get_pokemon_types, get_type_chart
+from langchain_core.language_models import FakeListChatModel
+
+from src.pokemon_agent_tools import aget_pokemon_types, aget_type_chart, get_llm, get_pokemon_types, get_type_chart, set_llm
+from src.pokemon_record import PokemonRecord
 from src.pokemon_type_chart import PokemonTypeChart
 
 
@@ -38,6 +43,20 @@ class TestGetPokemonTypes:
         assert_that(result).is_instance_of(list)
         assert_that(result).is_empty()
 
+    def test_get_pokemon_type_reuses_resolved_record(self):
+        """Test get_pokemon_type uses the record already resolved in the state."""
+        pokemon_record = PokemonRecord(id=0, name="fakemon", types=["fire"])
+
+        result = get_pokemon_types("Fakemon", pokemon_record)
+
+        assert_that(result).is_equal_to(["fire"])
+
+    def test_aget_pokemon_type_with_dual_type(self):
+        """Test the async get_pokemon_type with a Pokemon that has two types."""
+        result = asyncio.run(aget_pokemon_types("Charizard"))
+        
+        assert_that(result).is_equal_to(["fire", "flying"])
+
 class TestGetTypeChart:
     """Unit tests for the get_type_chart function."""
     
@@ -70,3 +89,27 @@ class TestGetTypeChart:
         assert_that(result).is_not_none()
         assert_that(result).is_instance_of(PokemonTypeChart)
         assert_that(result).is_equal_to(expected_type_chart)
+
+    def test_aget_type_chart(self):
+        """Test the async get_type_chart matches the sync version."""
+        result = asyncio.run(aget_type_chart(["fire", "flying"]))
+
+        assert_that(result).is_equal_to(get_type_chart(["fire", "flying"]))
+
+
+
+class TestSetLlm:
+    """Unit tests for the chat model override."""
+
+    def test_set_llm_replaces_the_shared_model(self):
+        """Test get_llm returns the latest override instead of the cached model."""
+        first_llm = FakeListChatModel(responses=["pikachu"])
+        second_llm = FakeListChatModel(responses=["charizard"])
+        try:
+            set_llm(first_llm)
+            assert_that(get_llm()).is_same_as(first_llm)
+
+            set_llm(second_llm)
+            assert_that(get_llm()).is_same_as(second_llm)
+        finally:
+            set_llm(None)
@@ -0,0 +1,106 @@
+from pathlib import Path
+
+from assertpy import assert_that
+
+from src.pokemon_cache import DEFAULT_ANSWER_CACHE_PATH, NO_POKEMON_FOUND, AnswerCache, ExtractionCache, LRUCache, SQLiteCache, normalize_user_input
+
+
+class TestLRUCache:
+    """Unit tests for the in-memory cache tier."""
+
+    def test_evicts_least_recently_used(self):
+        """Test the cache stays bounded and keeps recently read entries."""
+        cache = LRUCache(max_size=2)
+        cache.set("pikachu", "electric")
+        cache.set("charizard", "fire")
+        cache.get("pikachu")
+        cache.set("squirtle", "water")
+
+        assert_that(cache.get("charizard")).is_none()
+        assert_that(cache.get("pikachu")).is_equal_to("electric")
+        assert_that(cache.stats.evictions).is_equal_to(1)
+
+    def test_default_path_is_under_the_project_root(self):
+        """Test the default cache file does not depend on the working directory."""
+        project_root = Path(__file__).resolve().parent.parent
+
+        assert_that(DEFAULT_ANSWER_CACHE_PATH.resolve()).is_equal_to(project_root / "cache" / "pokemon_answers.sqlite3")
+
+    def test_expired_entries_are_misses(self):
+        """Test entries are not served after their TTL."""
+        cache = LRUCache()
+        cache.set("pikachu", "electric", ttl_seconds=0)
+
+        assert_that(cache.get("pikachu")).is_none()
+        assert_that(cache.stats.misses).is_equal_to(1)
+
+
+class TestSQLiteCache:
+    """Unit tests for the on-disk cache tier."""
+
+    def test_survives_reopening(self, tmp_path):
+        """Test entries are kept across connections."""
+        SQLiteCache(tmp_path / "cache.sqlite3").set("pikachu", "electric")
+
+        assert_that(SQLiteCache(tmp_path / "cache.sqlite3").get("pikachu")).is_equal_to("electric")
+
+    def test_evicts_over_max_entries(self, tmp_path):
+        """Test the oldest entries are evicted past max_entries."""
+        cache = SQLiteCache(tmp_path / "cache.sqlite3", max_entries=2)
+        for pokemon_name in ["pikachu", "charizard", "squirtle"]:
+            cache.set(pokemon_name, pokemon_name)
+
+        assert_that(len(cache)).is_equal_to(2)
+        assert_that(cache.stats.evictions).is_equal_to(1)
+
+
+class TestAnswerCache:
+    """Unit tests for the tiered answer cache."""
+
+    def test_disk_hits_are_promoted_to_memory(self, tmp_path):
+        """Test an answer written by another process is served and promoted."""
+        AnswerCache(LRUCache(), SQLiteCache(tmp_path / "cache.sqlite3")).set("pikachu", "answer")
+        answer_cache = AnswerCache(LRUCache(), SQLiteCache(tmp_path / "cache.sqlite3"))
+
+        assert_that(answer_cache.get("Pikachu")).is_equal_to("answer")
+        assert_that(answer_cache.memory_cache.get(answer_cache.key("pikachu"))).is_equal_to("answer")
+        assert_that(answer_cache.stats.hits).is_equal_to(1)
+
+    def test_data_version_invalidates_entries(self):
+        """Test answers cached for another data version are not served."""
+        memory_cache = LRUCache()
+        AnswerCache(memory_cache, data_version="old").set("pikachu", "answer")
+
+        answer_cache = AnswerCache(memory_cache, data_version="new")
+
+        assert_that(answer_cache.get("pikachu")).is_none()
+        assert_that(answer_cache.stats.misses).is_equal_to(1)
+
+
+class TestExtractionCache:
+    """Unit tests for the LLM extraction cache."""
+
+    def test_near_identical_inputs_share_an_entry(self):
+        """Test case, punctuation and stop words do not change the key."""
+        extraction_cache = ExtractionCache(LRUCache(), prompt="prompt")
+        extraction_cache.set("What beats Charizard?", "gpt-4o", "charizard")
+
+        assert_that(normalize_user_input("what  beats charizard!!")).is_equal_to("charizard")
+        assert_that(extraction_cache.get("which types beat charizard", "gpt-4o")).is_equal_to("charizard")
+
+    def test_prompt_and_model_are_part_of_the_key(self):
+        """Test extractions are not reused across prompt or model changes."""
+        memory_cache = LRUCache()
+        ExtractionCache(memory_cache, prompt="prompt").set("charizard", "gpt-4o", "charizard")
+
+        assert_that(ExtractionCache(memory_cache, prompt="prompt").get("charizard", "gpt-4o-mini")).is_none()
+        assert_that(ExtractionCache(memory_cache, prompt="new prompt").get("charizard", "gpt-4o")).is_none()
+
+    def test_negative_results_use_the_shorter_ttl(self):
+        """Test inputs without a pokemon are cached with the no-pokemon TTL."""
+        extraction_cache = ExtractionCache(LRUCache(), prompt="prompt", no_pokemon_ttl_seconds=0)
+        extraction_cache.set("hello there", "gpt-4o", NO_POKEMON_FOUND)
+        extraction_cache.set("charizard", "gpt-4o", "charizard")
+
+        assert_that(extraction_cache.get("hello there", "gpt-4o")).is_none()
+        assert_that(extraction_cache.get("charizard", "gpt-4o")).is_equal_to("charizard")
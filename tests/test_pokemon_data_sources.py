@@ -0,0 +1,137 @@
+import asyncio
+
+import httpx
+import pytest
+from assertpy import assert_that
+
+from benchmarks.stand_ins import PokeApiStandIn
+from src.pokemon_data_sources import (
+    CircuitBreaker,
+    CircuitOpenError,
+    LocalHttpDataSource,
+    PokemonDataError,
+    PokemonDataSource,
+    RetryPolicy,
+    SnapshotDataSource,
+)
+from src.pokemon_record import PokemonRecord
+from src.pokemon_species_index import get_species_index
+
+# Nothing listens on the discard port, so every request fails to connect
+UNREACHABLE_BASE_URL = "http://127.0.0.1:9/api/v2"
+NO_DELAY_RETRY_POLICY = RetryPolicy(attempts=2, base_delay_seconds=0, max_delay_seconds=0)
+
+
+class FakemonDataSource(PokemonDataSource):
+    """Data source that only knows fakemon."""
+
+    def get_pokemon(self, pokemon_name):
+        return PokemonRecord(id=0, name="fakemon", types=["fire"]) if pokemon_name == "fakemon" else None
+
+
+class MockHttpDataSource(LocalHttpDataSource):
+    """HTTP data source answering every request with the given handler, recording the request paths."""
+
+    def __init__(self, handler, **kwargs):
+        super().__init__(**kwargs)
+        self.handler = handler
+        self.paths = []
+
+    def _http_client(self):
+        def handler(request):
+            self.paths.append(request.url.raw_path.decode())
+            return self.handler(request)
+
+        return httpx.Client(base_url=self.base_url, transport=httpx.MockTransport(handler))
+
+
+class TestCircuitBreaker:
+    """Unit tests for the circuit breaker."""
+
+    def test_opens_after_consecutive_failures(self):
+        """Test requests are refused once the failure threshold is reached."""
+        circuit_breaker = CircuitBreaker(failure_threshold=2)
+        circuit_breaker.record_failure()
+        assert_that(circuit_breaker.allow_request()).is_true()
+
+        circuit_breaker.record_failure()
+        assert_that(circuit_breaker.allow_request()).is_false()
+
+    def test_trial_request_closes_the_breaker(self):
+        """Test a single trial request goes through after the reset timeout."""
+        circuit_breaker = CircuitBreaker(failure_threshold=1, reset_timeout_seconds=0)
+        circuit_breaker.record_failure()
+
+        assert_that(circuit_breaker.allow_request()).is_true()
+        assert_that(circuit_breaker.allow_request()).is_false()
+
+        circuit_breaker.record_success()
+        assert_that(circuit_breaker.is_open).is_false()
+
+
+class TestSnapshotDataSource:
+    """Unit tests for the species index data source."""
+
+    def test_serves_from_the_index(self):
+        """Test known pokemon never reach the fallback."""
+        data_source = SnapshotDataSource(get_species_index(), fallback=FakemonDataSource())
+
+        assert_that(data_source.get_pokemon("charizard").types).is_equal_to(("fire", "flying"))
+
+    def test_misses_go_to_the_fallback(self):
+        """Test unknown pokemon are looked up in the fallback source."""
+        data_source = SnapshotDataSource(get_species_index(), fallback=FakemonDataSource())
+
+        assert_that(asyncio.run(data_source.aget_pokemon("fakemon")).name).is_equal_to("fakemon")
+        assert_that(data_source.get_pokemon("missingno")).is_none()
+
+
+class TestHttpDataSource:
+    """Unit tests for the HTTP data sources."""
+
+    def test_connection_errors_raise_after_retries(self):
+        """Test failures surface as PokemonDataError instead of a missing pokemon."""
+        data_source = LocalHttpDataSource(UNREACHABLE_BASE_URL, retry_policy=NO_DELAY_RETRY_POLICY)
+
+        with pytest.raises(PokemonDataError):
+            data_source.get_pokemon("pikachu")
+
+    def test_open_circuit_skips_requests(self):
+        """Test the source stops calling the server once its circuit is open."""
+        data_source = LocalHttpDataSource(
+            UNREACHABLE_BASE_URL,
+            retry_policy=NO_DELAY_RETRY_POLICY,
+            circuit_breaker=CircuitBreaker(failure_threshold=1)
+        )
+
+        with pytest.raises(PokemonDataError):
+            asyncio.run(data_source.aget_pokemon("pikachu"))
+        with pytest.raises(CircuitOpenError):
+            asyncio.run(data_source.aget_pokemon("pikachu"))
+
+    def test_malformed_body_is_not_retried(self):
+        """Test a malformed 200 body raises straight away without opening the circuit."""
+        circuit_breaker = CircuitBreaker(failure_threshold=1)
+        data_source = MockHttpDataSource(
+            lambda request: httpx.Response(200, json={"name": "pikachu"}),
+            retry_policy=NO_DELAY_RETRY_POLICY,
+            circuit_breaker=circuit_breaker
+        )
+
+        with pytest.raises(PokemonDataError):
+            data_source.get_pokemon("Mr. Mime")
+
+        assert_that(data_source.paths).is_equal_to(["/api/v2/pokemon/mr.%20mime"])
+        assert_that(circuit_breaker.is_open).is_false()
+
+    def test_cancelled_trial_frees_the_breaker(self):
+        """Test a half-open trial call cancelled by a timeout lets the next call try again."""
+        circuit_breaker = CircuitBreaker(failure_threshold=1, reset_timeout_seconds=0)
+        circuit_breaker.record_failure()
+
+        with PokeApiStandIn(latency_seconds=1.0) as stand_in:
+            data_source = LocalHttpDataSource(stand_in.base_url, circuit_breaker=circuit_breaker)
+            with pytest.raises(asyncio.TimeoutError):
+                asyncio.run(asyncio.wait_for(data_source.aget_pokemon("pikachu"), timeout=0.05))
+
+        assert_that(circuit_breaker.allow_request()).is_true()
@@ -0,0 +1,174 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from assertpy import assert_that
+from langchain_openai import ChatOpenAI
+
+from benchmarks.stand_ins import OpenAiStandIn
+from src.pokemon_agent_tools import set_llm
+from src.pokemon_llm_client import (
+    AdaptiveConcurrencyLimit,
+    LLMClientConfig,
+    LLMHttpClients,
+    TokenBucket,
+    create_llm_http_clients,
+)
+from src.run_agent import run_pokemon_agent_batch
+
+# Limits high enough that only the concurrency limit applies
+UNLIMITED_RATE_CONFIG = LLMClientConfig(requests_per_minute=600_000, tokens_per_minute=10**9)
+
+
+def stand_in_llm(stand_in: OpenAiStandIn, llm_http_clients: LLMHttpClients | None = None) -> ChatOpenAI:
+    llm_http_clients = llm_http_clients or create_llm_http_clients(UNLIMITED_RATE_CONFIG)
+    return ChatOpenAI(
+        model="gpt-4o",
+        base_url=stand_in.base_url,
+        api_key="test",
+        max_retries=5,
+        http_client=llm_http_clients.http_client,
+        http_async_client=llm_http_clients.http_async_client
+    )
+
+
+@pytest.fixture
+def stand_in():
+    with OpenAiStandIn(latency_seconds=0.2) as stand_in:
+        yield stand_in
+
+
+class TestTokenBucket:
+    """Unit tests for the token bucket."""
+
+    def test_waits_once_the_burst_is_spent(self):
+        """Test callers past the capacity wait for the refill, in arrival order."""
+        token_bucket = TokenBucket(rate_per_second=10, capacity=2)
+
+        assert_that(token_bucket.reserve()).is_equal_to(0)
+        assert_that(token_bucket.reserve()).is_equal_to(0)
+        assert_that(token_bucket.reserve()).is_close_to(0.1, tolerance=0.01)
+        assert_that(token_bucket.reserve()).is_close_to(0.2, tolerance=0.01)
+
+    def test_pause_holds_back_every_caller(self):
+        """Test a pause makes even a full bucket wait."""
+        token_bucket = TokenBucket(rate_per_second=10, capacity=5)
+        token_bucket.pause(1.0)
+
+        assert_that(token_bucket.reserve()).is_close_to(1.1, tolerance=0.01)
+
+
+class TestAdaptiveConcurrencyLimit:
+    """Unit tests for the AIMD concurrency limit."""
+
+    def test_fast_successes_raise_the_limit(self):
+        """Test a round of fast successes adds about one slot."""
+        concurrency_limit = AdaptiveConcurrencyLimit(initial_limit=4, max_limit=8)
+        for _ in range(4):
+            concurrency_limit.release(concurrency_limit.acquire(), overloaded=False)
+
+        assert_that(concurrency_limit.limit).is_equal_to(4)
+        concurrency_limit.release(concurrency_limit.acquire(), overloaded=False)
+        assert_that(concurrency_limit.limit).is_equal_to(5)
+
+    def test_initial_limit_respects_the_maximum(self):
+        """Test a maximum below the default initial limit applies from the first request."""
+        concurrency_limit = AdaptiveConcurrencyLimit(initial_limit=8, max_limit=2)
+
+        assert_that(concurrency_limit.limit).is_equal_to(2)
+
+    def test_max_concurrency_from_env_caps_the_limit(self, monkeypatch):
+        """Test POKEMON_LLM_MAX_CONCURRENCY caps the limiter of the built clients."""
+        monkeypatch.setenv("POKEMON_LLM_MAX_CONCURRENCY", "2")
+
+        llm_http_clients = create_llm_http_clients(LLMClientConfig.from_env())
+
+        assert_that(llm_http_clients.limiter.concurrency.limit).is_equal_to(2)
+
+    def test_overload_halves_the_limit_once_per_round(self):
+        """Test several 429s from the same round only halve the limit once."""
+        concurrency_limit = AdaptiveConcurrencyLimit(initial_limit=8)
+        acquired_at = [concurrency_limit.acquire() for _ in range(3)]
+        for request_acquired_at in acquired_at:
+            concurrency_limit.release(request_acquired_at, overloaded=True)
+
+        assert_that(concurrency_limit.limit).is_equal_to(4)
+        assert_that(concurrency_limit.in_flight).is_equal_to(0)
+
+        concurrency_limit.release(concurrency_limit.acquire(), overloaded=True)
+        assert_that(concurrency_limit.limit).is_equal_to(2)
+
+
+class TestRateLimitedClients:
+    """Integration tests of ChatOpenAI over the rate-limited clients and a local OpenAI stand-in."""
+
+    def test_identical_async_requests_share_one_call(self, stand_in):
+        """Test concurrent identical prompts reach the provider once and all get the answer."""
+        llm = stand_in_llm(stand_in)
+
+        async def ask_concurrently():
+            return await asyncio.gather(*[llm.ainvoke("What beats Charizard?") for _ in range(5)])
+
+        answers = asyncio.run(ask_concurrently())
+
+        assert_that([answer.content for answer in answers]).is_equal_to([stand_in.reply] * 5)
+        assert_that(stand_in.requests).is_equal_to(1)
+
+    def test_identical_sync_requests_share_one_call(self, stand_in):
+        """Test identical prompts from several threads reach the provider once."""
+        llm = stand_in_llm(stand_in)
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            answers = list(executor.map(lambda _: llm.invoke("What beats Charizard?").content, range(4)))
+
+        assert_that(answers).is_equal_to([stand_in.reply] * 4)
+        assert_that(stand_in.requests).is_equal_to(1)
+
+    def test_batches_on_new_event_loops_reuse_no_connection(self, stand_in):
+        """Test a second batch, run on a new event loop, calls the provider as often as the first one."""
+        stand_in.latency_seconds = 0
+        set_llm(stand_in_llm(stand_in))
+        try:
+            first_results = run_pokemon_agent_batch(["Tell me a joke"])
+            first_batch_requests = stand_in.requests
+            second_results = run_pokemon_agent_batch(["Tell me a joke"])
+        finally:
+            set_llm(None)
+
+        assert_that(first_batch_requests).is_positive()
+        assert_that(stand_in.requests).is_equal_to(2 * first_batch_requests)
+        assert_that(second_results[0].output).is_equal_to(first_results[0].output).is_equal_to(stand_in.reply)
+
+    def test_concurrency_backs_off_on_429(self):
+        """Test the limit drops below its start when the provider rejects requests, and every prompt is answered."""
+        config = LLMClientConfig(
+            requests_per_minute=600_000, tokens_per_minute=10**9, initial_concurrency=8, max_concurrency=8
+        )
+        llm_http_clients = create_llm_http_clients(config)
+        with OpenAiStandIn(latency_seconds=0.1, max_concurrency=2) as stand_in:
+            llm = stand_in_llm(stand_in, llm_http_clients)
+
+            async def ask_concurrently():
+                return await asyncio.gather(*[llm.ainvoke(f"Question {index}") for index in range(12)])
+
+            answers = asyncio.run(ask_concurrently())
+
+        assert_that(answers).is_length(12)
+        assert_that(stand_in.rejected_requests).is_greater_than(0)
+        assert_that(llm_http_clients.limiter.concurrency.limit).is_less_than(8)
+
+    def test_request_rate_is_paced(self, stand_in):
+        """Test requests past the per-minute budget wait for the bucket to refill."""
+        stand_in.latency_seconds = 0
+        # 2 requests per second, with a burst of 2
+        llm = stand_in_llm(stand_in, create_llm_http_clients(
+            LLMClientConfig(requests_per_minute=120, tokens_per_minute=10**9)
+        ))
+
+        started = time.perf_counter()
+        for index in range(4):
+            llm.invoke(f"Question {index}")
+
+        assert_that(stand_in.requests).is_equal_to(4)
+        assert_that(time.perf_counter() - started).is_greater_than_or_equal_to(0.9)
@@ -0,0 +1,87 @@
+import pytest
+from assertpy import assert_that
+
+from src.pokemon_agent_tools import find_pokemon_by_matchup
+from src.pokemon_matchup_index import MatchupIndex, MatchupQuery, parse_matchup_query
+from src.pokemon_record import PokemonRecord
+
+RECORDS = [
+    PokemonRecord(6, "charizard", ["fire", "flying"]),
+    PokemonRecord(25, "pikachu", ["electric"]),
+    PokemonRecord(50, "diglett", ["ground"]),
+    PokemonRecord(16, "pidgey", ["normal", "flying"]),
+    PokemonRecord(0, "missingno", ["bird"]),
+]
+
+
+@pytest.fixture
+def matchup_index():
+    return MatchupIndex.from_records(RECORDS)
+
+
+class TestMatchupIndex:
+    """Unit tests for the inverted matchup index."""
+
+    def test_intersects_conditions(self, matchup_index):
+        """Test species must meet every all_of condition, returned in pokemon ID order."""
+        records = matchup_index.query(all_of=[("ground", "immune"), ("electric", "weak")])
+
+        assert_that([record.name for record in records]).is_equal_to(["charizard", "pidgey"])
+
+    def test_union_of_any_of_conditions(self, matchup_index):
+        """Test any_of conditions are combined with a union before the intersection."""
+        records = matchup_index.query(all_of=[("water", "weak")], any_of=[("rock", "super_effective"), ("grass", "weak")])
+
+        assert_that([record.name for record in records]).is_equal_to(["charizard", "diglett"])
+
+    def test_groups_include_their_buckets(self, matchup_index):
+        """Test the weak group holds both the 2x and the 4x species."""
+        weak_to_rock = matchup_index.bitset("rock", "weak")
+
+        assert_that(weak_to_rock).is_equal_to(
+            matchup_index.bitset("rock", "super_effective") | matchup_index.bitset("rock", "effective")
+        )
+        assert_that([record.name for record in matchup_index.species(weak_to_rock)]).is_equal_to(["charizard", "pidgey"])
+
+    def test_skips_unknown_type_combinations(self, matchup_index):
+        """Test records with unknown types are not indexed and unknown buckets raise."""
+        assert_that([record.name for record in matchup_index.records]).does_not_contain("missingno")
+        with pytest.raises(KeyError):
+            matchup_index.bitset("fire", "sometimes")
+
+
+class TestParseMatchupQuery:
+    """Unit tests for parsing reverse questions."""
+
+    def test_types_follow_their_relation(self):
+        """Test each type counts for the relation word before it."""
+        matchup_query = parse_matchup_query("Which pokemon are immune to ground and weak to ice?")
+
+        assert_that(matchup_query).is_equal_to(MatchupQuery(weak_to=("ice",), immune_to=("ground",)))
+        assert_that(str(matchup_query)).is_equal_to("weak to ice and immune to ground")
+
+    def test_several_types_of_one_relation(self):
+        """Test every type after a relation word joins it, repeats once."""
+        matchup_query = parse_matchup_query("what resists fire, water and fire?")
+
+        assert_that(matchup_query).is_equal_to(MatchupQuery(resists=("fire", "water")))
+
+    @pytest.mark.parametrize("user_message", ["what is it weak to?", "fire types", "tell me a joke"])
+    def test_no_query_without_a_type_after_a_relation(self, user_message):
+        """Test messages not pairing a relation word with a type are no reverse question."""
+        assert_that(parse_matchup_query(user_message)).is_none()
+
+
+class TestFindPokemonByMatchup:
+    """Unit tests for the find_pokemon_by_matchup tool."""
+
+    def test_answers_from_the_species_index(self):
+        """Test the tool answers a reverse question over every indexed species."""
+        pokemon_names = find_pokemon_by_matchup(weak_to=["Ice"], immune_to=["ground"])
+
+        assert_that(pokemon_names).contains("pidgey", "zapdos", "dragonite").does_not_contain("charizard")
+
+    def test_rejects_unknown_types_and_empty_queries(self):
+        """Test invalid queries return no pokemon instead of every species."""
+        assert_that(find_pokemon_by_matchup(weak_to=["bird"])).is_empty()
+        assert_that(find_pokemon_by_matchup()).is_empty()
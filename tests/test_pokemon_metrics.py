@@ -0,0 +1,115 @@
+import asyncio
+from uuid import uuid4
+
+from assertpy import assert_that
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, LLMResult
+
+from src.pokemon_metrics import (
+    LLM_TOKENS,
+    NODE_DURATION,
+    REQUEST_DURATION,
+    Histogram,
+    MetricsCallbackHandler,
+    MetricsRegistry,
+    with_trace_id,
+)
+
+
+class TestHistogram:
+    """Unit tests for the latency histogram."""
+
+    def test_quantiles_use_bucket_upper_bounds(self):
+        """Test quantiles are estimated from the buckets and capped at the max."""
+        histogram = Histogram(buckets=(0.1, 1.0))
+        for value in [0.05, 0.05, 0.05, 0.5]:
+            histogram.observe(value)
+
+        assert_that(histogram.quantile(0.5)).is_equal_to(0.1)
+        assert_that(histogram.quantile(0.99)).is_equal_to(0.5)
+
+
+class TestMetricsRegistry:
+    """Unit tests for the metrics registry."""
+
+    def test_prometheus_output(self):
+        """Test histograms and counters are rendered in the Prometheus text format."""
+        metrics = MetricsRegistry()
+        metrics.observe(NODE_DURATION, {"node": "check_input"}, 0.002)
+        metrics.increment(LLM_TOKENS, {"model": "gpt-4o", "kind": "input"}, 12)
+
+        prometheus_text = metrics.to_prometheus()
+
+        assert_that(prometheus_text).contains('pokemon_agent_node_duration_seconds_bucket{node="check_input",le="0.0025"} 1')
+        assert_that(prometheus_text).contains('pokemon_agent_node_duration_seconds_count{node="check_input"} 1')
+        assert_that(prometheus_text).contains('pokemon_agent_llm_tokens_total{kind="input",model="gpt-4o"} 12')
+
+
+    def test_forgets_the_least_recently_active_sessions(self):
+        """Test session token totals are bounded and kept out of the Prometheus output."""
+        metrics = MetricsRegistry(tracked_sessions=2)
+        metrics.add_session_tokens("session-1", "input", 10)
+        metrics.add_session_tokens("session-2", "input", 20)
+        metrics.add_session_tokens("session-1", "output", 5)
+        metrics.add_session_tokens("session-3", "input", 30)
+
+        assert_that(metrics.snapshot()["session_tokens"]).is_equal_to({
+            "session-1": {"input": 10, "output": 5},
+            "session-3": {"input": 30, "output": 0},
+        })
+        assert_that(metrics.to_prometheus()).does_not_contain("session")
+
+
+class TestMetricsCallbackHandler:
+    """Unit tests for the graph callback handler."""
+
+    def test_records_nodes_llm_calls_and_traces(self):
+        """Test a graph run records node latency, token usage per node and session, and a trace summary."""
+        metrics = MetricsRegistry()
+        handler = MetricsCallbackHandler(metrics)
+        graph_run_id, node_run_id, llm_run_id = uuid4(), uuid4(), uuid4()
+        metadata = {"trace_id": "trace-1", "langgraph_node": "format_output", "thread_id": "session-1"}
+
+        handler.on_chain_start({}, {}, run_id=graph_run_id, metadata={"trace_id": "trace-1"}, name="LangGraph")
+        handler.on_chain_start({}, {}, run_id=node_run_id, parent_run_id=graph_run_id, metadata=metadata, name="format_output")
+        handler.on_chat_model_start({}, [], run_id=llm_run_id, metadata={**metadata, "ls_model_name": "gpt-4o"})
+        handler.on_llm_end(
+            LLMResult(generations=[[ChatGeneration(message=AIMessage(
+                content="answer", usage_metadata={"input_tokens": 20, "output_tokens": 5, "total_tokens": 25}
+            ))]]),
+            run_id=llm_run_id
+        )
+        handler.on_chain_end({}, run_id=node_run_id)
+        handler.on_chain_end({}, run_id=graph_run_id)
+
+        snapshot = metrics.snapshot()
+        assert_that(snapshot["histograms"][NODE_DURATION][0]["labels"]).is_equal_to({"node": "format_output"})
+        assert_that(snapshot["histograms"][REQUEST_DURATION][0]["count"]).is_equal_to(1)
+        assert_that(snapshot["counters"][LLM_TOKENS]).contains(
+            {"labels": {"kind": "output", "model": "gpt-4o", "node": "format_output"}, "value": 5}
+        )
+        assert_that(metrics.session_tokens("session-1")).is_equal_to({"input": 20, "output": 5})
+        assert_that(snapshot["recent_traces"][0]).contains_entry({"trace_id": "trace-1"}, {"llm_calls": 1})
+        assert_that(snapshot["recent_traces"][0]["tokens"]).is_equal_to({"format_output": {"input": 20, "output": 5}})
+        assert_that(snapshot["recent_traces"][0]["nodes"][0]["node"]).is_equal_to("format_output")
+
+
+class TestWithTraceId:
+    """Unit tests for the trace ID node wrapper."""
+
+    def test_keeps_the_state_trace_id(self):
+        """Test a trace ID already in the state is kept."""
+        node = with_trace_id(lambda state: {"is_input_valid": True})
+
+        result = node({"trace_id": "trace-1"}, {})
+
+        assert_that(result).is_equal_to({"is_input_valid": True, "trace_id": "trace-1"})
+
+    def test_uses_the_run_metadata(self):
+        """Test the async wrapper takes the trace ID from the run metadata."""
+        async def anode(state):
+            return {}
+
+        result = asyncio.run(with_trace_id(anode)({}, {"metadata": {"trace_id": "trace-2"}}))
+
+        assert_that(result).is_equal_to({"trace_id": "trace-2"})
@@ -0,0 +1,98 @@
+from assertpy import assert_that
+import pytest
+
+from src.pokemon_name_resolver import (
+    RESOLVER_CONFIDENCE_THRESHOLD,
+    BKTree,
+    PokemonNameResolver,
+    levenshtein_distance,
+    resolve_pokemon_names,
+)
+
+
+class TestResolvePokemonName:
+    """Unit tests for the local pokemon name resolver."""
+
+    @pytest.mark.parametrize("user_message,expected_pokemon_name", [
+        ("What's good against Pikachu?", "pikachu"),
+        ("charizard's weaknesses", "charizard"),
+        ("Tell me about Mr. Mime", "mr-mime"),
+        ("What's good against chrmunder?", "charmander"),
+        ("what beats gyrados", "gyarados"),
+    ])
+    def test_resolve_confident_names(self, user_message, expected_pokemon_name):
+        """Test exact and slightly misspelled names are resolved without the LLM."""
+        result = resolve_pokemon_names(user_message)
+
+        assert_that([resolution.pokemon_name for resolution in result]).is_equal_to([expected_pokemon_name])
+        assert_that(result[0].confidence).is_greater_than_or_equal_to(RESOLVER_CONFIDENCE_THRESHOLD)
+
+    @pytest.mark.parametrize("user_message", [
+        "What's good against Fakemon?",
+        "What's the weather like today?",
+        "Can you help me with Pokemon types?",
+        "what is horse weak to",
+        "which types beat a monkey or a kitten?",
+        "",
+    ])
+    def test_resolve_without_pokemon_name(self, user_message):
+        """Test inputs without a known pokemon, including English words one typo away from a name, are left to the LLM."""
+        result = resolve_pokemon_names(user_message)
+
+        assert_that([
+            resolution for resolution in result if resolution.confidence >= RESOLVER_CONFIDENCE_THRESHOLD
+        ]).is_empty()
+
+    @pytest.mark.parametrize("user_message,uncertain_pokemon_name", [
+        ("pikachu vs bulbasuar", "bulbasaur"),
+        ("compare pikachu and chrzard", "charizard"),
+    ])
+    def test_uncertain_mentions_are_kept(self, user_message, uncertain_pokemon_name):
+        """Test a misspelled mention next to a confident name is returned below the threshold, not dropped."""
+        result = resolve_pokemon_names(user_message)
+
+        assert_that([resolution.pokemon_name for resolution in result]).is_equal_to(["pikachu", uncertain_pokemon_name])
+        assert_that(result[0].confidence).is_equal_to(1.0)
+        assert_that(result[1].confidence).is_less_than(RESOLVER_CONFIDENCE_THRESHOLD)
+
+    def test_resolve_ambiguous_name_lowers_confidence(self):
+        """Test a typo equally close to two names is not trusted."""
+        resolver = PokemonNameResolver(["sandshrew", "sandshrow"])
+
+        result = resolver.resolve_all("sandshraw")
+
+        assert_that(result).is_length(1)
+        assert_that(result[0].confidence).is_less_than(RESOLVER_CONFIDENCE_THRESHOLD)
+
+    @pytest.mark.parametrize("user_message,expected_pokemon_names", [
+        ("compare Gyarados and Dragonite", ["gyarados", "dragonite"]),
+        ("mr mime vs pikachu vs gyrados", ["mr-mime", "pikachu", "gyarados"]),
+        ("Pikachu or pikachu?", ["pikachu"]),
+        ("What's the weather like today?", []),
+    ])
+    def test_resolve_every_mentioned_name(self, user_message, expected_pokemon_names):
+        """Test every distinct name is resolved, in the order it is mentioned."""
+        result = resolve_pokemon_names(user_message)
+
+        assert_that([resolution.pokemon_name for resolution in result]).is_equal_to(expected_pokemon_names)
+
+
+class TestBKTree:
+    """Unit tests for the BK-tree search."""
+
+    def test_search_returns_closest_first(self):
+        """Test matches are bounded by distance and sorted."""
+        tree = BKTree(["pikachu", "raichu", "pichu", "mew"])
+
+        result = tree.search("pikachu", 2)
+
+        assert_that(result).is_equal_to([(0, "pikachu"), (2, "pichu")])
+
+    @pytest.mark.parametrize("source,target,expected_distance", [
+        ("chrmunder", "charmander", 2),
+        ("mew", "mew", 0),
+        ("", "abc", 3),
+    ])
+    def test_levenshtein_distance(self, source, target, expected_distance):
+        """Test the edit distance computation."""
+        assert_that(levenshtein_distance(source, target)).is_equal_to(expected_distance)
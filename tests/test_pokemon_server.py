@@ -0,0 +1,149 @@
+import asyncio
+import logging
+import time
+
+import httpx
+import pytest
+from assertpy import assert_that
+from langchain_core.language_models import FakeListChatModel
+
+from src.pokemon_agent_tools import set_llm
+from src.pokemon_server import PokemonAgentServer, ServerConfig
+
+
+class ToolCallingFakeChatModel(FakeListChatModel):
+    """Fake chat model that accepts tools so the agent model can be built from it."""
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+
+@pytest.fixture
+def fake_llm():
+    """Replace the model client so the server warms up without credentials."""
+    set_llm(ToolCallingFakeChatModel(responses=["pikachu"]))
+    yield
+    set_llm(None)
+
+
+def run_against_server(scenario, config: ServerConfig | None = None):
+    """Start a server on a free port, run scenario(server, client) against it and shut it down."""
+    async def run():
+        server = PokemonAgentServer(config or ServerConfig(port=0))
+        await server.start()
+        try:
+            async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{server.port}") as client:
+                return await scenario(server, client)
+        finally:
+            await server.shutdown()
+
+    return asyncio.run(run())
+
+
+class TestPokemonAgentServer:
+    """Unit tests for the HTTP server."""
+
+    def test_reports_ready_after_the_warm_up(self, fake_llm):
+        """Test liveness and readiness once the data, graph and model client are loaded."""
+        async def scenario(server, client):
+            return await client.get("/healthz"), await client.get("/readyz")
+
+        healthz, readyz = run_against_server(scenario)
+
+        assert_that(healthz.status_code).is_equal_to(200)
+        assert_that(readyz.status_code).is_equal_to(200)
+        assert_that(readyz.json()["checks"]).contains_entry({"species_index": True}, {"llm": True}, {"graph": True})
+
+    def test_query_answers_with_the_graph_output(self, fake_llm):
+        """Test a query runs the graph and returns its answer and trace ID."""
+        async def scenario(server, client):
+            return await client.post("/query", json={"input": "What's good against Charizard?"})
+
+        response = run_against_server(scenario)
+
+        assert_that(response.status_code).is_equal_to(200)
+        assert_that(response.json()["output"]).contains("charizard", "fire", "flying")
+        assert_that(response.json()["trace_id"]).is_not_empty()
+
+    def test_stream_returns_ndjson_events(self, fake_llm):
+        """Test the streaming endpoint sends one JSON event per line, ending with the answer."""
+        async def scenario(server, client):
+            return await client.post("/query/stream", json={"input": "Tell me about Pikachu"})
+
+        response = run_against_server(scenario)
+
+        events = [line for line in response.text.splitlines() if line]
+        assert_that(events[0]).contains('"kind": "node"', '"check_input"')
+        assert_that(events[-1]).contains('"kind": "done"', "electric")
+
+    def test_rejects_malformed_queries(self, fake_llm):
+        """Test bodies without an input are rejected before reaching the graph."""
+        async def scenario(server, client):
+            return await client.post("/query", json={"question": "pikachu"})
+
+        response = run_against_server(scenario)
+
+        assert_that(response.status_code).is_equal_to(400)
+
+    def test_sheds_load_when_saturated(self, fake_llm):
+        """Test queries beyond the running and queued limit get 503 with Retry-After."""
+        async def scenario(server, client):
+            server._admitted = server.config.max_concurrency + server.config.max_queue
+            try:
+                return await client.post("/query", json={"input": "pikachu"})
+            finally:
+                server._admitted = 0
+
+        response = run_against_server(scenario, ServerConfig(port=0, max_concurrency=1, max_queue=0))
+
+        assert_that(response.status_code).is_equal_to(503)
+        assert_that(response.headers["Retry-After"]).is_equal_to("1")
+
+    def test_rejects_request_lines_over_the_target_limit(self, fake_llm):
+        """Test a 32KB request line is answered with 414 and the server keeps serving."""
+        async def scenario(server, client):
+            return await client.get("/" + "a" * 32 * 1024), await client.get("/healthz")
+
+        too_long, healthz = run_against_server(scenario)
+
+        assert_that(too_long.status_code).is_equal_to(414)
+        assert_that(too_long.json()).is_equal_to({"error": "Request line too long"})
+        assert_that(healthz.status_code).is_equal_to(200)
+
+    def test_shutdown_waits_for_in_flight_requests(self, fake_llm):
+        """Test shutdown reports not ready and only finishes once in-flight requests are done."""
+        async def scenario(server, client):
+            # Hold the only slot so the query waits in the queue
+            await server._slots.acquire()
+            query = asyncio.create_task(client.post("/query", json={"input": "pikachu"}))
+            while server._admitted == 0:
+                await asyncio.sleep(0.01)
+
+            shutdown = asyncio.create_task(server.shutdown())
+            await asyncio.sleep(0.2)
+            drained_early = shutdown.done()
+            ready_while_draining = server.is_ready
+
+            server._slots.release()
+            await asyncio.wait_for(shutdown, 5)
+            return drained_early, ready_while_draining, await query
+
+        drained_early, ready_while_draining, response = run_against_server(scenario, ServerConfig(port=0, max_concurrency=1))
+
+        assert_that(drained_early).is_false()
+        assert_that(ready_while_draining).is_false()
+        assert_that(response.status_code).is_equal_to(200)
+
+    def test_shutdown_closes_idle_connections(self, fake_llm, caplog):
+        """Test idle keep-alive connections are closed on shutdown without waiting for their timeout or logging errors."""
+        async def scenario(server, client):
+            # The client keeps the connection open after the response
+            await client.get("/healthz")
+            start = time.perf_counter()
+            await server.shutdown()
+            return time.perf_counter() - start
+
+        shutdown_seconds = run_against_server(scenario, ServerConfig(port=0, keep_alive_timeout_seconds=30))
+
+        assert_that(shutdown_seconds).is_less_than(5)
+        assert_that([record for record in caplog.records if record.levelno >= logging.ERROR]).is_empty()
@@ -0,0 +1,151 @@
+import asyncio
+import sqlite3
+
+import pytest
+from assertpy import assert_that
+from langchain_core.messages import AIMessage, HumanMessage
+
+from src.main import GraphConfig, build_graph
+from src.pokemon_record import PokemonRecord
+from src.pokemon_sessions import (
+    MEMORY_SESSION_STORE,
+    SQLITE_SESSION_STORE,
+    HistoryPolicy,
+    PruningInMemorySaver,
+    PruningSqliteSaver,
+    get_checkpointer,
+    is_follow_up,
+)
+from src.pokemon_state import MAX_SESSION_LOOKUPS, SessionLookup, merge_session_lookups
+from src.run_agent import new_agent_input
+
+
+def conversation(turns: int) -> list:
+    messages = []
+    for turn in range(turns):
+        messages += [HumanMessage(content=f"question {turn}", id=f"h{turn}"), AIMessage(content=f"answer {turn} " * 50, id=f"a{turn}")]
+    return messages
+
+
+@pytest.fixture
+def sqlite_session_graph(monkeypatch, tmp_path):
+    """Session graph storing its checkpoints in a temporary SQLite database."""
+    monkeypatch.setenv("POKEMON_SESSION_DB_PATH", str(tmp_path / "sessions.sqlite3"))
+    get_checkpointer.cache_clear()
+    yield build_graph(GraphConfig(session_store=SQLITE_SESSION_STORE, metrics=False))
+    get_checkpointer(SQLITE_SESSION_STORE).close()
+    get_checkpointer.cache_clear()
+
+
+class TestHistoryPolicy:
+    """Unit tests for the session history trimming."""
+
+    def test_keeps_the_last_turns(self):
+        """Test whole turns beyond max_turns are dropped, oldest first."""
+        messages = conversation(4) + [HumanMessage(content="question 4", id="h4")]
+
+        dropped_messages = HistoryPolicy(max_turns=2).messages_to_drop(messages)
+
+        assert_that([message.id for message in dropped_messages]).is_equal_to(["h0", "a0", "h1", "a1", "h2", "a2"])
+
+    def test_token_budget_keeps_the_current_turn(self):
+        """Test the token budget drops older turns but never the current one."""
+        messages = conversation(3)
+
+        dropped_messages = HistoryPolicy(max_turns=None, max_tokens=1).messages_to_drop(messages)
+
+        assert_that([message.id for message in dropped_messages]).is_equal_to(["h0", "a0", "h1", "a1"])
+
+
+class TestSessionLookups:
+    """Unit tests for the session lookups reducer and follow-up detection."""
+
+    def test_merge_keeps_the_latest_pokemon_last(self):
+        """Test updated pokemon move to the end and the oldest ones are forgotten."""
+        lookups = {f"pokemon-{number}": SessionLookup(PokemonRecord(number, f"pokemon-{number}", ["normal"])) for number in range(MAX_SESSION_LOOKUPS)}
+        pikachu = SessionLookup(PokemonRecord(25, "pikachu", ["electric"]))
+
+        merged = merge_session_lookups(lookups, {"pokemon-1": lookups["pokemon-1"], "pikachu": pikachu})
+
+        assert_that(merged).is_length(MAX_SESSION_LOOKUPS).does_not_contain_key("pokemon-0")
+        assert_that(list(merged)[-2:]).is_equal_to(["pokemon-1", "pikachu"])
+
+    def test_follow_up_questions(self):
+        """Test messages referring back to an earlier pokemon are detected."""
+        assert_that(is_follow_up("What is it weak to?")).is_true()
+        assert_that(is_follow_up("Does fire beat them?")).is_true()
+        assert_that(is_follow_up("Hello there")).is_false()
+
+    @pytest.mark.parametrize("user_message", ["tell me a joke about that", "is this the right app?", "they said hi"])
+    def test_references_without_matchup_questions_are_not_follow_ups(self, user_message):
+        """Test "it", "this" or "that" alone do not make a message a follow-up question."""
+        assert_that(is_follow_up(user_message)).is_false()
+
+
+class TestMemorySessions:
+    """Integration tests for sessions kept in memory."""
+
+    def test_old_checkpoints_are_pruned(self, monkeypatch):
+        """Test only the latest checkpoints of a thread and the values they refer to are kept."""
+        saver = PruningInMemorySaver(max_checkpoints_per_thread=3)
+        monkeypatch.setattr("src.pokemon_sessions.get_checkpointer", lambda session_store: saver)
+        memory_session_graph = build_graph(GraphConfig(session_store=MEMORY_SESSION_STORE, metrics=False))
+        for user_message in ["What beats Charizard?", "Tell me about Pikachu", "And what is it weak to?"]:
+            result = memory_session_graph.invoke(*new_agent_input(user_message, "session-1"))
+
+        checkpoints = saver.storage["session-1"][""]
+        kept_versions = {
+            ("session-1", "", channel, version)
+            for serialized_checkpoint, _, _ in checkpoints.values()
+            for channel, version in saver.serde.loads_typed(serialized_checkpoint)["channel_versions"].items()
+        }
+        assert_that(result["output_message"]).contains("pikachu", "ground")
+        assert_that(checkpoints).is_length(3)
+        assert_that(set(saver.blobs)).is_equal_to(kept_versions)
+        assert_that({key[2] for key in saver.writes}).is_subset_of(set(checkpoints))
+
+
+class TestSQLiteSessions:
+    """Integration tests for sessions stored in SQLite."""
+
+    def test_follow_up_reuses_the_session_pokemon(self, sqlite_session_graph):
+        """Test a follow-up question answers about the previous turn's pokemon."""
+        sqlite_session_graph.invoke(*new_agent_input("What beats Charizard?", "session-1"))
+        result = sqlite_session_graph.invoke(*new_agent_input("And what is it weak to?", "session-1"))
+
+        assert_that(result["output_message"]).contains("charizard", "rock")
+        assert_that(result["messages"]).is_length(4)
+        assert_that(result["session_lookups"]["charizard"].pokemon_types).is_equal_to(("fire", "flying"))
+
+    def test_sessions_survive_a_new_saver(self, sqlite_session_graph, tmp_path):
+        """Test a new saver on the same database sees the session and keeps few checkpoints."""
+        sqlite_session_graph.invoke(*new_agent_input("Tell me about Pikachu", "session-2"))
+        saver = PruningSqliteSaver(tmp_path / "sessions.sqlite3", max_checkpoints_per_thread=3)
+
+        checkpoint_tuple = saver.get_tuple({"configurable": {"thread_id": "session-2"}})
+        saver.put(checkpoint_tuple.config, checkpoint_tuple.checkpoint | {"id": "z"}, {}, {})
+
+        assert_that(checkpoint_tuple.checkpoint["channel_values"]["pokemon_name"]).is_equal_to("pikachu")
+        assert_that(list(saver.list({"configurable": {"thread_id": "session-2"}}))).is_length(3)
+        saver.close()
+
+    def test_state_is_stored_without_pickle(self, sqlite_session_graph, tmp_path):
+        """Test the state's records, a team analysis among them, are stored and restored without pickle."""
+        sqlite_session_graph.invoke(*new_agent_input("team: pikachu, charizard, blastoise", "session-3"))
+
+        with sqlite3.connect(tmp_path / "sessions.sqlite3") as connection:
+            stored_types = {row[0] for row in connection.execute("SELECT type FROM checkpoints UNION SELECT type FROM writes")}
+        state = sqlite_session_graph.get_state({"configurable": {"thread_id": "session-3"}}).values
+
+        assert_that(get_checkpointer(SQLITE_SESSION_STORE).serde.pickle_fallback).is_false()
+        assert_that(stored_types).does_not_contain("pickle")
+        assert_that(state["team_analysis"].members).is_equal_to(("pikachu", "charizard", "blastoise"))
+        assert_that(state["session_lookups"]["charizard"].pokemon).is_equal_to(PokemonRecord(6, "charizard", ("fire", "flying")))
+
+    def test_async_follow_up_reuses_the_session_pokemon(self, sqlite_session_graph):
+        """Test sessions work under ainvoke, on a new event loop for every turn."""
+        asyncio.run(sqlite_session_graph.ainvoke(*new_agent_input("What beats Charizard?", "session-4")))
+        result = asyncio.run(sqlite_session_graph.ainvoke(*new_agent_input("And what is it weak to?", "session-4")))
+
+        assert_that(result["output_message"]).contains("charizard", "rock")
+        assert_that(result["messages"]).is_length(4)
@@ -0,0 +1,99 @@
+import json
+import shutil
+
+import pytest
+from assertpy import assert_that
+
+import run
+from benchmarks.stand_ins import PokeApiStandIn
+from src.pokemon_data_sources import PokemonDataError, RetryPolicy
+from src.pokemon_snapshot_builder import SnapshotBuilder, check_type_chart, journal_path_for, load_journal
+from src.pokemon_species_index import DEFAULT_SNAPSHOT_PATH, PokemonSpeciesIndex
+
+NO_RETRY_POLICY = RetryPolicy(attempts=1)
+
+
+@pytest.fixture
+def stand_in():
+    with PokeApiStandIn() as stand_in:
+        yield stand_in
+
+
+@pytest.fixture
+def snapshot_path(tmp_path):
+    """A copy of the committed snapshot, so builds keep its aliases."""
+    snapshot_path = tmp_path / "pokemon_species.json"
+    shutil.copy(DEFAULT_SNAPSHOT_PATH, snapshot_path)
+    return snapshot_path
+
+
+def read_snapshot(snapshot_path) -> dict:
+    return json.loads(snapshot_path.read_text(encoding="utf-8"))
+
+
+class TestSnapshotBuilder:
+    """Integration tests of the snapshot builder against a local PokeAPI stand-in."""
+
+    def test_full_build_matches_the_committed_snapshot(self, stand_in, snapshot_path):
+        """Test species, forms and aliases round-trip and the type relations match the built-in chart."""
+        committed_species = read_snapshot(snapshot_path)["species"]
+
+        stats = SnapshotBuilder(stand_in.base_url, snapshot_path).build()
+
+        snapshot = read_snapshot(snapshot_path)
+        assert_that(snapshot["species"]).is_equal_to(committed_species)
+        assert_that(snapshot["types"]).is_length(18)
+        assert_that(check_type_chart(snapshot)).is_empty()
+        assert_that(stats.fetched).is_equal_to(stats.species + stats.forms + stats.types)
+
+    def test_refresh_only_downloads_changed_and_new_pokemon(self, stand_in, snapshot_path):
+        """Test unchanged resources are revalidated with a 304 instead of downloaded again."""
+        builder = SnapshotBuilder(stand_in.base_url, snapshot_path)
+        builder.build()
+        stand_in.put_pokemon({"id": 25, "name": "pikachu", "types": ["electric", "fairy"]})
+        stand_in.put_pokemon({"id": 10080, "name": "pikachu-rock-star", "types": ["electric", "steel"]}, "pikachu")
+        stand_in.reset_requests()
+
+        stats = builder.build()
+
+        assert_that(stats.fetched).is_equal_to(2)
+        assert_that(stand_in.not_modified_responses).is_equal_to(stats.not_modified)
+        pikachu = next(species for species in read_snapshot(snapshot_path)["species"] if species["name"] == "pikachu")
+        assert_that(pikachu).is_equal_to({
+            "id": 25,
+            "name": "pikachu",
+            "types": ["electric", "fairy"],
+            "forms": [{"id": 10080, "name": "pikachu-rock-star", "types": ["electric", "steel"]}],
+        })
+
+    def test_interrupted_build_resumes(self, stand_in, snapshot_path):
+        """Test a failed build keeps its progress and the next build only downloads what is missing."""
+        builder = SnapshotBuilder(stand_in.base_url, snapshot_path, retry_policy=NO_RETRY_POLICY)
+        stand_in.failing = {"mew"}
+        with pytest.raises(PokemonDataError):
+            builder.build()
+
+        entries, unfinished_run = load_journal(journal_path_for(snapshot_path))
+        assert_that(unfinished_run).is_not_none()
+        assert_that(entries).does_not_contain_key("/pokemon/mew")
+
+        stand_in.failing = set()
+        stand_in.reset_requests()
+        stats = builder.build()
+
+        assert_that(stats.fetched).is_equal_to(1)
+        assert_that(stats.resumed).is_equal_to(len(entries))
+        # The two list requests and mew
+        assert_that(stand_in.requests).is_equal_to(3)
+        assert_that(load_journal(journal_path_for(snapshot_path))[1]).is_none()
+
+    def test_cli_rebuilds_the_index(self, stand_in, snapshot_path):
+        """Test the build-snapshot command writes an index that resolves forms and aliases."""
+        index_path = snapshot_path.with_suffix(".idx")
+
+        run.main(["build-snapshot", "--base-url", stand_in.base_url, "--output", str(snapshot_path)])
+
+        species_index = PokemonSpeciesIndex(index_path)
+        assert_that(species_index.lookup("charizard-mega-x").types).is_equal_to(("fire", "dragon"))
+        assert_that(species_index.lookup("nidoran female").name).is_equal_to("nidoran-f")
+        species_index.close()
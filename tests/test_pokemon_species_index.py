@@ -0,0 +1,61 @@
+import hashlib
+import json
+
+from assertpy import assert_that
+import pytest
+
+from src.pokemon_record import PokemonRecord
+from src.pokemon_species_index import DEFAULT_INDEX_PATH, DEFAULT_SNAPSHOT_PATH, PokemonSpeciesIndex, build_species_index
+
+
+@pytest.fixture(scope="module")
+def species_index():
+    """The species index shipped with the project."""
+    species_index = PokemonSpeciesIndex(DEFAULT_INDEX_PATH)
+    yield species_index
+    species_index.close()
+
+
+class TestPokemonSpeciesIndex:
+    """Unit tests for the memory-mapped species index."""
+
+    @pytest.mark.parametrize("pokemon_name,expected_record", [
+        ("pikachu", PokemonRecord(id=25, name="pikachu", types=["electric"])),
+        ("  Charizard ", PokemonRecord(id=6, name="charizard", types=["fire", "flying"])),
+        ("charizard-mega-x", PokemonRecord(id=10034, name="charizard-mega-x", types=["fire", "dragon"])),
+        ("Mr. Mime", PokemonRecord(id=122, name="mr-mime", types=["psychic", "fairy"])),
+    ])
+    def test_lookup(self, species_index, pokemon_name, expected_record):
+        """Test species, forms and aliases resolve to their canonical record."""
+        assert_that(species_index.lookup(pokemon_name)).is_equal_to(expected_record)
+
+    @pytest.mark.parametrize("pokemon_name", ["Fakemon", "", "zzz"])
+    def test_lookup_with_unknown_name(self, species_index, pokemon_name):
+        """Test unknown names are not resolved."""
+        assert_that(species_index.lookup(pokemon_name)).is_none()
+
+    def test_records_skip_aliases(self, species_index):
+        """Test records only yield species and forms."""
+        record_names = [record.name for record in species_index.records()]
+
+        assert_that(record_names).contains("mr-mime", "raichu-alola").does_not_contain("mr mime")
+        assert_that(record_names).does_not_contain_duplicates()
+
+    def test_shipped_index_matches_snapshot(self, species_index):
+        """Test the committed index was rebuilt after the last snapshot change."""
+        snapshot_digest = hashlib.sha256(DEFAULT_SNAPSHOT_PATH.read_bytes()).digest()[:16].hex()
+
+        assert_that(species_index.version).is_equal_to(snapshot_digest)
+
+    def test_build_species_index(self, tmp_path):
+        """Test an index built from a custom snapshot can be loaded."""
+        snapshot_path = tmp_path / "snapshot.json"
+        snapshot_path.write_text(json.dumps({"species": [
+            {"id": 7, "name": "squirtle", "types": ["water"], "aliases": ["zenigame"]}
+        ]}))
+
+        species_index = PokemonSpeciesIndex(build_species_index(snapshot_path, tmp_path / "snapshot.idx"))
+
+        assert_that(len(species_index)).is_equal_to(2)
+        assert_that(species_index.lookup("zenigame")).is_equal_to(PokemonRecord(id=7, name="squirtle", types=["water"]))
+        species_index.close()
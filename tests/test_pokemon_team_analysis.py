@@ -0,0 +1,83 @@
+import pytest
+from assertpy import assert_that
+
+from src.pokemon_agent_tools import get_team_analysis
+from src.pokemon_record import PokemonRecord
+from src.pokemon_team_analysis import DEFENSIVE_ARRAY, analyze_team, rank_candidates
+from src.pokemon_type_matrix import DEFENSIVE_TABLE, TYPE_NAMES
+
+CHARIZARD = PokemonRecord(6, "charizard", ["fire", "flying"])
+GYARADOS = PokemonRecord(130, "gyarados", ["water", "flying"])
+PIKACHU = PokemonRecord(25, "pikachu", ["electric"])
+MAGNEMITE = PokemonRecord(81, "magnemite", ["electric", "steel"])
+GEODUDE = PokemonRecord(74, "geodude", ["rock", "ground"])
+
+
+class TestAnalyzeTeam:
+    """Unit tests for the team coverage analysis."""
+
+    def test_finds_shared_weaknesses_and_uncovered_types(self):
+        """Test types most members are weak to and types nobody resists are reported."""
+        team_analysis = analyze_team([CHARIZARD, GYARADOS, PIKACHU], candidates=[], suggestion_count=0)
+
+        assert_that(team_analysis.shared_weaknesses).is_equal_to(("rock", "electric"))
+        assert_that(team_analysis.weaknesses).contains_entry({"rock": 2}, {"electric": 2}, {"ground": 1})
+        assert_that(team_analysis.uncovered_types).contains("rock", "ice").does_not_contain("ground", "electric")
+
+    def test_immunities_count_as_resistances(self):
+        """Test an immune member covers the attacking type."""
+        team_analysis = analyze_team([GEODUDE], candidates=[], suggestion_count=0)
+
+        assert_that(team_analysis.resistances).contains_entry({"electric": 1})
+        assert_that(team_analysis.uncovered_types).does_not_contain("electric")
+
+    def test_rejects_teams_larger_than_six(self):
+        """Test the analysis refuses more than six members."""
+        with pytest.raises(ValueError):
+            analyze_team([PIKACHU] * 7)
+
+
+class TestRankCandidates:
+    """Unit tests for the batched candidate ranking."""
+
+    def test_ranks_the_candidate_covering_the_team_first(self):
+        """Test the candidate resisting the shared weaknesses ranks above the others, team members excluded."""
+        candidates = [PIKACHU, GEODUDE, MAGNEMITE, PokemonRecord(1, "bulbasaur", ["grass", "poison"])]
+
+        rankings = rank_candidates([CHARIZARD, GYARADOS, PIKACHU], candidates, limit=3)
+
+        assert_that([ranking.name for ranking in rankings]).is_equal_to(["magnemite", "geodude", "bulbasaur"])
+        assert_that(rankings[0].score).is_greater_than(rankings[-1].score)
+
+    def test_batched_scores_match_adding_each_candidate(self):
+        """Test the vectorised scores over every type combination equal analysing each extended team."""
+        team = [CHARIZARD, GYARADOS]
+        candidates = [PokemonRecord(number, f"candidate-{number}", [TYPE_NAMES[index] for index in type_combination])
+                      for number, type_combination in enumerate(DEFENSIVE_TABLE)]
+
+        rankings = rank_candidates(team, candidates, limit=len(candidates))
+
+        def exposure(members):
+            team_analysis = analyze_team(members, suggestion_count=0)
+            return sum(max(count - team_analysis.resistances.get(type_name, 0), 0)
+                       for type_name, count in team_analysis.weaknesses.items()) + len(team_analysis.uncovered_types)
+
+        assert_that(rankings).is_length(len(DEFENSIVE_ARRAY))
+        for ranking in rankings[::17]:
+            candidate = next(candidate for candidate in candidates if candidate.name == ranking.name)
+            assert_that(ranking.score).is_equal_to(exposure(team) - exposure(team + [candidate]))
+
+    def test_full_teams_get_no_suggestions(self):
+        """Test a six member team is analysed without ranking candidates."""
+        assert_that(rank_candidates([PIKACHU] * 6, [MAGNEMITE])).is_empty()
+
+
+class TestTeamAnalysisTool:
+    """Unit tests for the get_team_analysis tool."""
+
+    def test_ignores_members_beyond_six(self):
+        """Test extra names are dropped instead of failing the tool call."""
+        team_analysis = get_team_analysis(["pikachu"] * 7)
+
+        assert_that(team_analysis.members).is_length(6)
+
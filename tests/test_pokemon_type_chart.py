@@ -0,0 +1,51 @@
+import sys
+
+from assertpy import assert_that
+
+from src.pokemon_type_chart import COMPACT_TYPE_CHARTS, CompactTypeChart, PokemonTypeChart, mask_to_types, types_to_mask
+from src.pokemon_type_matrix import type_indexes
+
+
+class TestCompactTypeChart:
+    """Unit tests for the bit mask type chart."""
+
+    def test_round_trips_the_set_based_chart(self, pokemon_type_chart):
+        """Test converting to and from PokemonTypeChart keeps every bucket."""
+        chart = PokemonTypeChart(**pokemon_type_chart["fire_flying"])
+
+        compact_chart = CompactTypeChart.from_chart(chart)
+
+        assert_that(compact_chart.to_chart()).is_equal_to(chart)
+        assert_that(str(compact_chart)).is_equal_to(str(chart))
+
+    def test_precomputed_charts_match_the_expected_buckets(self, pokemon_type_chart):
+        """Test the chart of every combination is built from the defensive multipliers."""
+        compact_chart = COMPACT_TYPE_CHARTS[type_indexes(["electric"])]
+
+        assert_that(compact_chart.to_chart()).is_equal_to(PokemonTypeChart(**pokemon_type_chart["electric"]))
+        assert_that(COMPACT_TYPE_CHARTS).is_length(171)
+
+    def test_set_operations_apply_per_bucket(self):
+        """Test union, intersection and difference work on each bucket's mask."""
+        electric = COMPACT_TYPE_CHARTS[type_indexes(["electric"])]
+        water = COMPACT_TYPE_CHARTS[type_indexes(["water"])]
+
+        assert_that(mask_to_types((electric & water).resistant)).is_equal_to(("steel",))
+        assert_that(mask_to_types((electric | water).effective)).is_equal_to(("ground", "grass", "electric"))
+        assert_that(mask_to_types((electric - water).resistant)).is_equal_to(("flying", "electric"))
+
+    def test_equal_charts_share_a_hash(self):
+        """Test charts are hashable values, usable as dict keys."""
+        first_chart = CompactTypeChart(effective=types_to_mask(["ground"]))
+        second_chart = CompactTypeChart.from_chart(PokemonTypeChart(effective=["ground"]))
+
+        assert_that({first_chart: "electric"}).contains_key(second_chart)
+
+    def test_is_smaller_than_the_set_based_chart(self, pokemon_type_chart):
+        """Test the slotted chart has no instance dict and allocates no sets."""
+        chart = PokemonTypeChart(**pokemon_type_chart["fire_flying"])
+        compact_chart = CompactTypeChart.from_chart(chart)
+
+        chart_size = sys.getsizeof(chart) + sum(sys.getsizeof(getattr(chart, bucket)) for bucket in ("super_effective", "effective", "resistant", "super_resistant", "immune"))
+        assert_that(hasattr(compact_chart, "__dict__")).is_false()
+        assert_that(sys.getsizeof(compact_chart)).is_less_than(chart_size // 5)
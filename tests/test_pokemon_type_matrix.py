@@ -0,0 +1,45 @@
+from assertpy import assert_that
+import pytest
+
+from src.pokemon_type_matrix import DEFENSIVE_TABLE, TYPE_COUNT, TYPE_NAMES, defensive_multipliers, effectiveness, type_indexes
+
+
+class TestTypeMatrix:
+    """Unit tests for the precomputed type effectiveness matrix."""
+
+    def test_matrix_covers_every_type_combination(self):
+        """Test the precomputed table has every single and dual type combination."""
+        assert_that(TYPE_NAMES).is_length(TYPE_COUNT)
+        assert_that(DEFENSIVE_TABLE).is_length(171)
+
+    @pytest.mark.parametrize("attacking_type,defending_type,expected_multiplier", [
+        ("ground", "electric", 2),
+        ("electric", "ground", 0),
+        ("dragon", "fairy", 0),
+        ("fire", "water", 0.5),
+        ("normal", "normal", 1),
+    ])
+    def test_effectiveness(self, attacking_type, defending_type, expected_multiplier):
+        """Test single matchups are indexed by type ID."""
+        result = effectiveness(TYPE_NAMES.index(attacking_type), TYPE_NAMES.index(defending_type))
+
+        assert_that(result).is_equal_to(expected_multiplier)
+
+    def test_defensive_multipliers_ignore_type_order(self):
+        """Test dual types resolve to the same entry in any order."""
+        result = defensive_multipliers(["flying", "fire"])
+
+        assert_that(result).is_equal_to(defensive_multipliers(["fire", "flying"]))
+        assert_that(result["rock"]).is_equal_to(4)
+        assert_that(result["grass"]).is_equal_to(0.25)
+        assert_that(result["ground"]).is_equal_to(0)
+
+    @pytest.mark.parametrize("pokemon_types", [
+        ["fakemon"],
+        ["fire", "water", "grass"],
+        [],
+    ])
+    def test_type_indexes_with_invalid_input(self, pokemon_types):
+        """Test unknown types and unsupported combinations are rejected."""
+        assert_that(type_indexes(pokemon_types)).is_none()
+        assert_that(defensive_multipliers(pokemon_types)).is_none()
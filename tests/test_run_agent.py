@@ -0,0 +1,145 @@
+import asyncio
+import time
+
+from assertpy import assert_that
+from langchain_core.messages import AIMessageChunk
+
+from src import pokemon_agent_nodes, run_agent
+from src.pokemon_metrics import TRACE_ID_KEY
+from src.run_agent import (
+    DONE_EVENT,
+    NODE_EVENT,
+    TOKEN_EVENT,
+    BatchResult,
+    StreamEvent,
+    _StreamEventBuilder,
+    astream_pokemon_agent,
+    new_agent_input,
+    run_pokemon_agent_batch,
+    stream_pokemon_agent,
+)
+
+
+class TestRunPokemonAgentBatch:
+    """Unit tests for the run_pokemon_agent_batch function."""
+
+    def test_run_batch_keeps_input_order(self):
+        """Test batch results come back in input order with timings."""
+        user_inputs = ["What's good against Pikachu?", "Tell me about Charizard", "what's good against pikachu?"]
+
+        result = run_pokemon_agent_batch(user_inputs, max_concurrency=2)
+
+        assert_that(result).is_length(3)
+        assert_that([batch_result.user_input for batch_result in result]).is_equal_to(user_inputs)
+        assert_that(result[0].output).contains("pikachu", "electric")
+        assert_that(result[1].output).contains("charizard", "fire", "flying")
+        assert_that(result[0].error).is_none()
+        assert_that(result[0].duration_seconds).is_greater_than(0)
+
+    def test_run_batch_groups_identical_inputs(self):
+        """Test inputs that only differ in case and spacing share one graph run."""
+        result = run_pokemon_agent_batch(["Pikachu", "  pikachu "])
+
+        assert_that(result[1]).is_equal_to(BatchResult(
+            user_input="  pikachu ",
+            output=result[0].output,
+            error=None,
+            duration_seconds=result[0].duration_seconds
+        ))
+
+    def test_run_batch_merges_several_pokemon(self):
+        """Test a comparison answers for every pokemon, in the order they are mentioned."""
+        result = run_pokemon_agent_batch(["Compare Gyarados and Dragonite"])
+
+        assert_that(result[0].output).contains("gyarados", "dragonite")
+        assert_that(result[0].output.index("gyarados")).is_less_than(result[0].output.index("dragonite"))
+
+    def test_run_batch_starts_like_a_single_run(self, monkeypatch):
+        """Test every batch run starts from new_agent_input's state and config, tagged with its trace ID."""
+        agent_inputs = []
+
+        def recording_new_agent_input(user_input, session_id=None):
+            agent_inputs.append(new_agent_input(user_input, session_id))
+            return agent_inputs[-1]
+
+        monkeypatch.setattr(run_agent, "new_agent_input", recording_new_agent_input)
+
+        result = run_pokemon_agent_batch(["Pikachu", "Charizard"])
+
+        assert_that(result[0].output).contains("pikachu")
+        assert_that(agent_inputs).is_length(2)
+        for initial_state, config in agent_inputs:
+            assert_that(config["metadata"][TRACE_ID_KEY]).is_equal_to(initial_state["trace_id"])
+
+    def test_run_batch_with_empty_input(self):
+        """Test an empty batch returns no results."""
+        assert_that(run_pokemon_agent_batch([])).is_empty()
+
+
+class TestFanOut:
+    """Integration tests for the parallel lookups of multi-pokemon inputs."""
+
+    def test_lookups_run_in_parallel(self, monkeypatch):
+        """Test the run takes about as long as the slowest lookup, not the sum of them."""
+        aget_pokemon_types = pokemon_agent_nodes.aget_pokemon_types
+
+        async def slow_aget_pokemon_types(pokemon_name, pokemon_record=None):
+            await asyncio.sleep(0.2)
+            return await aget_pokemon_types(pokemon_name, pokemon_record)
+
+        async def collect_events():
+            return [event async for event in astream_pokemon_agent("Pikachu vs Charizard vs Squirtle vs Bulbasaur")]
+
+        monkeypatch.setattr(pokemon_agent_nodes, "aget_pokemon_types", slow_aget_pokemon_types)
+        start = time.perf_counter()
+        events = asyncio.run(collect_events())
+        duration_seconds = time.perf_counter() - start
+
+        assert_that(duration_seconds).is_less_than(0.6)
+        assert_that([event.node for event in events if event.kind == NODE_EVENT].count("lookup_each_pokemon")).is_equal_to(4)
+        assert_that(events[-1].content).contains("pikachu", "charizard", "squirtle", "bulbasaur")
+
+
+class TestStreamPokemonAgent:
+    """Unit tests for the streaming runner."""
+
+    def test_stream_reports_nodes_then_the_answer(self):
+        """Test a valid input streams node progress, the answer and a done event."""
+        events = list(stream_pokemon_agent("What's good against Pikachu?"))
+
+        assert_that([event.node for event in events if event.kind == NODE_EVENT]).is_equal_to(
+            ["check_input", "load_cached_answer", "lookup_pokemon", "format_output"]
+        )
+        assert_that(events[-1].kind).is_equal_to(DONE_EVENT)
+        assert_that(events[-1].content).contains("pikachu", "electric")
+        assert_that(events[-2]).is_equal_to(StreamEvent(
+            kind=TOKEN_EVENT, node="format_output", content=events[-1].content, trace_id=events[-1].trace_id
+        ))
+
+    def test_astream_matches_stream(self):
+        """Test the async stream yields the same answer."""
+        async def collect_events():
+            return [event async for event in astream_pokemon_agent("Tell me about Charizard")]
+
+        events = asyncio.run(collect_events())
+
+        assert_that(events[-1].content).contains("charizard", "fire", "flying")
+
+    def test_only_answer_tokens_are_streamed(self):
+        """Test LLM tokens from other nodes are skipped and streamed answers are not repeated."""
+        event_builder = _StreamEventBuilder("trace-1")
+        chunks = [
+            ("messages", (AIMessageChunk(content="pikachu"), {"langgraph_node": "check_input"})),
+            ("messages", (AIMessageChunk(content="Sorry, "), {"langgraph_node": "format_output"})),
+            ("messages", (AIMessageChunk(content="only Pokemon"), {"langgraph_node": "format_output"})),
+            ("updates", {"format_output": {"output_message": "Sorry, only Pokemon"}}),
+        ]
+
+        events = [event for stream_mode, chunk in chunks for event in event_builder.events(stream_mode, chunk)]
+
+        assert_that([(event.kind, event.content) for event in events]).is_equal_to([
+            (TOKEN_EVENT, "Sorry, "),
+            (TOKEN_EVENT, "only Pokemon"),
+            (NODE_EVENT, ""),
+            (DONE_EVENT, "Sorry, only Pokemon"),
+        ])